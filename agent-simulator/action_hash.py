@@ -0,0 +1,77 @@
+"""Canonical action hashing without web3.
+
+Produces the same bytes as the original Web3.keccak(text=...) implementation
+in agent_utils, using a lightweight Keccak-256 backend (pycryptodome, then
+pysha3, then eth-hash if web3 happens to be installed). Digests are memoized
+in a bounded LRU keyed on the canonical payload bytes.
+
+Environment:
+- ACTION_HASH_CACHE_SIZE: max memoized payloads (default 65536, 0 disables)
+
+Golden vectors from the original implementation: tests/test_action_hash.py.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def _load_keccak() -> Callable[[bytes], bytes]:
+	try:
+		from Crypto.Hash import keccak as _pycryptodome_keccak  # type: ignore
+
+		return lambda data: _pycryptodome_keccak.new(digest_bits=256, data=data).digest()
+	except ImportError:
+		pass
+	try:
+		import sha3  # type: ignore  # pysha3
+
+		return lambda data: sha3.keccak_256(data).digest()
+	except ImportError:
+		pass
+	try:
+		from eth_hash.auto import keccak as _eth_keccak  # type: ignore
+
+		return _eth_keccak
+	except ImportError:
+		pass
+	raise RuntimeError("No Keccak-256 backend found: pip install pycryptodome")
+
+
+_keccak: Optional[Callable[[bytes], bytes]] = None
+
+
+def keccak256(data: bytes) -> bytes:
+	# The backend is picked on first use so importing this module stays cheap
+	global _keccak
+	if _keccak is None:
+		_keccak = _load_keccak()
+	return _keccak(data)
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def canonical_payload(action_name: str, params: Dict[str, Any]) -> bytes:
+	"""Compact JSON of {"action", "params"} with top-level params sorted by key, UTF-8 encoded."""
+	return _encode({"action": action_name, "params": dict(sorted(params.items()))}).encode("utf-8")
+
+
+@lru_cache(maxsize=int(os.getenv("ACTION_HASH_CACHE_SIZE", "65536")))
+def _keccak_payload(payload: bytes) -> bytes:
+	return keccak256(payload)
+
+
+def action_hash(action_name: str, params: Dict[str, Any]) -> bytes:
+	"""Keccak-256 of the canonical action payload (32 bytes)."""
+	return _keccak_payload(canonical_payload(action_name, params))
+
+
+def action_hashes(items: Iterable[Tuple[str, Dict[str, Any]]]) -> List[bytes]:
+	"""Batch form of action_hash for (action_name, params) pairs."""
+	hash_payload = _keccak_payload
+	return [hash_payload(canonical_payload(a, p)) for a, p in items]
+
+
+def cache_info() -> Dict[str, int]:
+	info = _keccak_payload.cache_info()
+	return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxSize": info.maxsize or 0}
@@ -1,72 +1,211 @@
 import argparse
 import json
 import os
+import sys
 import time
-from pathlib import Path
-from typing import Any, Dict
+from collections import deque
+from typing import IO, Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from agent_utils import get_action_hash
+from agent_utils import get_action_hash, get_action_hashes
+from membership import get_blacklist_cache, note_blacklisted
+from metrics import timed
+from store import get_store, normalize_hash
 
 
-USE_MOCK = True
-MOCK_DB_FILE = Path(__file__).parent / "mock_blacklist.json"
-
-
-def load_mock_db() -> Dict[str, Any]:
-    if MOCK_DB_FILE.exists():
-        with open(MOCK_DB_FILE, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {"blacklisted": []}
-    return {"blacklisted": []}
-
-
-def save_mock_db(db: Dict[str, Any]) -> None:
-    with open(MOCK_DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(db, f, indent=2)
+USE_MOCK = os.getenv("USE_MOCK", "1").lower() not in ("0", "false", "no")
+# Seconds spent in each mock review phase; set MOCK_REVIEW_PHASE_DELAY=0 for benchmarks
+MOCK_REVIEW_PHASE_DELAY = float(os.getenv("MOCK_REVIEW_PHASE_DELAY", "0.3"))
 
 
 def ensure_mock_db_initialized() -> None:
-    if not MOCK_DB_FILE.exists():
-        save_mock_db({"blacklisted": []})
+    # Opening the store creates the schema (or file) on first use
+    get_store()
 
 
+@timed("hash")
 def compute_action_hash(action: str, params: Dict[str, Any]) -> str:
     keccak_bytes = get_action_hash(action, params)
     return keccak_bytes.hex()
 
 
-def simulate_review_and_blacklist(action_hash_hex: str) -> None:
+@timed("hash")
+def compute_action_hashes(items: Iterable[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    return [h.hex() for h in get_action_hashes(items)]
+
+
+def simulate_review(phase_delay: Optional[float] = None) -> None:
+    """The mock review phases (delays only; nothing is written)."""
+    delay = MOCK_REVIEW_PHASE_DELAY if phase_delay is None else phase_delay
     print("[MOCK] Submitting action for review...")
-    time.sleep(0.3)
+    time.sleep(delay)
     print("[MOCK] Reviewers voting...")
-    time.sleep(0.3)
+    time.sleep(delay)
     print("[MOCK] Reaching quorum and blacklisting...")
-    time.sleep(0.3)
+    time.sleep(delay)
 
-    db = load_mock_db()
-    if action_hash_hex not in db.get("blacklisted", []):
-        db["blacklisted"].append(action_hash_hex)
-        save_mock_db(db)
+
+def simulate_review_and_blacklist(action_hash_hex: str, phase_delay: Optional[float] = None) -> None:
+    simulate_review(phase_delay)
+    get_store().add_blacklisted(action_hash_hex)
+    note_blacklisted(action_hash_hex)
     print(f"[MOCK] Completed. Action blacklisted: {action_hash_hex}")
 
 
-def get_mock_status(action_hash_hex: str) -> int:
-    db = load_mock_db()
-    return 2 if action_hash_hex in db.get("blacklisted", []) else 0
+def get_mock_status(action_hash_hex: str, use_cache: bool = True) -> int:
+    # Long-running processes answer from the resident cache; one-shot CLI runs
+    # ask the store directly instead of loading the whole blacklist.
+    if use_cache:
+        return 2 if get_blacklist_cache().contains(action_hash_hex) else 0
+    return 2 if get_store().is_blacklisted(action_hash_hex) else 0
+
+
+def get_mock_statuses(action_hashes: List[str], use_cache: bool = True) -> List[int]:
+    """Statuses for many hashes, in order, with a single cache pass or store query."""
+    if use_cache:
+        contains = get_blacklist_cache().contains
+        return [2 if contains(h) else 0 for h in action_hashes]
+    found = get_store().blacklisted_many(action_hashes)
+    return [2 if normalize_hash(h) in found else 0 for h in action_hashes]
+
+
+def get_chain_status(action_hash_hex: str) -> int:
+    return get_chain_statuses([action_hash_hex])[0]
+
+
+def get_chain_statuses(action_hashes: List[str]) -> List[int]:
+    """On-chain statuses for many hashes via the shared batched reader (one RPC round trip)."""
+    # Lazy import so mock mode never loads the RPC client
+    from chain_reader import get_chain_reader
+    return get_chain_reader().statuses(action_hashes)
+
+
+def _parse_and_hash(lines: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """Worker: parse JSONL {action, params} lines and hash the valid ones. Runs in pool processes."""
+    results: List[Dict[str, Any]] = []
+    valid: List[Tuple[Dict[str, Any], str, Dict[str, Any]]] = []
+    for line_no, line in lines:
+        out: Dict[str, Any] = {"line": line_no}
+        results.append(out)
+        try:
+            item = json.loads(line)
+        except ValueError as exc:
+            out["error"] = f"Invalid JSON: {exc}"
+            continue
+        action = item.get("action") if isinstance(item, dict) else None
+        params = item.get("params", {}) if isinstance(item, dict) else None
+        if not action or not isinstance(action, str) or not isinstance(params, dict):
+            out["error"] = "Provide 'action' and 'params' (object)."
+            continue
+        if "id" in item:
+            out["id"] = item["id"]
+        out["action"] = action
+        valid.append((out, action, params))
+    for (out, _, _), h in zip(valid, compute_action_hashes((a, p) for _, a, p in valid)):
+        out["hash"] = h
+    return results
+
+
+def _read_chunks(stream: IO[str], chunk_size: int) -> Iterator[List[Tuple[int, str]]]:
+    chunk: List[Tuple[int, str]] = []
+    for line_no, line in enumerate(stream, 1):
+        if line.strip():
+            chunk.append((line_no, line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _hashed_chunks(chunks: Iterator[List[Tuple[int, str]]], workers: int) -> Iterator[List[Dict[str, Any]]]:
+    """Hash chunks across a process pool, yielding results in input order with a bounded backlog."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield _parse_and_hash(chunk)
+        return
+    # Only bulk mode pays for the multiprocessing machinery
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Future] = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_parse_and_hash, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_bulk(
+    stream: IO[str],
+    out: IO[str],
+    workers: int,
+    chunk_size: int = 1000,
+    source: str = "mock",
+    report_every: float = 5.0,
+) -> Dict[str, Any]:
+    """Hash and status-check a JSONL stream of actions, writing one JSON result per line."""
+    if source == "mock":
+        ensure_mock_db_initialized()
+        check = lambda hashes: get_mock_statuses(hashes, use_cache=False)
+    else:
+        check = get_chain_statuses
+    totals = {"items": 0, "errors": 0, "blacklisted": 0}
+    start = last_report = time.perf_counter()
+    for results in _hashed_chunks(_read_chunks(stream, chunk_size), workers):
+        ok = [r for r in results if "hash" in r]
+        # One store query (or one RPC round trip) per chunk
+        for r, status in zip(ok, check([r["hash"] for r in ok])):
+            r["status"] = status
+        out.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in results))
+        totals["items"] += len(results)
+        totals["errors"] += len(results) - len(ok)
+        totals["blacklisted"] += sum(1 for r in ok if r["status"] == 2)
+        now = time.perf_counter()
+        if report_every and now - last_report >= report_every:
+            last_report = now
+            print(f"[bulk] {totals['items']} actions, {totals['items'] / (now - start):.0f}/s", file=sys.stderr)
+    out.flush()
+    elapsed = time.perf_counter() - start
+    totals["seconds"] = round(elapsed, 3)
+    totals["perSecond"] = round(totals["items"] / elapsed) if elapsed else None
+    return totals
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="AI Agent Simulator for Naughty Agents")
-    parser.add_argument("--action", required=True, help="Action name, e.g., native_transfer")
+    parser.add_argument("--action", help="Action name, e.g., native_transfer")
     parser.add_argument("--params", help="Params as JSON string (e.g., '{\"to\":\"0x..\",\"amount\":123}')")
     parser.add_argument("--to", help="Shorthand for --action native_transfer: recipient address")
     parser.add_argument("--amount", type=int, help="Shorthand for --action native_transfer: amount")
     parser.add_argument("--check-only", action="store_true", help="Only compute the hash and check status")
+    parser.add_argument("--input", help="Bulk mode: JSONL file of {action, params} ('-' for stdin); implies --check-only")
+    parser.add_argument("--output", default="-", help="Bulk mode: JSONL results file (default stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Bulk mode: hashing processes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Bulk mode: actions per hashing/status batch")
 
     args = parser.parse_args()
 
+    if args.input:
+        source = "mock" if USE_MOCK else "chain"
+        stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            totals = run_bulk(stream, out, args.workers, args.chunk_size, source)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if out is not sys.stdout:
+                out.close()
+        print(
+            f"[bulk] {totals['items']} actions ({totals['errors']} invalid, {totals['blacklisted']} blacklisted) "
+            f"in {totals['seconds']}s = {totals['perSecond']}/s",
+            file=sys.stderr,
+        )
+        return
+    if not args.action:
+        parser.error("--action is required (or use --input for bulk mode)")
+
     # Build params
     if args.params:
         try:
@@ -89,35 +228,19 @@ def main() -> None:
     if USE_MOCK:
         ensure_mock_db_initialized()
         if args.check_only:
-            status = get_mock_status(action_hash_hex)
+            status = get_mock_status(action_hash_hex, use_cache=False)
             print(f"Mock Status: {status} (2=Blacklisted, 0=Unknown)")
             return
         simulate_review_and_blacklist(action_hash_hex)
-        status = get_mock_status(action_hash_hex)
+        status = get_mock_status(action_hash_hex, use_cache=False)
         print(f"Final Mock Status: {status} (2=Blacklisted)")
         return
 
-    # Real mode (disabled by default). To enable, set USE_MOCK=False and provide env vars.
-    rpc_url = os.getenv("LOCAL_RPC_URL", "http://127.0.0.1:8545")
-    action_registry_address = os.getenv("ACTION_REGISTRY_ADDRESS")
-    if not action_registry_address:
+    # Real mode (disabled by default). To enable, set USE_MOCK=0 and provide env vars.
+    if not os.getenv("ACTION_REGISTRY_ADDRESS"):
         raise SystemExit("Set ACTION_REGISTRY_ADDRESS to query real ActionRegistry")
-
     try:
-        from web3 import Web3
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
-        action_registry_abi = [
-            {
-                "constant": True,
-                "inputs": [{"name": "actionHash", "type": "bytes32"}],
-                "name": "getActionStatus",
-                "outputs": [{"name": "", "type": "uint8"}],
-                "stateMutability": "view",
-                "type": "function",
-            }
-        ]
-        contract = w3.eth.contract(address=Web3.to_checksum_address(action_registry_address), abi=action_registry_abi)
-        status: int = contract.functions.getActionStatus(bytes.fromhex(action_hash_hex[2:])).call()
+        status = get_chain_status(action_hash_hex)
         print(f"On-chain Status: {status} (2=Blacklisted, 0=Unknown)")
     except Exception as exc:
         raise SystemExit(f"Failed to query on-chain status: {exc}")
@@ -1,5 +1,6 @@
-import json
-from web3 import Web3
+from typing import Iterable, List, Tuple
+
+from action_hash import action_hash, action_hashes
 
 def get_action_hash(action_name: str, params: dict) -> bytes:
     """Calculates the Keccak-256 hash of a canonicalized action payload.
@@ -15,15 +16,16 @@ def get_action_hash(action_name: str, params: dict) -> bytes:
     Returns:
         The Keccak-256 hash of the canonicalized action payload as bytes.
     """
-    payload = {
-        "action": action_name,
-        "params": dict(sorted(params.items()))
-    }
-    # Serialize to a compact string with no whitespace
-    compact_payload = json.dumps(payload, separators=(',', ':'))
-    
-    # Hash the string using Keccak-256
-    return Web3.keccak(text=compact_payload)
+    return action_hash(action_name, params)
+
+def get_action_hashes(items: Iterable[Tuple[str, dict]]) -> List[bytes]:
+    """Batch form of get_action_hash for (action_name, params) pairs.
+
+    The canonical form and resulting hashes are identical to calling
+    get_action_hash per item.
+    """
+    return action_hashes(items)
+
 
 # Example Usage (for testing within the file)
 if __name__ == "__main__":
@@ -1,76 +1,252 @@
+"""Coinbase AgentKit actions for POST /agent/run.
+
+One process-wide AgentKitSession imports AgentKit once and keeps one wallet
+client (and its connections) across requests. The client is rebuilt only
+when the CDP credentials or network in the environment change, or after
+refresh(). Actions run on a small bounded executor with a per-action
+timeout, so a hung wallet call cannot pin request threads. A timed-out
+action keeps running, so its result is {"ok": None, "pending": True,
+"requestId"}: the outcome is unknown (a transfer may still land) and
+outcome(requestId) reports it once the call returns.
+
+Environment:
+- CDP_PROJECT_ID, CDP_API_KEY_NAME, CDP_API_KEY_PRIVATE_KEY: AgentKit credentials
+- AGENTKIT_NETWORK: Network member name (default BASE_SEPOLIA)
+- AGENTKIT_MODULE: module providing AgentKit, AgentKitOptions, Network (default coinbase_agentkit; point at a fake for tests)
+- AGENTKIT_WORKERS: concurrent actions (default 1; transfers from one wallet share a nonce sequence)
+- AGENTKIT_MAX_PENDING: queued + running actions before new ones are rejected (default 32)
+- AGENTKIT_TIMEOUT: seconds to wait for one action (default 60)
+- AGENTKIT_EAGER: "1" builds the client at server start instead of on first use
+"""
+import importlib
 import os
-from typing import Any, Dict
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from types import ModuleType
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
-def is_agentkit_available() -> bool:
-	try:
-		import coinbase_agentkit  # type: ignore
-		return True
-	except Exception:
-		return False
+CREDENTIAL_ENV = ("CDP_PROJECT_ID", "CDP_API_KEY_NAME", "CDP_API_KEY_PRIVATE_KEY")
+INSTALL_HINT = "pip install coinbase-agentkit and set CDP_PROJECT_ID, CDP_API_KEY_NAME, CDP_API_KEY_PRIVATE_KEY"
+# Timed-out actions kept for outcome(); the oldest finished ones go first
+MAX_TRACKED_RUNS = 256
 
 
-def run_agent_action(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-	"""Attempt to execute an agent action via Coinbase AgentKit.
+class AgentKitUnavailable(RuntimeError):
+	"""AgentKit cannot be used; the message is returned to the caller as-is."""
 
-	If AgentKit or required credentials are missing, returns a descriptive error
-	instead of raising. This keeps the server functional without AgentKit.
-	"""
-	if not is_agentkit_available():
-		return {
-			"ok": False,
-			"error": "coinbase_agentkit not installed",
-			"hint": "pip install coinbase-agentkit and set CDP_PROJECT_ID, CDP_API_KEY_NAME, CDP_API_KEY_PRIVATE_KEY",
-		}
-
-	project_id = os.getenv("CDP_PROJECT_ID")
-	api_key_name = os.getenv("CDP_API_KEY_NAME")
-	api_key_private_key = os.getenv("CDP_API_KEY_PRIVATE_KEY")
-	if not project_id or not api_key_name or not api_key_private_key:
-		return {
-			"ok": False,
-			"error": "Missing CDP credentials in environment",
-			"required": ["CDP_PROJECT_ID", "CDP_API_KEY_NAME", "CDP_API_KEY_PRIVATE_KEY"],
-		}
-
-	try:
-		# Lazy import to keep dependency optional
-		from coinbase_agentkit import (  # type: ignore
-			AgentKit,
-			AgentKitOptions,
-			Network,
-		)
-
-		# Default to Base Sepolia for this MVP
-		network = Network.BASE_SEPOLIA
-		options = AgentKitOptions(
-			cdp_project_id=project_id,
-			cdp_api_key_name=api_key_name,
-			cdp_api_key_private_key=api_key_private_key,
-			network=network,
-		)
-		agent_kit = AgentKit.from_options(options)
-
-		# Minimal action routing. Extend as needed.
-		action_name = (action or "").strip().lower()
-		if action_name == "native_transfer":
-			to = str(params.get("to", ""))
-			amount = params.get("amount", 0)
-			# AgentKit wallet API names may differ; this is intentionally generic.
-			# Replace with the exact method for your AgentKit version.
+	def __init__(self, error: Dict[str, Any]):
+		super().__init__(error["error"])
+		self.error = error
+
+
+def _native_transfer(agent_kit: Any, params: Dict[str, Any]) -> Any:
+	# AgentKit wallet API names may differ between versions; adjust to yours
+	return agent_kit.wallet.transfer_native(
+		to_address=str(params.get("to", "")),
+		amount=float(params.get("amount", 0)),
+	)
+
+
+# Minimal action routing. Extend as needed.
+ACTIONS: Dict[str, Callable[[Any, Dict[str, Any]], Any]] = {
+	"native_transfer": _native_transfer,
+}
+
+
+class AgentKitSession:
+	def __init__(self, module_name: str = "coinbase_agentkit", workers: int = 1, max_pending: int = 32, timeout: float = 60.0):
+		self.module_name = module_name
+		self.timeout = timeout
+		self.max_pending = max_pending
+		self._module: Optional[ModuleType] = None
+		self._import_error: Optional[str] = None
+		self._client: Any = None
+		self._client_env: Optional[Tuple[Optional[str], ...]] = None
+		self._lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agentkit")
+		self._slots = threading.BoundedSemaphore(max_pending)
+		# Separate from _lock, which is held while a client builds: counting must not wait on that
+		self._stats_lock = threading.Lock()
+		self._timed_out: "OrderedDict[str, Future]" = OrderedDict()
+		self.builds = 0
+		self.actions = 0
+		self.failures = 0
+		self.timeouts = 0
+		self.rejected = 0
+		self.last_build_ms: Optional[float] = None
+
+	def _import(self) -> ModuleType:
+		# Import once; a missing package is remembered until refresh()
+		if self._module is None and self._import_error is None:
 			try:
-				# Example placeholder call; adjust to your AgentKit API.
-				result = agent_kit.wallet.transfer_native(
-					to_address=to,
-					amount=float(amount),
-				)
-				return {"ok": True, "result": result}
+				self._module = importlib.import_module(self.module_name)
 			except Exception as exc:
-				return {"ok": False, "error": f"transfer failed: {exc}"}
+				self._import_error = str(exc)
+		if self._module is None:
+			raise AgentKitUnavailable({"ok": False, "error": f"{self.module_name} not installed", "hint": INSTALL_HINT})
+		return self._module
+
+	def client(self) -> Any:
+		"""The shared AgentKit client, built on first use and again when the credentials or network change."""
+		env = tuple(os.getenv(name) for name in CREDENTIAL_ENV) + (os.getenv("AGENTKIT_NETWORK", "BASE_SEPOLIA"),)
+		if self._client is not None and env == self._client_env:
+			return self._client
+		with self._lock:
+			if self._client is not None and env == self._client_env:
+				return self._client
+			module = self._import()
+			if not all(env[:len(CREDENTIAL_ENV)]):
+				raise AgentKitUnavailable({"ok": False, "error": "Missing CDP credentials in environment", "required": list(CREDENTIAL_ENV)})
+			project_id, api_key_name, api_key_private_key, network = env
+			started = time.perf_counter()
+			options = module.AgentKitOptions(
+				cdp_project_id=project_id,
+				cdp_api_key_name=api_key_name,
+				cdp_api_key_private_key=api_key_private_key,
+				network=getattr(module.Network, network.upper()),
+			)
+			self._client = module.AgentKit.from_options(options)
+			self._client_env = env
+			self.builds += 1
+			self.last_build_ms = round((time.perf_counter() - started) * 1000, 3)
+			return self._client
+
+	def refresh(self) -> None:
+		"""Drop the client (and a remembered import failure); the next action rebuilds it."""
+		with self._lock:
+			self._client = None
+			self._client_env = None
+			self._module = None
+			self._import_error = None
 
-		return {"ok": False, "error": f"Unsupported action: {action_name}"}
+	def available(self) -> bool:
+		try:
+			self._import()
+			return True
+		except AgentKitUnavailable:
+			return False
 
-	except Exception as exc:
-		return {"ok": False, "error": str(exc)}
+	def warm(self) -> bool:
+		"""Build the client ahead of the first request. Returns False if AgentKit is unusable."""
+		try:
+			self.client()
+			return True
+		except Exception:
+			return False
 
+	def _execute(self, action_name: str, handler: Callable[[Any, Dict[str, Any]], Any], params: Dict[str, Any]) -> Dict[str, Any]:
+		try:
+			return {"ok": True, "result": handler(self.client(), params)}
+		except AgentKitUnavailable as exc:
+			return exc.error
+		except Exception as exc:
+			with self._stats_lock:
+				self.failures += 1
+			return {"ok": False, "error": f"{action_name} failed: {exc}"}
+		finally:
+			self._slots.release()
+
+	def run(self, action: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+		"""Run one action; returns {ok, result | error} instead of raising, or
+		{ok: None, pending: True, requestId} when it outlives the timeout."""
+		action_name = (action or "").strip().lower()
+		handler = ACTIONS.get(action_name)
+		if handler is None:
+			return {"ok": False, "error": f"Unsupported action: {action_name}"}
+		if not self._slots.acquire(blocking=False):
+			with self._stats_lock:
+				self.rejected += 1
+			return {"ok": False, "error": "AgentKit busy", "maxPending": self.max_pending}
+		with self._stats_lock:
+			self.actions += 1
+		request_id = uuid.uuid4().hex
+		wait = self.timeout if timeout is None else timeout
+		future = self._executor.submit(self._execute, action_name, handler, params)
+		try:
+			return {**future.result(timeout=wait), "requestId": request_id}
+		except FutureTimeout:
+			# The call keeps its slot until it returns, so stuck calls still count against max_pending
+			with self._stats_lock:
+				self.timeouts += 1
+				self._timed_out[request_id] = future
+				self._forget_finished()
+			return {
+				"ok": None,
+				"pending": True,
+				"requestId": request_id,
+				"error": f"{action_name} still running after {wait}s; outcome unknown, check the request before retrying",
+				"timeout": wait,
+			}
 
+	def _forget_finished(self) -> None:
+		excess = len(self._timed_out) - MAX_TRACKED_RUNS
+		for request_id in [rid for rid, f in self._timed_out.items() if f.done()][:max(excess, 0)]:
+			del self._timed_out[request_id]
+
+	def outcome(self, request_id: str) -> Optional[Dict[str, Any]]:
+		"""Result of an action that timed out: pending while it runs, then its {ok, ...}.
+		None for unknown ids (never timed out, or no longer tracked)."""
+		with self._stats_lock:
+			future = self._timed_out.get(request_id)
+		if future is None:
+			return None
+		if not future.done():
+			return {"ok": None, "pending": True, "requestId": request_id}
+		return {**future.result(), "requestId": request_id}
+
+	def stats(self) -> Dict[str, Any]:
+		with self._stats_lock:
+			return {
+				"module": self.module_name,
+				"available": self._module is not None,
+				"ready": self._client is not None,
+				"builds": self.builds,
+				"lastBuildMs": self.last_build_ms,
+				"actions": self.actions,
+				"failures": self.failures,
+				"timeouts": self.timeouts,
+				"rejected": self.rejected,
+				"unresolvedTimeouts": sum(1 for f in self._timed_out.values() if not f.done()),
+			}
+
+
+_session: Optional[AgentKitSession] = None
+_session_lock = threading.Lock()
+
+
+def get_agentkit_session() -> AgentKitSession:
+	global _session
+	if _session is not None:
+		return _session
+	with _session_lock:
+		if _session is None:
+			_session = AgentKitSession(
+				module_name=os.getenv("AGENTKIT_MODULE", "coinbase_agentkit"),
+				workers=int(os.getenv("AGENTKIT_WORKERS", "1")),
+				max_pending=int(os.getenv("AGENTKIT_MAX_PENDING", "32")),
+				timeout=float(os.getenv("AGENTKIT_TIMEOUT", "60")),
+			)
+	return _session
+
+
+def warm_agentkit() -> None:
+	"""Server start hook: build the client now when AGENTKIT_EAGER=1."""
+	if os.getenv("AGENTKIT_EAGER", "0").lower() in ("1", "true", "yes"):
+		get_agentkit_session().warm()
+
+
+def is_agentkit_available() -> bool:
+	return get_agentkit_session().available()
+
+
+def run_agent_action(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+	"""Attempt to execute an agent action via Coinbase AgentKit.
+
+	If AgentKit or required credentials are missing, returns a descriptive error
+	instead of raising. This keeps the server functional without AgentKit.
+	"""
+	return get_agentkit_session().run(action, params)
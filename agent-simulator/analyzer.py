@@ -1,62 +1,184 @@
+"""Action risk assessment (LLM with heuristic fallback) behind a content-addressed cache.
+
+Assessments are cached by the canonical action hash, so repeat flags of the
+same (action, params) reuse one LLM call, and concurrent flags of the same
+action share the in-flight call.
+
+Environment:
+- OPENAI_API_KEY: enables the LLM assessment (heuristics otherwise)
+- RISK_RULES_PATH: heuristic rule table (default risk_rules.json, see risk_rules.py)
+- ASSESSMENT_CACHE_SIZE: max cached assessments (default 10000)
+- ASSESSMENT_CACHE_TTL: seconds an assessment stays valid (default 86400)
+- ASSESSMENT_CACHE_PATH: optional JSON file the cache is persisted to
+- ASSESSMENT_CACHE_SAVE_INTERVAL: min seconds between saves (default 5)
+"""
+import atexit
 import json
 import os
-from typing import Any, Dict
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from action_hash import action_hash
+from metrics import timed
+from risk_rules import get_risk_engine
+from store import normalize_hash
+from ttl_cache import MISS, TtlCache
+
+
+LLM_MODEL = "gpt-4o-mini"
 
 
 def _heuristic_score(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-	label = "benign"
-	risk_score = 0.15
-	reasons = []
-	action_lower = (action or "").lower()
-	try:
-		amount = float(params.get("amount", 0)) if isinstance(params, dict) else 0
-	except Exception:
-		amount = 0
-	if "transfer" in action_lower:
-		risk_score += 0.2
-		reasons.append("Action involves a transfer")
-	if amount and amount > 1:
-		risk_score += 0.35
-		reasons.append("Large notional amount")
-	if "to" in params and str(params.get("to", "")).lower() in {"0x0000000000000000000000000000000000000000"}:
-		risk_score += 0.2
-		reasons.append("Suspicious recipient")
-	if risk_score >= 0.5:
-		label = "suspicious"
-	return {"riskScore": round(min(max(risk_score, 0.0), 1.0), 2), "label": label, "reasons": reasons}
+	return get_risk_engine().score(action, params)
 
 
-def analyze_action(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-	"""Return a GenKit-style assessment. Falls back to heuristics if no LLM configured."""
+def heuristic_scores(items: Iterable[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+	"""Rule-engine assessments for many (action, params) pairs in one columnar pass."""
+	return get_risk_engine().score_batch(items).to_dicts()
+
+
+@timed("llm")
+def _llm_score(api_key: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+	# Lazy import so the module remains optional
+	import openai  # type: ignore
+	openai.api_key = api_key
+	prompt = (
+		"You are a compliance and risk assistant for on-chain AI agents.\n"
+		"Given an action name and JSON params, output a JSON object with keys: riskScore (0-1), label ('benign'|'suspicious'), reasons (array of short strings).\n"
+		"Be concise and deterministic.\n\n"
+		f"Action: {action}\nParams JSON: {json.dumps(params, separators=(',', ':'), sort_keys=True)}\n"
+	)
+	resp = openai.ChatCompletion.create(  # compatible with legacy SDKs
+		model=LLM_MODEL,
+		messages=[{"role": "system", "content": "Return only valid JSON."}, {"role": "user", "content": prompt}],
+		temperature=0.1,
+	)
+	content = resp["choices"][0]["message"]["content"]
+	data = json.loads(content)
+	# Normalize
+	return {
+		"riskScore": float(data.get("riskScore", 0)),
+		"label": str(data.get("label", "benign")),
+		"reasons": list(data.get("reasons", [])),
+	}
+
+
+class _LlmStats:
+	def __init__(self):
+		self.calls = 0
+		self.errors = 0
+		self.ms_total = 0.0
+		self._lock = threading.Lock()
+
+	def record(self, ms: float, ok: bool) -> None:
+		with self._lock:
+			self.calls += 1
+			self.ms_total += ms
+			if not ok:
+				self.errors += 1
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"llmCalls": self.calls,
+			"llmErrors": self.errors,
+			"llmMsTotal": round(self.ms_total, 2),
+			"llmMsAvg": round(self.ms_total / self.calls, 2) if self.calls else None,
+		}
+
+
+_llm_stats = _LlmStats()
+
+
+def _analyze(action: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+	"""Returns (assessment, from_fallback). Fallbacks after LLM errors are not cached."""
 	# Optional LLM: set OPENAI_API_KEY to enable
 	api_key = os.getenv("OPENAI_API_KEY")
 	if not api_key:
-		return _heuristic_score(action, params)
+		return _heuristic_score(action, params), False
+	start = time.perf_counter()
 	try:
-		# Lazy import so the module remains optional
-		import openai  # type: ignore
-		openai.api_key = api_key
-		prompt = (
-			"You are a compliance and risk assistant for on-chain AI agents.\n"
-			"Given an action name and JSON params, output a JSON object with keys: riskScore (0-1), label ('benign'|'suspicious'), reasons (array of short strings).\n"
-			"Be concise and deterministic.\n\n"
-			f"Action: {action}\nParams JSON: {json.dumps(params, separators=(',', ':'), sort_keys=True)}\n"
-		)
-		resp = openai.ChatCompletion.create(  # compatible with legacy SDKs
-			model="gpt-4o-mini",
-			messages=[{"role": "system", "content": "Return only valid JSON."}, {"role": "user", "content": prompt}],
-			temperature=0.1,
-		)
-		content = resp["choices"][0]["message"]["content"]
-		data = json.loads(content)
-		# Normalize
-		return {
-			"riskScore": float(data.get("riskScore", 0)),
-			"label": str(data.get("label", "benign")),
-			"reasons": list(data.get("reasons", [])),
-		}
+		result = _llm_score(api_key, action, params)
 	except Exception:
 		# Fall back gracefully
-		return _heuristic_score(action, params)
+		_llm_stats.record((time.perf_counter() - start) * 1000, False)
+		return _heuristic_score(action, params), True
+	_llm_stats.record((time.perf_counter() - start) * 1000, True)
+	return result, False
+
+
+def analyze_action(action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+	"""Return a GenKit-style assessment. Falls back to heuristics if no LLM configured."""
+	return _analyze(action, params)[0]
+
+
+_cache: Optional[TtlCache] = None
+_cache_lock = threading.Lock()
+_last_save = 0.0
+
+
+def _cache_path() -> Optional[Path]:
+	path = os.getenv("ASSESSMENT_CACHE_PATH")
+	return Path(path) if path else None
+
+
+def get_assessment_cache() -> TtlCache:
+	global _cache
+	if _cache is not None:
+		return _cache
+	with _cache_lock:
+		if _cache is None:
+			cache = TtlCache(
+				max_entries=int(os.getenv("ASSESSMENT_CACHE_SIZE", "10000")),
+				ttl=float(os.getenv("ASSESSMENT_CACHE_TTL", "86400")),
+			)
+			path = _cache_path()
+			if path is not None:
+				cache.load(path)
+				atexit.register(cache.save, path)
+			_cache = cache
+	return _cache
+
+
+def _maybe_save(cache: TtlCache) -> None:
+	global _last_save
+	path = _cache_path()
+	interval = float(os.getenv("ASSESSMENT_CACHE_SAVE_INTERVAL", "5"))
+	if path is None or time.monotonic() - _last_save < interval:
+		return
+	_last_save = time.monotonic()
+	try:
+		cache.save(path)
+	except OSError:
+		pass
+
+
+@timed("analyzer")
+def assess_action(action: str, params: Dict[str, Any], action_hash_hex: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+	"""Cached analyze_action. Returns (assessment, info) where info is
+	{cached, source: hit | miss | coalesced, latencyMs}."""
+	start = time.perf_counter()
+	if action_hash_hex is None:
+		action_hash_hex = action_hash(action, params).hex()
+	# LLM and heuristic results are cached separately so toggling the key takes effect
+	source_key = LLM_MODEL if os.getenv("OPENAI_API_KEY") else "heuristic"
+	cache = get_assessment_cache()
+	(result, fallback), source = cache.get_or_load(
+		f"{source_key}:{normalize_hash(action_hash_hex)}",
+		lambda: _analyze(action, params),
+		should_cache=lambda value: not value[1],
+	)
+	if source == MISS:
+		_maybe_save(cache)
+	info = {
+		"cached": source != MISS,
+		"source": source,
+		"latencyMs": round((time.perf_counter() - start) * 1000, 3),
+	}
+	# Callers may mutate the assessment (e.g. when storing it); hand out a copy
+	return {**result, "reasons": list(result.get("reasons", []))}, info
 
 
+def assessment_stats() -> Dict[str, Any]:
+	return {**get_assessment_cache().stats(), **_llm_stats.to_dict()}
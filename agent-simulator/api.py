@@ -0,0 +1,646 @@
+"""Framework-neutral route handlers for the Agent API.
+
+Handlers take an ApiRequest plus path parameters and return a JSON-able
+payload, optionally with a status code and headers. server.py (Flask) and
+asgi_server.py (Starlette) both serve the same ROUTES table.
+
+Route modes tell async servers how to run a handler:
+- "inline": in-memory and cheap, safe to run on the event loop
+- "storage": touches the store, run on the default worker threads
+- "slow": outbound HTTP / LLM / AgentKit, run on a separate bounded pool
+"""
+import importlib
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from action_hash import cache_info as hash_cache_info, keccak256
+from analyzer import assess_action, assessment_stats, heuristic_scores
+from cdp_wallet import signer_stats
+from agentkit_runner import get_agentkit_session, run_agent_action, warm_agentkit
+from blacklist_batcher import get_blacklist_batcher
+from cdp_sql import cached_cdp_sql, get_sql_cache, result_rows
+from chain_indexer import get_chain_index, get_indexer, start_indexer
+from agent_sim import (
+	compute_action_hash,
+	compute_action_hashes,
+	get_mock_status,
+	get_chain_statuses,
+	get_mock_statuses,
+	simulate_review_and_blacklist,
+	ensure_mock_db_initialized,
+)
+from http_client import get_http_client
+from guard import guard_action, guard_stats
+from events import open_stream, get_event_log, publish_task_event
+from jobs import get_job_queue
+import metrics
+from membership import get_blacklist_cache, note_blacklisted
+from store import DuplicateVote, TaskNotFound, TaskResolved, get_store
+from task_archive import get_archiver, start_archiver
+from ttl_cache import MISS, TtlCache
+
+
+class ApiRequest:
+	def __init__(self, json: Any = None, args: Optional[Mapping[str, str]] = None, headers: Optional[Mapping[str, str]] = None, remote_addr: Optional[str] = None):
+		self.json = json if json is not None else {}
+		self.args = args or {}
+		self.headers = headers or {}
+		self.remote_addr = remote_addr
+
+
+class Route:
+	def __init__(self, path: str, methods: List[str], handler: Callable[..., Any], mode: str):
+		self.path = path
+		self.methods = methods
+		self.handler = handler
+		self.mode = mode
+
+
+ROUTES: List[Route] = []
+
+
+def route(path: str, methods: List[str], mode: str = "storage") -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+	"""Register a handler. Path parameters use {name} syntax."""
+	def register(handler: Callable[..., Any]) -> Callable[..., Any]:
+		ROUTES.append(Route(path, methods, handler, mode))
+		return handler
+	return register
+
+
+class TextResponse:
+	"""A non-JSON response body (e.g. /metrics); adapters send it as-is."""
+
+	def __init__(self, body: str, media_type: str = "text/plain; charset=utf-8"):
+		self.body = body
+		self.media_type = media_type
+
+
+class NdjsonStream:
+	"""Rows sent as newline-delimited JSON, serialized chunk by chunk as the client reads."""
+
+	media_type = "application/x-ndjson"
+	headers: Dict[str, str] = {}
+
+	def __init__(self, rows: Sequence[Any], chunk_rows: int = 500):
+		self.rows = rows
+		self.chunk_rows = chunk_rows
+
+	def iter_sync(self) -> Iterator[str]:
+		for start in range(0, len(self.rows), self.chunk_rows):
+			yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in self.rows[start:start + self.chunk_rows])
+
+	async def iter_async(self) -> AsyncIterator[str]:
+		import anyio
+
+		for chunk in self.iter_sync():
+			yield chunk
+			# Let other requests run between chunks of a large result
+			await anyio.sleep(0)
+
+
+def split_result(result: Any) -> Tuple[Any, int, Dict[str, str]]:
+	"""Normalize a handler result to (payload, status, headers)."""
+	if isinstance(result, tuple):
+		payload, status = result[0], result[1]
+		headers = result[2] if len(result) > 2 else {}
+		return payload, status, headers
+	return result, 200, {}
+
+
+def warm_imports() -> None:
+	"""Load the dependencies that are otherwise imported on first use
+	(Keccak backend, NumPy, requests, PyJWT), so no request pays for them."""
+	keccak256(b"")
+	heuristic_scores([("warm_up", {})])
+	for module in ("requests", "jwt"):
+		try:
+			importlib.import_module(module)
+		except ImportError:
+			pass
+
+
+def warm_up() -> None:
+	"""Open the store and load the blacklist cache before serving traffic, and
+	re-queue unsubmitted blacklist hashes. AGENT_EAGER_IMPORTS=1 also preloads
+	the heavy dependencies."""
+	ensure_mock_db_initialized()
+	get_blacklist_cache()
+	get_blacklist_batcher()
+	start_indexer()
+	start_archiver(get_store())
+	warm_agentkit()
+	if os.getenv("AGENT_EAGER_IMPORTS", "0").lower() in ("1", "true", "yes"):
+		warm_imports()
+
+
+MAX_BATCH_ITEMS = int(os.getenv("AGENT_MAX_BATCH", "1000"))
+# Votes for blacklisting needed to resolve a task; ReviewOracle.sol uses QUORUM = 3
+REVIEW_QUORUM = int(os.getenv("REVIEW_QUORUM", "3"))
+# Responses kept for Idempotency-Key replays
+_idempotent_responses = TtlCache(int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")), float(os.getenv("IDEMPOTENCY_TTL", "86400")))
+
+
+def _idempotent(req: ApiRequest, scope: str, handler: Callable[[], Any]) -> Any:
+	"""Run handler once per Idempotency-Key; retries (even concurrent ones) get the first response.
+
+	Server errors are not remembered, so a retry after a 5xx runs again.
+	"""
+	key = req.headers.get("Idempotency-Key")
+	if not key:
+		return handler()
+	fingerprint = json.dumps(req.json, sort_keys=True, separators=(",", ":"), default=str)
+	(first_fingerprint, result), source = _idempotent_responses.get_or_load(
+		f"{scope}:{key}",
+		lambda: (fingerprint, split_result(handler())),
+		should_cache=lambda value: value[1][1] < 500,
+	)
+	if first_fingerprint != fingerprint:
+		return {"error": "Idempotency-Key was already used for a different request."}, 422
+	payload, status, headers = result
+	if source != MISS:
+		headers = {**headers, "Idempotent-Replayed": "true"}
+	return payload, status, headers
+
+
+def _hash_batch_items(items: list) -> list:
+	"""Hash a list of {action, params} items in one pass, keeping per-item errors in place."""
+	results: list = [None] * len(items)
+	valid = []
+	for i, item in enumerate(items):
+		action = item.get("action") if isinstance(item, dict) else None
+		params = item.get("params", {}) if isinstance(item, dict) else None
+		if not action or not isinstance(action, str) or not isinstance(params, dict):
+			results[i] = {"error": "Provide 'action' and 'params' (object)."}
+		else:
+			valid.append((i, action, params))
+	for (i, _, _), h in zip(valid, compute_action_hashes((a, p) for _, a, p in valid)):
+		results[i] = {"hash": h}
+	return results
+
+
+def _batch_from_request(req: ApiRequest, key: str):
+	data = req.json
+	items = data.get(key)
+	if not isinstance(items, list):
+		return None, ({"error": f"Provide '{key}' (array)."}, 400)
+	if len(items) > MAX_BATCH_ITEMS:
+		return None, ({"error": f"Batch too large (max {MAX_BATCH_ITEMS})."}, 400)
+	return items, None
+
+
+@route("/hash", ["POST"], "inline")
+def hash_action(req: ApiRequest):
+	data = req.json
+	action = data.get("action")
+	params = data.get("params", {})
+	if not action or not isinstance(params, dict):
+		return {"error": "Provide 'action' and 'params' (object)."}, 400
+	action_hash_hex = compute_action_hash(action, params)
+	return {"hash": action_hash_hex}
+
+
+@route("/risk/batch", ["POST"], "inline")
+def risk_batch(req: ApiRequest):
+	"""Rule-engine pre-screen for queued actions, without LLM calls."""
+	items, error = _batch_from_request(req, "items")
+	if error:
+		return error
+	results: list = [None] * len(items)
+	valid = []
+	for i, item in enumerate(items):
+		params = item.get("params", {}) if isinstance(item, dict) else None
+		if not isinstance(item, dict) or not item.get("action") or not isinstance(params, dict):
+			results[i] = {"error": "Provide 'action' and 'params' (object)."}
+		else:
+			valid.append((i, item["action"], params))
+	for (i, _, _), assessment in zip(valid, heuristic_scores((a, p) for _, a, p in valid)):
+		results[i] = assessment
+	return {"results": results}
+
+
+@route("/status/{action_hash}", ["GET"], "inline")
+def status_action(req: ApiRequest, action_hash: str):
+	if req.args.get("source") == "chain":
+		# The chain index is SQLite, which this event-loop route must not touch
+		return {"location": f"/chain/status/{action_hash}"}, 307, {"Location": f"/chain/status/{action_hash}"}
+	ensure_mock_db_initialized()
+	status = get_mock_status(action_hash)
+	return {"status": status}
+
+
+@route("/chain/status/{action_hash}", ["GET"])
+def chain_status_action(req: ApiRequest, action_hash: str):
+	"""Chain truth from the event index (see chain_indexer.py), no RPC round trip.
+	An index that is off or behind can't tell "not blacklisted" from "not seen yet"."""
+	indexer = get_indexer()
+	if indexer is None:
+		return {"error": "Chain index is not running; set INDEXER_RPC_URL (or LOCAL_RPC_URL) and the contract addresses.", "source": "chain"}, 503
+	stats = indexer.stats()
+	if not stats["caughtUp"]:
+		return {"error": "Chain index is behind the chain; retry shortly.", "source": "chain", "indexedBlock": stats["checkpoint"], "head": stats["head"], "lastError": stats["lastError"]}, 503
+	return {"status": get_chain_index().status(action_hash), "source": "chain", "indexedBlock": stats["checkpoint"]}
+
+
+@route("/hash/batch", ["POST"], "inline")
+def hash_batch(req: ApiRequest):
+	items, error = _batch_from_request(req, "items")
+	if error:
+		return error
+	return {"results": _hash_batch_items(items)}
+
+
+def _status_batch_entries(req: ApiRequest):
+	"""Hash results for a /status/batch-style body: precomputed hashes or {action, params} items."""
+	data = req.json
+	key = "items" if "items" in data else "hashes"
+	entries, error = _batch_from_request(req, key)
+	if error:
+		return None, error
+	if key == "items":
+		return _hash_batch_items(entries), None
+	return [
+		{"hash": h} if isinstance(h, str) and h else {"error": "Hash must be a non-empty string."}
+		for h in entries
+	], None
+
+
+@route("/status/batch", ["POST"], "inline")
+def status_batch(req: ApiRequest):
+	results, error = _status_batch_entries(req)
+	if error:
+		return error
+	ok = [r for r in results if "hash" in r]
+	for r, status in zip(ok, get_mock_statuses([r["hash"] for r in ok])):
+		r["status"] = status
+	return {"results": results}
+
+
+@route("/chain/status/batch", ["POST"], "slow")
+def chain_status_batch(req: ApiRequest):
+	"""Live ActionRegistry statuses, read with one batched RPC round trip."""
+	results, error = _status_batch_entries(req)
+	if error:
+		return error
+	ok = [r for r in results if "hash" in r]
+	try:
+		statuses = get_chain_statuses([r["hash"] for r in ok])
+	except Exception as exc:
+		return {"error": f"Failed to query on-chain status: {exc}"}, 502
+	for r, status in zip(ok, statuses):
+		r["status"] = status
+	return {"results": results}
+
+
+@route("/blacklist", ["POST"], "inline")
+def blacklist_action(req: ApiRequest):
+	data = req.json
+	action = data.get("action")
+	params = data.get("params", {})
+	if not action or not isinstance(params, dict):
+		return {"error": "Provide 'action' and 'params' (object)."}, 400
+	action_hash_hex = compute_action_hash(action, params)
+	if get_mock_status(action_hash_hex) == 2:
+		return {"hash": action_hash_hex, "status": 2}
+	job = get_job_queue().submit("blacklist", _review_and_blacklist_job, action_hash_hex)
+	return {"hash": action_hash_hex, "status": 0, "jobId": job.id}, 202
+
+
+def _review_and_blacklist_job(action_hash_hex: str) -> dict:
+	simulate_review_and_blacklist(action_hash_hex)
+	return {"hash": action_hash_hex, "status": 2}
+
+
+@route("/jobs/{job_id}", ["GET"], "inline")
+def job_status(req: ApiRequest, job_id: str):
+	job = get_job_queue().get(job_id)
+	if job is None:
+		return {"error": "Unknown job"}, 404
+	return job.to_dict()
+
+
+@route("/health", ["GET"], "inline")
+def health(req: ApiRequest):
+	batcher = get_blacklist_batcher()
+	indexer = get_indexer()
+	archiver = get_archiver()
+	return {
+		"ok": True,
+		"blacklistCache": get_blacklist_cache().stats(),
+		"jobs": get_job_queue().stats(),
+		"outbound": get_http_client().breaker_states(),
+		"cdpSigner": signer_stats(),
+		"assessments": assessment_stats(),
+		"blacklistBatcher": batcher.stats() if batcher else None,
+		"chainIndexer": indexer.stats() if indexer else None,
+		"agentkit": get_agentkit_session().stats(),
+		"sqlCache": get_sql_cache().stats(),
+		"guard": guard_stats(),
+		"taskArchive": {**get_store().archive.stats(), "archiver": archiver.stats() if archiver else None},
+	}
+
+def _runtime_samples() -> Iterator[metrics.Sample]:
+	"""Cache hit ratios and queue depths for /metrics, read from the same stats as /health."""
+	assessments = assessment_stats()
+	hashes = hash_cache_info()
+	hash_lookups = hashes["hits"] + hashes["misses"]
+	yield ("agent_cache_hit_ratio", "Hit ratio per cache since start.", {"cache": "assessments"}, assessments["hitRatio"])
+	yield ("agent_cache_hit_ratio", "Hit ratio per cache since start.", {"cache": "action_hash"}, hashes["hits"] / hash_lookups if hash_lookups else None)
+	sql = get_sql_cache().stats()
+	yield ("agent_cache_hit_ratio", "Hit ratio per cache since start.", {"cache": "cdp_sql"}, sql["hitRatio"])
+	yield ("agent_cache_entries", "Entries held per cache.", {"cache": "assessments"}, assessments["entries"])
+	yield ("agent_cache_entries", "Entries held per cache.", {"cache": "cdp_sql"}, sql["entries"])
+	yield ("agent_cache_entries", "Entries held per cache.", {"cache": "action_hash"}, hashes["size"])
+	blacklist = get_blacklist_cache().stats()
+	yield ("agent_cache_entries", "Entries held per cache.", {"cache": "blacklist"}, blacklist["entries"])
+	yield ("agent_blacklist_bloom_negative_ratio", "Status lookups answered by the Bloom filter alone.", {}, blacklist["bloomNegatives"] / blacklist["lookups"] if blacklist["lookups"] else None)
+	yield ("agent_llm_calls", "LLM assessment calls since start.", {}, assessments["llmCalls"])
+	yield ("agent_llm_errors", "LLM assessment failures since start.", {}, assessments["llmErrors"])
+	jobs = get_job_queue().stats()
+	yield ("agent_queue_depth", "Work waiting or running per queue.", {"queue": "review_jobs", "state": "queued"}, jobs["queued"])
+	yield ("agent_queue_depth", "Work waiting or running per queue.", {"queue": "review_jobs", "state": "running"}, jobs["running"])
+	batcher = get_blacklist_batcher()
+	if batcher:
+		batches = batcher.stats()
+		yield ("agent_queue_depth", "Work waiting or running per queue.", {"queue": "blacklist_hashes", "state": "queued"}, batches["pendingHashes"])
+		for status, count in batches["batches"].items():
+			yield ("agent_blacklist_batches", "Retained blacklist batches by status.", {"status": status}, count)
+	indexer = get_indexer()
+	if indexer:
+		yield ("agent_chain_indexer_lag_blocks", "Blocks between the chain head and the index checkpoint.", {}, indexer.stats()["lag"])
+	archive = get_store().archive.stats()
+	yield ("agent_task_archive_records", "Records in the resolved-task archive.", {}, archive["records"])
+	yield ("agent_task_archive_bytes", "Archive size on disk and of its in-memory index.", {"kind": "segments"}, archive["bytes"])
+	yield ("agent_task_archive_bytes", "Archive size on disk and of its in-memory index.", {"kind": "index"}, archive["indexBytes"])
+	for decision, count in guard_stats()["decisions"].items():
+		yield ("agent_guard_decisions", "/guard/execute decisions since start.", {"decision": decision}, count)
+	for host, breaker in get_http_client().breaker_states().items():
+		yield ("agent_outbound_breaker_open", "1 when the host's circuit breaker is not closed.", {"host": host}, 0 if breaker.get("state") == "closed" else 1)
+
+
+metrics.register_collector(_runtime_samples)
+
+
+@route("/metrics", ["GET"], "inline")
+def metrics_endpoint(req: ApiRequest):
+	return TextResponse(metrics.render(), metrics.CONTENT_TYPE)
+
+
+@route("/reset", ["POST"])
+def reset(req: ApiRequest):
+	# Clear the mock blacklist DB
+	try:
+		get_store().reset()
+		get_blacklist_cache().clear()
+		publish_task_event("tasks.reset", {})
+		return {"ok": True}
+	except Exception as exc:
+		return {"ok": False, "error": str(exc)}, 500
+
+
+# --- Reviewer Workflow (Mock) ---
+
+@route("/flag", ["POST"], "slow")
+def flag_action(req: ApiRequest):
+	data = req.json
+	action = data.get("action")
+	params = data.get("params", {})
+	if not action or not isinstance(params, dict):
+		return {"error": "Provide 'action' and 'params' (object)."}, 400
+	return _idempotent(req, "flag", lambda: _flag(action, params))
+
+
+def _flag(action: str, params: dict):
+	action_hash_hex = compute_action_hash(action, params)
+	# Like ReviewOracle.flagActionForReview: no review for hashes that are already blacklisted
+	if get_blacklist_cache().contains(action_hash_hex):
+		return {"error": "Action already known", "hash": action_hash_hex, "status": "blacklisted"}, 409
+	store = get_store()
+	# Repeat flags join the open task without another assessment
+	open_task = store.find_open_task(action_hash_hex)
+	if open_task is None:
+		ai, ai_info = assess_action(action, params, action_hash_hex)
+	else:
+		ai, ai_info = open_task.get("ai"), {"cached": True, "latencyMs": 0.0}
+	task, created = store.flag_task(action_hash_hex, action, params, ai)
+	if created:
+		publish_task_event("task.flagged", task)
+	else:
+		publish_task_event("task.reflagged", {"id": task["id"], "flagCount": task["flagCount"], "lastSeen": task.get("lastSeen")})
+	return {
+		"taskId": task["id"],
+		"hash": action_hash_hex,
+		"ai": task.get("ai"),
+		"duplicate": not created,
+		"flagCount": task["flagCount"],
+		"aiCached": ai_info["cached"],
+		"aiLatencyMs": ai_info["latencyMs"],
+	}
+
+
+TASK_PAGE_MAX = 1000
+_TASK_QUERY_ARGS = ("cursor", "limit", "unresolved", "label", "minRisk", "fields")
+
+
+def _task_summary(task: dict) -> dict:
+	ai = task.get("ai")
+	summary = {k: v for k, v in task.items() if k not in ("params", "ai")}
+	if ai:
+		summary["ai"] = {"label": ai.get("label"), "riskScore": ai.get("riskScore")}
+	return summary
+
+
+@route("/tasks", ["GET"])
+def list_tasks(req: ApiRequest):
+	# Taken before reading so a stream resumed from it replays anything we miss
+	resume_token = get_event_log().token()
+	args = req.args
+	if not any(k in args for k in _TASK_QUERY_ARGS):
+		return {"tasks": get_store().list_tasks(), "quorum": REVIEW_QUORUM, "resumeToken": resume_token}
+	try:
+		after = int(args["cursor"]) if args.get("cursor") else None
+		limit = min(max(int(args.get("limit", 100)), 1), TASK_PAGE_MAX)
+		min_risk = float(args["minRisk"]) if args.get("minRisk") else None
+	except ValueError:
+		return {"error": "'cursor' and 'limit' must be integers, 'minRisk' a number."}, 400
+	tasks = get_store().query_tasks(
+		after=after,
+		limit=limit,
+		unresolved=args.get("unresolved", "").lower() in ("1", "true", "yes"),
+		label=args.get("label") or None,
+		min_risk=min_risk,
+	)
+	if args.get("fields") == "summary":
+		tasks = [_task_summary(t) for t in tasks]
+	next_cursor = str(tasks[-1]["id"]) if len(tasks) == limit else None
+	return {"tasks": tasks, "nextCursor": next_cursor, "quorum": REVIEW_QUORUM, "resumeToken": resume_token}
+
+
+@route("/tasks/archive", ["GET"])
+def archived_tasks(req: ApiRequest):
+	"""Resolved tasks moved out of the hot store: ?hash=<action hash>, or ?cursor=<id>&to=<id>&limit=N in id order."""
+	archive = get_store().archive
+	if req.args.get("hash"):
+		return {"tasks": archive.find_by_hash(req.args["hash"])}
+	try:
+		after = int(req.args["cursor"]) if req.args.get("cursor") else -1
+		end = int(req.args["to"]) if req.args.get("to") else None
+		limit = min(max(int(req.args.get("limit", 100)), 1), TASK_PAGE_MAX)
+	except ValueError:
+		return {"error": "'cursor', 'to' and 'limit' must be integers."}, 400
+	tasks = archive.range(after + 1, end, limit)
+	next_cursor = str(tasks[-1]["id"]) if len(tasks) == limit else None
+	return {"tasks": tasks, "nextCursor": next_cursor}
+
+
+@route("/chain/tasks", ["GET"])
+def chain_tasks(req: ApiRequest):
+	"""ReviewOracle tasks mirrored by the chain indexer, in task id order."""
+	try:
+		after = int(req.args["cursor"]) if req.args.get("cursor") else None
+		limit = min(max(int(req.args.get("limit", 100)), 1), TASK_PAGE_MAX)
+	except ValueError:
+		return {"error": "'cursor' and 'limit' must be integers."}, 400
+	tasks = get_chain_index().tasks(after, limit)
+	next_cursor = str(tasks[-1]["taskId"]) if len(tasks) == limit else None
+	return {"tasks": tasks, "nextCursor": next_cursor, "indexedBlock": get_chain_index().checkpoint()}
+
+
+@route("/tasks/stream", ["GET"], "inline")
+def stream_tasks(req: ApiRequest):
+	"""Server-Sent Events feed of task changes; resume with ?since=<token> or Last-Event-ID."""
+	return open_stream(req.args.get("since") or req.headers.get("Last-Event-ID"))
+
+
+@route("/agent/run", ["POST"], "slow")
+def agent_run(req: ApiRequest):
+	data = req.json
+	action = data.get("action")
+	params = data.get("params", {})
+	if not action or not isinstance(params, dict):
+		return {"ok": False, "error": "Provide 'action' and 'params' (object)."}, 400
+	result = run_agent_action(action, params)
+	# Timed out but still running: the outcome is unknown, poll /agent/run/<requestId>
+	return (result, 202) if result.get("pending") else result
+
+
+@route("/agent/run/{request_id}", ["GET"], "inline")
+def agent_run_outcome(req: ApiRequest, request_id: str):
+	"""Outcome of an /agent/run call that answered pending."""
+	outcome = get_agentkit_session().outcome(request_id)
+	if outcome is None:
+		return {"error": "Unknown requestId"}, 404
+	return outcome
+
+
+@route("/guard/execute", ["POST"], "slow")
+def guard_execute(req: ApiRequest):
+	"""/status + /flag assessment + /agent/run in one call, with the checks run concurrently (see guard.py)."""
+	data = req.json
+	action = data.get("action")
+	params = data.get("params", {})
+	if not action or not isinstance(params, dict):
+		return {"ok": False, "error": "Provide 'action' and 'params' (object)."}, 400
+	deadline_ms = data.get("deadlineMs")
+	if deadline_ms is not None and (not isinstance(deadline_ms, (int, float)) or isinstance(deadline_ms, bool) or deadline_ms <= 0):
+		return {"ok": False, "error": "'deadlineMs' must be a positive number."}, 400
+	llm = data.get("llm")
+	return guard_action(
+		action,
+		params,
+		deadline_ms=deadline_ms,
+		use_llm=None if llm is None else bool(llm),
+		execute=not data.get("dryRun", False),
+	)
+
+
+@route("/cdp/sql", ["POST"], "slow")
+def cdp_sql(req: ApiRequest):
+	data = req.json
+	sql = data.get("sql")
+	if not sql or not isinstance(sql, str):
+		return {"ok": False, "error": "Provide 'sql' (string)."}, 400
+	fresh = "no-cache" in (req.headers.get("Cache-Control") or "").lower()
+	try:
+		res, source = cached_cdp_sql(sql, fresh=fresh)
+	except Exception as exc:
+		return {"ok": False, "error": str(exc)}, 500
+	headers = {"X-Cache": source}
+	rows = result_rows(res)
+	# ?format=ndjson (or Accept: application/x-ndjson) streams the rows one per line
+	wants_ndjson = req.args.get("format") == "ndjson" or "application/x-ndjson" in (req.headers.get("Accept") or "")
+	if wants_ndjson and rows is not None:
+		return NdjsonStream(rows), 200, {**headers, "X-Row-Count": str(len(rows))}
+	return {"ok": True, "data": res, "cached": source != MISS}, 200, headers
+
+
+@route("/vote", ["POST"])
+def vote_task(req: ApiRequest):
+	data = req.json
+	task_id = data.get("taskId")
+	support = data.get("support")
+	if task_id is None or support is None:
+		return {"error": "Provide 'taskId' and 'support' (bool)."}, 400
+	# One vote per (task, voter), like ReviewOracle.hasVoted. No fallback to the client
+	# address: reviewers behind one proxy or NAT would share a single vote.
+	voter = str(data.get("voter") or req.headers.get("X-Voter") or "").strip().lower()
+	if not voter:
+		return {"error": "Provide 'voter' (or an X-Voter header)."}, 400
+	try:
+		task = get_store().record_vote(int(task_id), bool(support), voter)
+	except TaskNotFound:
+		return {"error": "Invalid taskId"}, 400
+	except TaskResolved:
+		return {"error": "Task already resolved"}, 400
+	except DuplicateVote:
+		return {"error": "Already voted"}, 409
+	publish_task_event("task.voted", {"id": task["id"], "votesFor": task["votesFor"], "votesAgainst": task["votesAgainst"]})
+	return {"taskId": int(task_id), "votesFor": task["votesFor"], "votesAgainst": task["votesAgainst"]}
+
+
+@route("/batches/{batch_id}", ["GET"], "inline")
+def batch_status(req: ApiRequest, batch_id: str):
+	batcher = get_blacklist_batcher()
+	batch = batcher.get_batch(int(batch_id)) if batcher and batch_id.isdigit() else None
+	if batch is None:
+		return {"error": "Unknown batch"}, 404
+	return batch
+
+
+@route("/tasks/{task_id}/submission", ["GET"], "inline")
+def task_submission(req: ApiRequest, task_id: str):
+	batcher = get_blacklist_batcher()
+	submission = batcher.task_submission(int(task_id)) if batcher and task_id.isdigit() else None
+	if submission is None:
+		return {"error": "No on-chain submission for task"}, 404
+	return submission
+
+
+@route("/resolve", ["POST"])
+def resolve_task(req: ApiRequest):
+	data = req.json
+	task_id = data.get("taskId")
+	if task_id is None:
+		return {"error": "Provide 'taskId'."}, 400
+	store = get_store()
+	try:
+		# quorum rule: votesFor >= REVIEW_QUORUM (checked and applied atomically by the store)
+		task, resolved_now = store.resolve_task(int(task_id), REVIEW_QUORUM)
+	except TaskNotFound:
+		return {"error": "Invalid taskId"}, 400
+	if task.get("resolved") and not resolved_now:
+		# Tasks resolved before the blacklist write moved into resolve_task may be missing from it
+		if store.add_blacklisted(task["hash"]):
+			note_blacklisted(task["hash"])
+		return {"taskId": int(task_id), "resolved": True, "blacklisted": True, "txHash": task.get("txHash")}, 200
+	if resolved_now:
+		# The store blacklisted the hash with the resolve; make /status see it right away
+		note_blacklisted(task["hash"])
+		publish_task_event("task.resolved", {"id": task["id"], "resolved": True})
+		# Coalesced into a batched addToBlacklist(bytes32[]) tx if a registry is configured
+		batcher = get_blacklist_batcher()
+		batch_id = batcher.add(task["hash"], int(task_id)) if batcher else None
+		return {"taskId": int(task_id), "resolved": True, "blacklisted": True, "batchId": batch_id}, 200
+	else:
+		return {"taskId": int(task_id), "resolved": False, "reason": "Quorum not reached"}, 200
+
@@ -0,0 +1,86 @@
+"""Async (ASGI) serving mode for the Agent API.
+
+Serves the same ROUTES as the Flask app in server.py. Cheap in-memory
+handlers (/status, /hash, batches, /jobs) run directly on the event loop;
+store-backed handlers run on worker threads, and slow outbound calls
+(/cdp/sql, /agent/run, /flag's LLM assessment) run on their own bounded
+thread pool so they never starve status checks.
+
+Run: uvicorn asgi_server:app --port 5055   (or: python asgi_server.py)
+
+Environment:
+- ASGI_SLOW_CONCURRENCY: max concurrent slow calls (default 64)
+"""
+import contextlib
+import functools
+import json
+import os
+from typing import Any, AsyncIterator
+
+import anyio
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route as StarletteRoute
+
+from api import ROUTES, ApiRequest, NdjsonStream, Route, TextResponse, split_result, warm_up
+from events import EventStream
+from metrics import RequestTimer
+
+
+def _endpoint(route: Route, slow_calls: anyio.CapacityLimiter):
+	async def endpoint(request: Request) -> Response:
+		timer = RequestTimer(request.headers)
+		body = await request.body()
+		try:
+			data: Any = json.loads(body) if body else None
+		except ValueError:
+			data = None
+		req = ApiRequest(data or {}, dict(request.query_params), request.headers, request.client.host if request.client else None)
+		call = functools.partial(route.handler, req, **request.path_params)
+		try:
+			if route.mode == "inline":
+				result = call()
+			elif route.mode == "slow":
+				result = await anyio.to_thread.run_sync(call, limiter=slow_calls)
+			else:
+				result = await anyio.to_thread.run_sync(call)
+		except Exception:
+			timer.finish(route.path, request.method, 500)
+			raise
+		payload, status, headers = split_result(result)
+		headers = {**headers, **timer.finish(route.path, request.method, status)}
+		if isinstance(payload, (EventStream, NdjsonStream)):
+			return StreamingResponse(payload.iter_async(), status, {**payload.headers, **headers}, media_type=payload.media_type)
+		if isinstance(payload, TextResponse):
+			return Response(payload.body, status, headers, media_type=payload.media_type)
+		return JSONResponse(payload, status_code=status, headers=headers)
+	endpoint.__name__ = route.handler.__name__
+	return endpoint
+
+
+def create_app() -> Starlette:
+	slow_calls = anyio.CapacityLimiter(int(os.getenv("ASGI_SLOW_CONCURRENCY", "64")))
+
+	@contextlib.asynccontextmanager
+	async def lifespan(app: Starlette) -> AsyncIterator[None]:
+		# Load the store and blacklist cache off the loop before taking traffic
+		await anyio.to_thread.run_sync(warm_up)
+		yield
+
+	return Starlette(
+		routes=[StarletteRoute(r.path, _endpoint(r, slow_calls), methods=r.methods) for r in ROUTES],
+		middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+		lifespan=lifespan,
+	)
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+	import uvicorn
+
+	uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("PORT", "5055")))
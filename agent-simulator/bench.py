@@ -0,0 +1,510 @@
+"""Benchmark harness for the agent-simulator hot paths.
+
+Every run uses a throwaway store and a local CDP/OpenAI stub (cdp_stub.py),
+so results do not depend on network or demo data. Each case reports
+ops/s and p50/p95/p99 latency in milliseconds; results are written as JSON
+and compared against a stored baseline (bench_baseline.json).
+
+Cases:
+- hash: get_action_hash throughput, cold and warm LRU
+- http_status / http_hash: latency under concurrent clients
+- http_flag / http_vote / http_resolve: reviewer workflow under contention
+- http_guard: /guard/execute dry runs (hash + blacklist + rules, no LLM)
+- db_<n>: store operations with 1k / 100k / 1M tasks
+- archive: moving resolved tasks to the task archive, then archived lookups by id and hash
+- analyzer: rule engine (single and batch) and cached assessments
+- cdp_sql: outbound call through the pooled client to the stub
+- startup: fresh-process CLI `--check-only`, `import server` and server boot to first /health
+
+Run:
+  python bench.py                       # everything, compare with bench_baseline.json
+  python bench.py --quick hash db       # selected cases, smaller sizes
+  python bench.py --save-baseline       # record a new baseline
+  python bench.py --server asgi         # HTTP cases against the Starlette app
+
+Exit status is 1 when --fail-on-regression is set and a metric regressed
+by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BASELINE = Path(__file__).with_name("bench_baseline.json")
+LOWER_IS_BETTER = ("p50Ms", "p95Ms", "p99Ms")
+# Sub-50µs latencies are mostly timer noise; don't flag them as regressions
+MIN_COMPARABLE_MS = 0.05
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+	"""Nearest-rank percentile of an ascending list."""
+	if not sorted_values:
+		return 0.0
+	rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+	return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, **extra: Any) -> Dict[str, Any]:
+	"""latencies in seconds -> {n, opsPerSec, p50Ms, p95Ms, p99Ms, ...}."""
+	values = sorted(latencies)
+	return {
+		"n": len(values),
+		"opsPerSec": round(len(values) / elapsed, 1) if elapsed else None,
+		"p50Ms": round(percentile(values, 50) * 1000, 4),
+		"p95Ms": round(percentile(values, 95) * 1000, 4),
+		"p99Ms": round(percentile(values, 99) * 1000, 4),
+		**extra,
+	}
+
+
+def time_calls(fn: Callable[[int], Any], n: int) -> Dict[str, Any]:
+	latencies = []
+	start = time.perf_counter()
+	for i in range(n):
+		t = time.perf_counter()
+		fn(i)
+		latencies.append(time.perf_counter() - t)
+	return summarize(latencies, time.perf_counter() - start)
+
+
+def time_concurrent(fn: Callable[[int], Any], n: int, concurrency: int) -> Dict[str, Any]:
+	latencies: List[float] = []
+	errors = []
+	lock = threading.Lock()
+
+	def one(i: int) -> None:
+		t = time.perf_counter()
+		result = fn(i)
+		elapsed = time.perf_counter() - t
+		with lock:
+			latencies.append(elapsed)
+			# HTTP callers return (status, body); server errors are counted, not hidden
+			if isinstance(result, tuple) and result[0] >= 500:
+				errors.append(result[0])
+
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=concurrency) as pool:
+		list(pool.map(one, range(n)))
+	return summarize(latencies, time.perf_counter() - start, concurrency=concurrency, errors=len(errors))
+
+
+def _items(n: int, seed: int = 1) -> List[Tuple[str, Dict[str, Any]]]:
+	rng = random.Random(seed)
+	actions = ["native_transfer", "swap", "approve", "mint"]
+	return [(rng.choice(actions), {"to": f"0x{rng.getrandbits(160):040x}", "amount": rng.randrange(10**6), "nonce": i}) for i in range(n)]
+
+
+# --- cases -------------------------------------------------------------------
+
+
+def bench_hash(sizes: Dict[str, int]) -> Dict[str, Any]:
+	import action_hash
+	from agent_utils import get_action_hash
+
+	items = _items(sizes["hash"])
+	action_hash.keccak256(b"")  # load the backend outside the timed loop; startup covers import cost
+	action_hash._keccak_payload.cache_clear()
+	cold = time_calls(lambda i: get_action_hash(*items[i]), len(items))
+	# Replaying more distinct payloads than the LRU holds evicts each one before its reuse,
+	# so the warm pass cycles over a working set that fits in the cache
+	max_size = action_hash.cache_info()["maxSize"]
+	if not max_size:
+		return {"hash_cold": cold}
+	hot = items[:max_size]
+	for action, params in hot:
+		get_action_hash(action, params)
+	before = action_hash.cache_info()
+	warm = time_calls(lambda i: get_action_hash(*hot[i % len(hot)]), len(items))
+	after = action_hash.cache_info()
+	hits = after["hits"] - before["hits"]
+	lookups = hits + after["misses"] - before["misses"]
+	if not hits:
+		raise RuntimeError("hash_warm made no cache hits; the warm pass is measuring cold lookups")
+	warm["hitRatio"] = round(hits / lookups, 4)
+	return {"hash_cold": cold, "hash_warm": warm}
+
+
+class _Server:
+	"""Serve the app on a free port in a background thread."""
+
+	def __init__(self, kind: str):
+		self.kind = kind
+		if kind == "asgi":
+			import socket
+
+			import uvicorn
+			from asgi_server import create_app
+
+			sock = socket.socket()
+			sock.bind(("127.0.0.1", 0))
+			self.port = sock.getsockname()[1]
+			sock.close()
+			config = uvicorn.Config(create_app(), host="127.0.0.1", port=self.port, log_level="warning")
+			self._uvicorn = uvicorn.Server(config)
+			threading.Thread(target=self._uvicorn.run, daemon=True).start()
+			while not self._uvicorn.started:
+				time.sleep(0.01)
+		else:
+			from werkzeug.serving import make_server
+
+			from api import warm_up
+			from server import create_app
+
+			warm_up()
+			self._werkzeug = make_server("127.0.0.1", 0, create_app(), threaded=True)
+			self.port = self._werkzeug.server_port
+			threading.Thread(target=self._werkzeug.serve_forever, daemon=True).start()
+		self.base = f"http://127.0.0.1:{self.port}"
+
+	def stop(self) -> None:
+		if self.kind == "asgi":
+			self._uvicorn.should_exit = True
+		else:
+			self._werkzeug.shutdown()
+
+
+def _session_pool(base: str):
+	"""Per-thread keep-alive sessions, like real clients."""
+	import requests
+
+	local = threading.local()
+
+	def call(method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+		session = getattr(local, "session", None)
+		if session is None:
+			session = local.session = requests.Session()
+		resp = session.request(method, base + path, json=body, timeout=60)
+		return resp.status_code, resp.json()
+	return call
+
+
+def bench_http(sizes: Dict[str, int], server_kind: str) -> Dict[str, Any]:
+	from agent_utils import get_action_hash
+	from store import get_store
+
+	server = _Server(server_kind)
+	call = _session_pool(server.base)
+	concurrency = sizes["concurrency"]
+	n = sizes["http"]
+	try:
+		items = _items(n, seed=2)
+		hashes = [get_action_hash(a, p).hex() for a, p in items]
+		for h in hashes[::10]:
+			get_store().add_blacklisted(h)
+		results = {
+			"http_hash": time_concurrent(lambda i: call("POST", "/hash", {"action": items[i][0], "params": items[i][1]}), n, concurrency),
+			"http_status": time_concurrent(lambda i: call("GET", f"/status/{hashes[i]}"), n, concurrency),
+			"http_guard": time_concurrent(
+				lambda i: call("POST", "/guard/execute", {"action": items[i][0], "params": items[i][1], "dryRun": True, "llm": False}), n, concurrency
+			),
+		}
+
+		# Reviewer workflow: many flags, then every task voted by three reviewers at once,
+		# then each task resolved by two racing clients
+		tasks = sizes["workflow_tasks"]
+		flag_items = _items(tasks, seed=3)
+		task_ids: List[int] = [0] * tasks
+
+		def flag(i: int) -> None:
+			task_ids[i] = call("POST", "/flag", {"action": flag_items[i][0], "params": flag_items[i][1]})[1]["taskId"]
+
+		results["http_flag"] = time_concurrent(flag, tasks, concurrency)
+		quorum = int(os.environ["REVIEW_QUORUM"])
+		votes = [(task_ids[i % tasks], f"0xvoter{i // tasks}") for i in range(tasks * quorum)]
+		random.Random(4).shuffle(votes)
+		results["http_vote"] = time_concurrent(
+			lambda i: call("POST", "/vote", {"taskId": votes[i][0], "support": True, "voter": votes[i][1]}), len(votes), concurrency
+		)
+		resolves = task_ids * 2
+		random.Random(5).shuffle(resolves)
+		results["http_resolve"] = time_concurrent(lambda i: call("POST", "/resolve", {"taskId": resolves[i]}), len(resolves), concurrency)
+		return results
+	finally:
+		server.stop()
+
+
+def _populate(store: Any, n: int, chunk: int = 100_000) -> None:
+	for start in range(0, n, chunk):
+		rows = []
+		for i in range(start, min(n, start + chunk)):
+			rows.append({
+				"id": i,
+				"hash": f"{i:064x}",
+				"action": "native_transfer",
+				"params": {"to": "0x0", "amount": i},
+				"votesFor": i % 3,
+				"resolved": i % 4 == 0,
+				"ai": {"riskScore": (i % 100) / 100, "label": "suspicious" if i % 2 else "benign", "reasons": []},
+			})
+		store.import_json_db({"blacklisted": [f"{i:064x}" for i in range(start, min(n, start + chunk), 5)], "tasks": rows})
+
+
+def bench_db(sizes: Dict[str, int]) -> Dict[str, Any]:
+	from store import SqliteStore
+
+	results = {}
+	ops = sizes["db_ops"]
+	for n in sizes["db_tasks"]:
+		workdir = tempfile.mkdtemp(prefix="agent-bench-db-")
+		path = Path(workdir) / f"bench_{n}.sqlite3"
+		store = SqliteStore(path)
+		t = time.perf_counter()
+		_populate(store, n)
+		populate_s = time.perf_counter() - t
+		rng = random.Random(n)
+		ids = [rng.randrange(n) for _ in range(ops)]
+		label = f"db_{n // 1000}k" if n < 1_000_000 else f"db_{n // 1_000_000}m"
+		results[f"{label}_get_task"] = time_calls(lambda i: store.get_task(ids[i]), ops)
+		results[f"{label}_is_blacklisted"] = time_calls(lambda i: store.is_blacklisted(f"{ids[i]:064x}"), ops)
+		results[f"{label}_query_page"] = time_calls(
+			lambda i: store.query_tasks(after=ids[i], limit=50, unresolved=True, min_risk=0.5), ops // 10
+		)
+		results[f"{label}_record_vote"] = time_calls(lambda i: _vote(store, ids[i], f"bench{i}"), ops)
+		results[f"{label}_create_task"] = time_calls(lambda i: store.create_task(f"{n + i:064x}", "bench", {}, None), ops)
+		results[f"{label}_create_task"]["populateSeconds"] = round(populate_s, 2)
+		store.close()
+		shutil.rmtree(workdir, ignore_errors=True)
+	return results
+
+
+def bench_archive(sizes: Dict[str, int]) -> Dict[str, Any]:
+	from store import SqliteStore
+
+	results = {}
+	ops = sizes["db_ops"]
+	n = sizes["archive_tasks"]
+	workdir = tempfile.mkdtemp(prefix="agent-bench-archive-")
+	store = SqliteStore(Path(workdir) / "bench.sqlite3", archive_dir=Path(workdir) / "archive")
+	_populate(store, n)
+	t = time.perf_counter()
+	moved = store.archive_resolved(time.time())
+	elapsed = time.perf_counter() - t
+	# One batch run: opsPerSec is tasks moved per second, the percentiles are the whole run
+	results["archive_move"] = {**summarize([elapsed], elapsed), "n": moved, "opsPerSec": round(moved / elapsed, 1)}
+	stats = store.archive.stats()
+	results["archive_move"]["indexBytesPerTask"] = round(stats["indexBytes"] / max(1, stats["records"]), 1)
+	rng = random.Random(n)
+	ids = [rng.randrange(n // 4) * 4 for _ in range(ops)]
+	results["archive_get_task"] = time_calls(lambda i: store.get_task(ids[i]), ops)
+	results["archive_find_by_hash"] = time_calls(lambda i: store.archive.find_by_hash(f"{ids[i]:064x}"), ops)
+	store.close()
+	shutil.rmtree(workdir, ignore_errors=True)
+	return results
+
+
+def _vote(store: Any, task_id: int, voter: str) -> None:
+	from store import TaskResolved
+
+	try:
+		store.record_vote(task_id, True, voter)
+	except TaskResolved:
+		pass
+
+
+def bench_analyzer(sizes: Dict[str, int]) -> Dict[str, Any]:
+	from analyzer import assess_action
+	from risk_rules import _load_numpy, get_risk_engine
+
+	_load_numpy()
+	engine = get_risk_engine()
+	items = _items(sizes["analyzer"], seed=6)
+	results = {"analyzer_rule_single": time_calls(lambda i: engine.score(*items[i]), min(len(items), 20_000))}
+	start = time.perf_counter()
+	engine.score_batch(items)
+	elapsed = time.perf_counter() - start
+	results["analyzer_rule_batch"] = {"n": len(items), "opsPerSec": round(len(items) / elapsed, 1), "p50Ms": round(elapsed * 1000, 4), "p95Ms": round(elapsed * 1000, 4), "p99Ms": round(elapsed * 1000, 4)}
+	subset = items[:200]
+	results["analyzer_assess_miss"] = time_calls(lambda i: assess_action(*subset[i]), len(subset))
+	results["analyzer_assess_hit"] = time_calls(lambda i: assess_action(*subset[i % len(subset)]), 2000)
+	return results
+
+
+def bench_cdp_sql(sizes: Dict[str, int]) -> Dict[str, Any]:
+	from cdp_sql import run_cdp_sql
+
+	return {"cdp_sql": time_concurrent(lambda i: run_cdp_sql(f"SELECT {i}"), sizes["cdp"], sizes["concurrency"])}
+
+
+def _free_port() -> int:
+	import socket
+
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+
+def bench_startup(sizes: Dict[str, int]) -> Dict[str, Any]:
+	"""Wall time of fresh interpreter processes, as every CLI call and worker spawn pays it."""
+	import requests
+
+	here = Path(__file__).parent
+	runs = sizes["startup_runs"]
+	cli = [sys.executable, str(here / "agent_sim.py"), "--action", "native_transfer", "--params", '{"to":"0x1","amount":1}', "--check-only"]
+	results = {
+		"startup_cli_check": time_calls(lambda i: subprocess.run(cli, cwd=here, check=True, capture_output=True), runs),
+		"startup_import_server": time_calls(lambda i: subprocess.run([sys.executable, "-c", "import server"], cwd=here, check=True, capture_output=True), runs),
+	}
+
+	def boot(i: int) -> None:
+		port = _free_port()
+		proc = subprocess.Popen([sys.executable, "server.py"], cwd=here, env={**os.environ, "PORT": str(port)}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		try:
+			while True:
+				try:
+					if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+						return
+				except requests.ConnectionError:
+					if proc.poll() is not None:
+						raise RuntimeError("server.py exited during startup")
+				time.sleep(0.005)
+		finally:
+			proc.terminate()
+			proc.wait()
+
+	results["startup_server_boot"] = time_calls(boot, runs)
+	return results
+
+
+CASES = {
+	"hash": lambda sizes, args: bench_hash(sizes),
+	"http": lambda sizes, args: bench_http(sizes, args.server),
+	"db": lambda sizes, args: bench_db(sizes),
+	"archive": lambda sizes, args: bench_archive(sizes),
+	"analyzer": lambda sizes, args: bench_analyzer(sizes),
+	"cdp_sql": lambda sizes, args: bench_cdp_sql(sizes),
+	"startup": lambda sizes, args: bench_startup(sizes),
+}
+
+SIZES = {
+	"full": {"hash": 100_000, "http": 5000, "concurrency": 32, "workflow_tasks": 300, "db_tasks": [1_000, 100_000, 1_000_000], "db_ops": 5000, "archive_tasks": 400_000, "analyzer": 100_000, "cdp": 500, "startup_runs": 10},
+	"quick": {"hash": 20_000, "http": 1000, "concurrency": 16, "workflow_tasks": 60, "db_tasks": [1_000, 100_000], "db_ops": 1000, "archive_tasks": 100_000, "analyzer": 20_000, "cdp": 100, "startup_runs": 5},
+}
+
+
+# --- environment / baseline -----------------------------------------------
+
+
+def _isolate(stub_latency: float) -> Dict[str, Any]:
+	"""Point every external dependency at temp files and the local stub. Call before importing app modules."""
+	from cdp_stub import StubConfig, start_stub
+
+	work = Path(tempfile.mkdtemp(prefix="agent-bench-"))
+	_, base = start_stub(StubConfig(latency=stub_latency))
+	llm = "heuristic"
+	try:
+		import openai  # noqa: F401  # type: ignore
+
+		llm = "stub"
+		os.environ["OPENAI_API_KEY"] = "bench"
+		os.environ["OPENAI_API_BASE"] = f"{base}/v1"
+	except ImportError:
+		os.environ.pop("OPENAI_API_KEY", None)
+	os.environ.update({
+		"AGENT_STORE": "sqlite",
+		"AGENT_DB_PATH": str(work / "store.sqlite3"),
+		"AGENT_JSON_DB_PATH": str(work / "none.json"),
+		"CHAIN_INDEX_PATH": str(work / "chain.sqlite3"),
+		"CDP_API_BASE": base,
+		"CDP_CLIENT_TOKEN": "bench",
+		"MOCK_REVIEW_PHASE_DELAY": "0",
+		"REVIEW_QUORUM": os.getenv("REVIEW_QUORUM", "3"),
+		"ACTION_REGISTRY_ADDRESS": "0x0000000000000000000000000000000000000000",
+	})
+	for name in ("ASSESSMENT_CACHE_PATH", "INDEXER_RPC_URL", "LOCAL_RPC_URL"):
+		os.environ.pop(name, None)
+	return {"stub": base, "llm": llm, "workdir": str(work)}
+
+
+def _meta(mode: str, server: str, env: Dict[str, Any]) -> Dict[str, Any]:
+	try:
+		rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent).stdout.strip()
+	except OSError:
+		rev = ""
+	return {
+		"mode": mode,
+		"server": server,
+		"llm": env["llm"],
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"cpus": os.cpu_count(),
+		"gitRev": rev or None,
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+	}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+	"""Regression lines for metrics worse than baseline by more than threshold (0.25 = 25%)."""
+	regressions = []
+	for case, current in results.items():
+		base = baseline.get(case)
+		if not base:
+			continue
+		for metric in LOWER_IS_BETTER:
+			old, new = base.get(metric), current.get(metric)
+			if old and new and old >= MIN_COMPARABLE_MS and new > old * (1 + threshold):
+				regressions.append(f"{case}.{metric}: {old} -> {new} ms (+{(new / old - 1) * 100:.0f}%)")
+		old, new = base.get("opsPerSec"), current.get("opsPerSec")
+		if old and new and new < old / (1 + threshold):
+			regressions.append(f"{case}.opsPerSec: {old} -> {new} ({(new / old - 1) * 100:.0f}%)")
+	return regressions
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description="Agent-simulator benchmarks")
+	parser.add_argument("cases", nargs="*", help=f"Cases to run: {', '.join(CASES)} (default: all)")
+	parser.add_argument("--quick", action="store_true", help="Smaller sizes (no 1M-task DB)")
+	parser.add_argument("--server", choices=["flask", "asgi"], default="flask", help="App used for HTTP cases")
+	parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds the CDP/OpenAI stub adds per call")
+	parser.add_argument("--out", help="Write results JSON here (default: stdout only)")
+	parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+	parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+	parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before a metric counts as regressed")
+	parser.add_argument("--fail-on-regression", action="store_true")
+	args = parser.parse_args()
+	unknown = [c for c in args.cases if c not in CASES]
+	if unknown:
+		parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+	mode = "quick" if args.quick else "full"
+	env = _isolate(args.stub_latency)
+	sizes = SIZES[mode]
+	results: Dict[str, Any] = {}
+	for name in args.cases or list(CASES):
+		print(f"[bench] {name} ...", file=sys.stderr)
+		results.update(CASES[name](sizes, args))
+
+	report: Dict[str, Any] = {"meta": _meta(mode, args.server, env), "results": results}
+	baseline_path = Path(args.baseline)
+	regressions: List[str] = []
+	if baseline_path.exists() and not args.save_baseline:
+		baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+		if baseline.get("meta", {}).get("mode") != mode:
+			print(f"[bench] baseline is a {baseline.get('meta', {}).get('mode')} run; comparing anyway", file=sys.stderr)
+		regressions = compare(results, baseline.get("results", {}), args.threshold)
+		report["regressions"] = regressions
+
+	text = json.dumps(report, indent=2)
+	print(text)
+	if args.out:
+		Path(args.out).write_text(text + "\n", encoding="utf-8")
+	if args.save_baseline:
+		baseline_path.write_text(text + "\n", encoding="utf-8")
+		print(f"[bench] baseline saved to {baseline_path}", file=sys.stderr)
+	for line in regressions:
+		print(f"[bench] REGRESSION {line}", file=sys.stderr)
+	return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
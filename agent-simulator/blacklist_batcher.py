@@ -0,0 +1,463 @@
+"""Coalesce resolved blacklist hashes into batched on-chain submissions.
+
+Instead of one blacklist transaction per resolved task, hashes are queued
+and flushed as a single ActionRegistry.addToBlacklist(bytes32[]) call when
+the batch reaches BLACKLIST_BATCH_SIZE or BLACKLIST_BATCH_WINDOW seconds
+after its first hash. Each batch records its tx hash and the tasks it
+covers; receipts are polled to report per-task confirmation. A batch whose
+submission fails (or whose tx reverts) is retried with exponential backoff
+and only marked failed after BLACKLIST_MAX_ATTEMPTS tries.
+
+Only failures that prove nothing was sent (SubmitRejected) are retried
+directly. A timeout or dropped connection may come after the node or CDP
+accepted the tx, so such a batch becomes "unknown": it is resent only once
+getActionStatus shows its hashes still unlisted after
+BLACKLIST_UNKNOWN_TIMEOUT, and hashes that did land are dropped first. The
+rpc submitter also reuses the nonce of an unknown send, so at most one of
+the two can be mined. Without an RPC URL to read from, unknown batches stay
+unknown for an operator to check.
+
+Hashes queued in memory are lost on restart, but their tasks are resolved
+with no txHash; the process-wide batcher re-queues those on startup, and
+with an RPC URL drops the ones already blacklisted on-chain before sending.
+
+Environment:
+- ACTION_REGISTRY_ADDRESS: target registry (batching is off without it)
+- BLACKLIST_BATCH_SIZE: max hashes per tx (default 100)
+- BLACKLIST_BATCH_WINDOW: seconds to wait for more hashes (default 2)
+- BLACKLIST_MAX_ATTEMPTS: submissions per batch before it is marked failed (default 8)
+- BLACKLIST_RETRY_BACKOFF: seconds before the first retry, doubling per attempt up to 300 (default 2)
+- BLACKLIST_UNKNOWN_TIMEOUT: seconds an unknown send may take to land before it is resent (default 300)
+- BLACKLIST_SUBMITTER: "cdp" (server wallet, default) or "rpc" (eth_sendTransaction
+  from an unlocked account, e.g. a local Hardhat/anvil node)
+- BLACKLIST_RPC_URL: node used for receipts and the rpc submitter (default LOCAL_RPC_URL)
+- BLACKLIST_FROM: sender for the rpc submitter (default: first eth_accounts entry)
+- BASE_SEPOLIA_CHAIN_ID: chain id for the cdp submitter (default 84532)
+"""
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from events import publish_task_event
+from store import BaseStore, get_store, normalize_hash
+
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# keccak256("addToBlacklist(bytes32[])")[:4]; precomputed so importing needs no Keccak backend
+ADD_TO_BLACKLIST_BATCH_SELECTOR = bytes.fromhex("47376eb5")
+
+
+class SubmitRejected(RuntimeError):
+	"""Raised by a submitter when the transaction certainly was not sent, so
+	sending it again cannot duplicate it."""
+
+
+def encode_add_to_blacklist(hashes: List[str]) -> str:
+	"""ABI-encode addToBlacklist(bytes32[]) calldata."""
+	words = [(32).to_bytes(32, "big"), len(hashes).to_bytes(32, "big")]
+	for h in hashes:
+		arg = bytes.fromhex(normalize_hash(h))
+		words.append(arg.rjust(32, b"\x00"))
+	return "0x" + (ADD_TO_BLACKLIST_BATCH_SELECTOR + b"".join(words)).hex()
+
+
+class Batch:
+	def __init__(self, batch_id: int):
+		self.id = batch_id
+		self.hashes: List[str] = []
+		self.task_ids: List[int] = []
+		self.status = "open"  # open -> submitted -> confirmed | retrying | unknown -> ... | failed
+		self.tx_hash: Optional[str] = None
+		self.error: Optional[str] = None
+		self.attempts = 0
+		self.retry_at: Optional[float] = None
+		# Check the chain before sending: an earlier send may have landed
+		self.verify = False
+		self.unknown_since: Optional[float] = None
+		self.opened_at = time.monotonic()
+		self.submitted_at: Optional[float] = None
+		self.confirmed_block: Optional[int] = None
+
+	def to_dict(self) -> Dict[str, Any]:
+		confirmed = self.status == "confirmed"
+		return {
+			"batchId": self.id,
+			"status": self.status,
+			"txHash": self.tx_hash,
+			"error": self.error,
+			"attempts": self.attempts,
+			"blockNumber": self.confirmed_block,
+			"hashes": self.hashes,
+			"tasks": [{"taskId": t, "confirmed": confirmed} for t in self.task_ids],
+		}
+
+
+class BlacklistBatcher:
+	def __init__(
+		self,
+		submit: Callable[[str], Optional[str]],
+		fetch_receipt: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+		max_batch: int = 100,
+		window: float = 2.0,
+		confirm_interval: float = 2.0,
+		max_retained: int = 1000,
+		max_attempts: int = 8,
+		retry_backoff: float = 2.0,
+		retry_backoff_max: float = 300.0,
+		chain_statuses: Optional[Callable[[List[str]], List[int]]] = None,
+		unknown_timeout: float = 300.0,
+	):
+		"""submit(calldata) returns the tx hash, raising SubmitRejected when nothing was
+		sent; fetch_receipt(tx_hash) returns the receipt dict or None while pending;
+		chain_statuses(hashes) returns getActionStatus per hash (2 = blacklisted)."""
+		self._submit = submit
+		self._fetch_receipt = fetch_receipt
+		self._chain_statuses = chain_statuses
+		self.unknown_timeout = unknown_timeout
+		self.max_batch = max_batch
+		self.window = window
+		self.confirm_interval = confirm_interval
+		self.max_retained = max_retained
+		self.max_attempts = max_attempts
+		self.retry_backoff = retry_backoff
+		self.retry_backoff_max = retry_backoff_max
+		self._retries: List[Batch] = []
+		self._unknown: List[Batch] = []
+		self._ids = itertools.count(1)
+		self._open = Batch(next(self._ids))
+		self._batches: Dict[int, Batch] = {}
+		self._task_batch: Dict[int, int] = {}
+		self._cond = threading.Condition()
+		self._thread: Optional[threading.Thread] = None
+
+	def add(self, action_hash: str, task_id: int, verify: bool = False) -> int:
+		"""Queue a hash for the next batch. Returns the batch id. verify=True makes
+		the batch check the chain first (for hashes an earlier run may have sent)."""
+		with self._cond:
+			batch = self._open
+			batch.verify = batch.verify or verify
+			key = normalize_hash(action_hash)
+			if key not in batch.hashes:
+				if not batch.hashes:
+					batch.opened_at = time.monotonic()
+				batch.hashes.append(key)
+			batch.task_ids.append(task_id)
+			self._batches[batch.id] = batch
+			self._task_batch[task_id] = batch.id
+			self._ensure_thread()
+			self._cond.notify()
+			return batch.id
+
+	def _ensure_thread(self) -> None:
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._loop, name="blacklist-batcher", daemon=True)
+			self._thread.start()
+
+	def _take_due_batch(self) -> Optional[Batch]:
+		now = time.monotonic()
+		for batch in self._retries:
+			if batch.retry_at is not None and batch.retry_at <= now:
+				self._retries.remove(batch)
+				return batch
+		batch = self._open
+		if not batch.hashes:
+			return None
+		if len(batch.hashes) >= self.max_batch or time.monotonic() - batch.opened_at >= self.window:
+			self._open = Batch(next(self._ids))
+			return batch
+		return None
+
+	def _wait_time(self) -> float:
+		now = time.monotonic()
+		wait = self.confirm_interval
+		if self._open.hashes:
+			wait = min(wait, self.window - (now - self._open.opened_at))
+		for batch in self._retries:
+			wait = min(wait, (batch.retry_at or now) - now)
+		return max(wait, 0.0)
+
+	def _loop(self) -> None:
+		last_confirm = 0.0
+		while True:
+			with self._cond:
+				batch = self._take_due_batch()
+				if batch is None:
+					self._cond.wait(timeout=self._wait_time())
+					batch = self._take_due_batch()
+			if batch is not None:
+				self._flush(batch)
+			if (self._fetch_receipt or self._unknown) and time.monotonic() - last_confirm >= self.confirm_interval:
+				last_confirm = time.monotonic()
+				self.confirm_pending()
+
+	def flush_now(self) -> Optional[Dict[str, Any]]:
+		"""Submit the open batch immediately (e.g. on shutdown or in scripts)."""
+		with self._cond:
+			batch = self._open if self._open.hashes else None
+			if batch is not None:
+				self._open = Batch(next(self._ids))
+		if batch is None:
+			return None
+		self._flush(batch)
+		return batch.to_dict()
+
+	def _flush(self, batch: Batch) -> None:
+		if batch.verify and self._chain_statuses is not None:
+			try:
+				statuses = self._chain_statuses(batch.hashes)
+			except Exception as exc:
+				self._retry_later(batch, f"chain check failed: {exc}", count=False)
+				return
+			unlisted = [h for h, status in zip(batch.hashes, statuses) if status != 2]
+			if not unlisted:
+				self._mark_landed(batch)
+				return
+			batch.hashes = unlisted
+		batch.attempts += 1
+		try:
+			tx_hash = self._submit(encode_add_to_blacklist(batch.hashes))
+		except SubmitRejected as exc:
+			self._retry_later(batch, str(exc))
+			return
+		except Exception as exc:
+			self._mark_unknown(batch, str(exc))
+			return
+		if not tx_hash:
+			# Accepted without a hash to follow: as ambiguous as a timeout
+			self._mark_unknown(batch, "Submitter returned no transaction hash")
+			return
+		batch.tx_hash = tx_hash
+		batch.status = "submitted"
+		batch.error = None
+		batch.submitted_at = time.monotonic()
+		store = get_store()
+		for task_id in batch.task_ids:
+			try:
+				store.set_task_tx_hash(task_id, batch.tx_hash)
+			except Exception:
+				continue
+			publish_task_event("task.submitted", {"id": task_id, "txHash": batch.tx_hash})
+
+	def _retry_later(self, batch: Batch, error: str, count: bool = True) -> None:
+		"""count=False for failures that sent nothing and cost nothing (chain reads)."""
+		with self._cond:
+			batch.error = error
+			if count and batch.attempts >= self.max_attempts:
+				batch.status = "failed"
+				return
+			batch.status = "retrying"
+			batch.retry_at = time.monotonic() + min(self.retry_backoff * 2 ** max(batch.attempts - 1, 0), self.retry_backoff_max)
+			self._retries.append(batch)
+			self._ensure_thread()
+			self._cond.notify()
+
+	def _mark_unknown(self, batch: Batch, error: str) -> None:
+		with self._cond:
+			batch.status = "unknown"
+			batch.error = error
+			batch.verify = True
+			batch.unknown_since = time.monotonic()
+			self._unknown.append(batch)
+			self._ensure_thread()
+
+	def _mark_landed(self, batch: Batch) -> None:
+		# All hashes are blacklisted on-chain, by an earlier send whose tx hash we never got
+		batch.status = "confirmed"
+		batch.error = None
+
+	def reconcile_unknown(self) -> None:
+		"""Settle unknown sends: confirmed once their hashes are on-chain, resent
+		(after a chain check) once unknown_timeout passes without that."""
+		if self._chain_statuses is None:
+			return
+		with self._cond:
+			unknown = list(self._unknown)
+		for batch in unknown:
+			try:
+				statuses = self._chain_statuses(batch.hashes)
+			except Exception:
+				continue
+			landed = all(status == 2 for status in statuses)
+			expired = time.monotonic() - (batch.unknown_since or 0.0) >= self.unknown_timeout
+			if not landed and not expired:
+				continue
+			with self._cond:
+				self._unknown.remove(batch)
+			if landed:
+				self._mark_landed(batch)
+			else:
+				self._retry_later(batch, f"not on-chain {self.unknown_timeout:g}s after: {batch.error}")
+
+	def confirm_pending(self) -> None:
+		self.reconcile_unknown()
+		if self._fetch_receipt is None:
+			return
+		with self._cond:
+			submitted = [b for b in self._batches.values() if b.status == "submitted" and b.tx_hash]
+		for batch in submitted:
+			try:
+				receipt = self._fetch_receipt(batch.tx_hash)  # type: ignore[arg-type]
+			except Exception:
+				continue
+			if not receipt:
+				continue
+			block = receipt.get("blockNumber")
+			batch.confirmed_block = int(block, 16) if isinstance(block, str) else block
+			if receipt.get("status") in ("0x1", 1):
+				batch.status = "confirmed"
+			else:
+				self._retry_later(batch, "transaction reverted")
+		self._evict_finished()
+
+	def _evict_finished(self) -> None:
+		# Oldest confirmed/failed batches go first, along with their task mappings
+		with self._cond:
+			excess = len(self._batches) - self.max_retained
+			if excess <= 0:
+				return
+			for batch in [b for b in self._batches.values() if b.status in ("confirmed", "failed")][:excess]:
+				del self._batches[batch.id]
+				for task_id in batch.task_ids:
+					if self._task_batch.get(task_id) == batch.id:
+						del self._task_batch[task_id]
+
+	def get_batch(self, batch_id: int) -> Optional[Dict[str, Any]]:
+		batch = self._batches.get(batch_id)
+		return batch.to_dict() if batch else None
+
+	def task_submission(self, task_id: int) -> Optional[Dict[str, Any]]:
+		batch = self._batches.get(self._task_batch.get(task_id, -1))
+		if batch is None:
+			return None
+		batch_id = batch.id
+		return {"taskId": task_id, "batchId": batch_id, "status": batch.status, "txHash": batch.tx_hash, "confirmed": batch.status == "confirmed"}
+
+	def stats(self) -> Dict[str, Any]:
+		with self._cond:
+			pending = len(self._open.hashes)
+			batches = list(self._batches.values())
+		counts: Dict[str, int] = {}
+		for b in batches:
+			counts[b.status] = counts.get(b.status, 0) + 1
+		return {"pendingHashes": pending, "batches": counts}
+
+	def requeue_unsubmitted(self, store: BaseStore, claim_ttl: float = 60.0) -> int:
+		"""Queue resolved tasks that never got a txHash (e.g. queued when the process
+		stopped). Their batches check the chain before sending. Only one of several
+		workers starting together does this. Returns how many."""
+		if not store.claim("blacklist-requeue", claim_ttl):
+			return 0
+		tasks = store.unsubmitted_resolved()
+		for task in tasks:
+			self.add(task["hash"], task["id"], verify=True)
+		return len(tasks)
+
+
+def _rpc_url() -> Optional[str]:
+	return os.getenv("BLACKLIST_RPC_URL") or os.getenv("LOCAL_RPC_URL")
+
+
+def _never_sent(exc: Exception) -> bool:
+	"""True for send errors that prove the request never reached the node or CDP."""
+	from http_client import CircuitOpen
+	import requests
+
+	return isinstance(exc, (CircuitOpen, requests.exceptions.ConnectTimeout))
+
+
+def _cdp_submitter(registry: str) -> Callable[[str], Optional[str]]:
+	from cdp_wallet import CdpApiError, send_blacklist_tx
+
+	chain_id = int(os.getenv("BASE_SEPOLIA_CHAIN_ID", "84532"))
+
+	def submit(calldata: str) -> Optional[str]:
+		try:
+			resp = send_blacklist_tx(chain_id, registry, calldata)
+		except CdpApiError as exc:
+			# 4xx: CDP refused the request; a 5xx may come after it broadcast the tx
+			if exc.status < 500:
+				raise SubmitRejected(str(exc)) from exc
+			raise
+		except Exception as exc:
+			if _never_sent(exc):
+				raise SubmitRejected(str(exc)) from exc
+			raise
+		return resp.get("transactionHash") or resp.get("hash")
+	return submit
+
+
+def _rpc_submitter(registry: str, rpc_url: str) -> Callable[[str], Optional[str]]:
+	from eth_rpc import RpcError, rpc_call
+
+	sender = os.getenv("BLACKLIST_FROM")
+	# Nonce of a send with an unknown outcome, by calldata: resending the same batch
+	# reuses it, so the node keeps at most one of the two transactions
+	pinned: Dict[str, str] = {}
+
+	def submit(calldata: str) -> Optional[str]:
+		nonlocal sender
+		if not sender:
+			sender = rpc_call(rpc_url, "eth_accounts")[0]
+		nonce = pinned.pop(calldata, None) or rpc_call(rpc_url, "eth_getTransactionCount", [sender, "pending"])
+		tx = {"from": sender, "to": registry, "data": calldata, "nonce": nonce}
+		try:
+			return rpc_call(rpc_url, "eth_sendTransaction", [tx], idempotent=False)
+		except RpcError as exc:
+			if exc.status is None and "already known" not in str(exc).lower():
+				# The node answered and refused it (a used nonce included: the chain check decides)
+				raise SubmitRejected(str(exc)) from exc
+			pinned[calldata] = nonce
+			raise
+		except Exception as exc:
+			if _never_sent(exc):
+				raise SubmitRejected(str(exc)) from exc
+			pinned[calldata] = nonce
+			raise
+	return submit
+
+
+_batcher: Optional[BlacklistBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_blacklist_batcher() -> Optional[BlacklistBatcher]:
+	"""Process-wide batcher, or None when ACTION_REGISTRY_ADDRESS is not configured."""
+	global _batcher
+	registry = os.getenv("ACTION_REGISTRY_ADDRESS", ZERO_ADDRESS)
+	if registry == ZERO_ADDRESS:
+		return None
+	if _batcher is not None:
+		return _batcher
+	with _batcher_lock:
+		if _batcher is None:
+			rpc_url = _rpc_url()
+			if os.getenv("BLACKLIST_SUBMITTER", "cdp").lower() == "rpc":
+				if not rpc_url:
+					raise RuntimeError("Set BLACKLIST_RPC_URL (or LOCAL_RPC_URL) for BLACKLIST_SUBMITTER=rpc")
+				submit = _rpc_submitter(registry, rpc_url)
+			else:
+				submit = _cdp_submitter(registry)
+			fetch_receipt = None
+			chain_statuses = None
+			if rpc_url:
+				from chain_reader import CANONICAL_MULTICALL3, ChainReader
+				from eth_rpc import rpc_call
+
+				fetch_receipt = lambda tx_hash: rpc_call(rpc_url, "eth_getTransactionReceipt", [tx_hash])
+				# Uncached: these reads decide whether a batch is sent again
+				chain_statuses = ChainReader(rpc_url, registry, multicall=os.getenv("MULTICALL3_ADDRESS", CANONICAL_MULTICALL3), ttl=0).statuses
+			batcher = BlacklistBatcher(
+				submit,
+				fetch_receipt,
+				max_batch=int(os.getenv("BLACKLIST_BATCH_SIZE", "100")),
+				window=float(os.getenv("BLACKLIST_BATCH_WINDOW", "2")),
+				max_attempts=int(os.getenv("BLACKLIST_MAX_ATTEMPTS", "8")),
+				retry_backoff=float(os.getenv("BLACKLIST_RETRY_BACKOFF", "2")),
+				chain_statuses=chain_statuses,
+				unknown_timeout=float(os.getenv("BLACKLIST_UNKNOWN_TIMEOUT", "300")),
+			)
+			batcher.requeue_unsubmitted(get_store())
+			_batcher = batcher
+	return _batcher
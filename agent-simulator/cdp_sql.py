@@ -1,11 +1,28 @@
+"""CDP Data API (SQL) client with a shared query result cache.
+
+Dashboards re-run the same analytic queries every few seconds, so results
+are cached on the normalized SQL text (comments and whitespace outside
+string literals removed). Identical queries in flight at the same time share
+one upstream call.
+
+Environment:
+- CDP_CLIENT_TOKEN: token with Data/SQL access (server-side only)
+- CDP_SQL_CACHE_TTL: seconds a result is reused (default 30; 0 disables caching)
+- CDP_SQL_CACHE_SIZE: cached queries kept, least recently used evicted first (default 256)
+- CDP_SQL_CACHE_MAX_ROWS: larger results are returned but not cached (default 50000)
+"""
 import os
 import json
-from typing import Any, Dict
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
+from http_client import get_http_client
+from ttl_cache import MISS, TtlCache
 
 
-CDP_SQL_ENDPOINT = "https://api.cdp.coinbase.com/platform/v2/data/query/run"
+CDP_BASE = os.getenv("CDP_API_BASE", "https://api.cdp.coinbase.com")
+CDP_SQL_ENDPOINT = f"{CDP_BASE}/platform/v2/data/query/run"
 
 
 def _require_env(name: str) -> str:
@@ -26,9 +43,73 @@ def run_cdp_sql(sql: str) -> Dict[str, Any]:
 		"Authorization": f"Bearer {token}",
 		"Content-Type": "application/json",
 	}
-	resp = requests.post(CDP_SQL_ENDPOINT, headers=headers, data=json.dumps({"sql": sql}), timeout=30)
+	resp = get_http_client().post(CDP_SQL_ENDPOINT, headers=headers, data=json.dumps({"sql": sql}))
 	if resp.status_code >= 300:
 		raise RuntimeError(f"CDP SQL API error: {resp.status_code} {resp.text}")
 	return resp.json()
 
 
+# String literals and quoted identifiers are kept verbatim; comments and runs of whitespace are not
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\s+", re.S)
+
+
+def normalize_sql(sql: str) -> str:
+	"""Cache key for a query: comments dropped, whitespace collapsed, trailing semicolons removed."""
+	parts: List[str] = []
+	pos = 0
+	for m in _SQL_TOKENS.finditer(sql):
+		if m.start() > pos:
+			parts.append(sql[pos:m.start()])
+		token = m.group(0)
+		if token[0] in "'\"":
+			parts.append(token)
+		elif parts and parts[-1] != " ":
+			parts.append(" ")
+		pos = m.end()
+	parts.append(sql[pos:])
+	return "".join(parts).strip().rstrip(";").strip()
+
+
+def result_rows(result: Dict[str, Any]) -> Optional[List[Any]]:
+	"""The row list of a query response, when it has one."""
+	rows = result.get("result") if isinstance(result, dict) else None
+	return rows if isinstance(rows, list) else None
+
+
+_cache: Optional[TtlCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_cache() -> TtlCache:
+	global _cache
+	if _cache is not None:
+		return _cache
+	with _cache_lock:
+		if _cache is None:
+			_cache = TtlCache(int(os.getenv("CDP_SQL_CACHE_SIZE", "256")), float(os.getenv("CDP_SQL_CACHE_TTL", "30")))
+	return _cache
+
+
+def _cacheable(result: Dict[str, Any]) -> bool:
+	rows = result_rows(result)
+	return rows is None or len(rows) <= int(os.getenv("CDP_SQL_CACHE_MAX_ROWS", "50000"))
+
+
+def cached_cdp_sql(sql: str, fresh: bool = False) -> Tuple[Dict[str, Any], str]:
+	"""run_cdp_sql through the result cache. Returns (result, hit | miss | coalesced).
+
+	fresh=True skips the cached copy and replaces it with the new result.
+	Callers share cached results and must not mutate them.
+	"""
+	cache = get_sql_cache()
+	if cache.ttl <= 0:
+		return run_cdp_sql(sql), MISS
+	key = normalize_sql(sql)
+	if fresh:
+		result = run_cdp_sql(sql)
+		if _cacheable(result):
+			cache.put(key, result)
+		return result, MISS
+	return cache.get_or_load(key, lambda: run_cdp_sql(sql), should_cache=_cacheable)
+
+
@@ -0,0 +1,116 @@
+"""Local stand-in for the CDP (and OpenAI) APIs, for exercising the outbound client.
+
+Serves the endpoints the agent-simulator calls, with configurable
+latency and failure injection:
+- POST /platform/v2/data/query/run          -> {"result": [rows...]}
+- POST /platform/v2/wallets/server/transactions/send -> {"transactionHash": "0x..."}
+- POST /v1/chat/completions                 -> a fixed risk assessment
+
+Point the simulator at it with CDP_API_BASE=http://127.0.0.1:<port>
+(and OPENAI_API_BASE=http://127.0.0.1:<port>/v1 for the analyzer).
+
+Run: python cdp_stub.py --port 8787 --latency 0.05 --fail-rate 0.1
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+
+SQL_PATH = "/platform/v2/data/query/run"
+SEND_TX_PATH = "/platform/v2/wallets/server/transactions/send"
+CHAT_PATH = "/v1/chat/completions"
+
+
+class StubConfig:
+	def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, rate_limit_rate: float = 0.0, rows: int = 10):
+		self.latency = latency
+		self.fail_rate = fail_rate
+		self.rate_limit_rate = rate_limit_rate
+		self.rows = rows
+		self.requests: Dict[str, int] = {}
+		self._lock = threading.Lock()
+
+	def count(self, path: str) -> None:
+		with self._lock:
+			self.requests[path] = self.requests.get(path, 0) + 1
+
+
+def _make_handler(config: StubConfig):
+	class Handler(BaseHTTPRequestHandler):
+		protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+		def log_message(self, format: str, *args: Any) -> None:
+			pass
+
+		def _reply(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+			body = json.dumps(payload).encode("utf-8")
+			self.send_response(status)
+			self.send_header("Content-Type", "application/json")
+			self.send_header("Content-Length", str(len(body)))
+			for k, v in (headers or {}).items():
+				self.send_header(k, v)
+			self.end_headers()
+			self.wfile.write(body)
+
+		def do_POST(self) -> None:
+			length = int(self.headers.get("Content-Length", "0"))
+			raw = self.rfile.read(length) if length else b""
+			config.count(self.path)
+			if config.latency:
+				time.sleep(config.latency)
+			roll = random.random()
+			if roll < config.rate_limit_rate:
+				self._reply(429, {"errorMessage": "rate limited"}, {"Retry-After": "0"})
+				return
+			if roll < config.rate_limit_rate + config.fail_rate:
+				self._reply(503, {"errorMessage": "stub failure"})
+				return
+			if self.path == SQL_PATH:
+				body = json.loads(raw or b"{}")
+				rows = [{"row": i, "sql": body.get("sql", "")} for i in range(config.rows)]
+				self._reply(200, {"result": rows})
+			elif self.path == SEND_TX_PATH:
+				self._reply(200, {"transactionHash": "0x" + os.urandom(32).hex()})
+			elif self.path == CHAT_PATH:
+				assessment = {"riskScore": 0.5, "label": "suspicious", "reasons": ["stub assessment"]}
+				self._reply(200, {"choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(assessment)}}]})
+			else:
+				self._reply(404, {"errorMessage": f"unknown path {self.path}"})
+
+	return Handler
+
+
+def start_stub(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+	"""Start the stub on a background thread. Returns (server, base_url); call server.shutdown() to stop."""
+	server = ThreadingHTTPServer((host, port), _make_handler(config))
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Local CDP API stub")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8787)
+	parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+	parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+	parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+	parser.add_argument("--rows", type=int, default=10, help="Rows returned by the SQL endpoint")
+	args = parser.parse_args()
+
+	config = StubConfig(args.latency, args.fail_rate, args.rate_limit_rate, args.rows)
+	server = ThreadingHTTPServer((args.host, args.port), _make_handler(config))
+	print(f"CDP stub listening on http://{args.host}:{args.port}")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == "__main__":
+	main()
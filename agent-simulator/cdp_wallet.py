@@ -1,14 +1,24 @@
 import base64
+import hashlib
 import json
 import os
+import threading
 import time
-from typing import Any, Dict
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
 
-import requests
-import jwt  # PyJWT
+from http_client import get_http_client
 
 
-CDP_BASE = "https://api.cdp.coinbase.com"
+CDP_BASE = os.getenv("CDP_API_BASE", "https://api.cdp.coinbase.com")
+
+
+class CdpApiError(RuntimeError):
+	"""A CDP API call answered with an error status (kept in .status)."""
+
+	def __init__(self, message: str, status: int):
+		super().__init__(message)
+		self.status = status
 
 
 def _require_env(name: str) -> str:
@@ -18,27 +28,124 @@ def _require_env(name: str) -> str:
 	return val
 
 
-def build_cdp_jwt(method: str, path: str, body: Dict[str, Any] | None = None) -> str:
-	"""Build a short-lived JWT for CDP v2 auth.
+def _load_private_key(private_key_b64: str) -> Any:
+	"""Decode the base64 API key once into something PyJWT can sign with."""
+	raw = base64.b64decode(private_key_b64)
+	if raw.lstrip().startswith(b"-----BEGIN"):
+		return raw
+	if len(raw) in (32, 64):
+		try:
+			from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+			# CDP Ed25519 secrets are seed (32 bytes) optionally followed by the public key
+			return Ed25519PrivateKey.from_private_bytes(raw[:32])
+		except Exception:
+			pass
+	return raw
+
+
+def body_hash(body: Dict[str, Any] | None) -> str | None:
+	"""SHA-256 hex of the canonical (sorted, compact) JSON body, or None without a body."""
+	if body is None:
+		return None
+	return hashlib.sha256(json.dumps(body, separators=(",", ":"), sort_keys=True).encode("utf-8")).hexdigest()
 
-	This is a simplified placeholder. Consult CDP docs to include required claims (iss, sub, nbf, exp, uri, method, body hash).
+
+class CdpSigner:
+	"""CDP v2 JWT signer that parses the key once and reuses tokens.
+
+	Tokens are cached per (method, path, body hash) until refresh_margin
+	seconds before they expire. The body hash is part of the signed claims,
+	so a cached token is only ever reused for an identical request.
 	"""
-	project_id = _require_env("CDP_PROJECT_ID")
-	api_key_name = _require_env("CDP_API_KEY_NAME")
-	private_key_b64 = _require_env("CDP_API_KEY_PRIVATE_KEY")
-	private_key = base64.b64decode(private_key_b64)
-
-	now = int(time.time())
-	claims = {
-		"iss": project_id,
-		"sub": api_key_name,
-		"nbf": now,
-		"exp": now + 120,
-		"uri": path,
-		"method": method.upper(),
-	}
-	# If body required in signature, include a deterministic hash field per CDP spec
-	return jwt.encode(claims, private_key, algorithm="EdDSA")  # type: ignore[arg-type]
+
+	def __init__(self, project_id: str, api_key_name: str, private_key_b64: str, ttl: int = 120, refresh_margin: int = 10, max_cached: int = 256):
+		self.project_id = project_id
+		self.api_key_name = api_key_name
+		self.ttl = ttl
+		self.refresh_margin = refresh_margin
+		self.max_cached = max_cached
+		self._key = _load_private_key(private_key_b64)
+		self._tokens: "OrderedDict[Tuple[str, str, str | None], Tuple[str, int]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.signed = 0
+		self.cache_hits = 0
+		self.sign_seconds = 0.0
+
+	def token(self, method: str, path: str, body: Dict[str, Any] | None = None) -> str:
+		req_hash = body_hash(body)
+		key = (method.upper(), path, req_hash)
+		now = int(time.time())
+		with self._lock:
+			cached = self._tokens.get(key)
+			if cached is not None and now < cached[1] - self.refresh_margin:
+				self._tokens.move_to_end(key)
+				self.cache_hits += 1
+				return cached[0]
+
+		claims: Dict[str, Any] = {
+			"iss": self.project_id,
+			"sub": self.api_key_name,
+			"nbf": now,
+			"exp": now + self.ttl,
+			"uri": path,
+			"method": key[0],
+		}
+		if req_hash is not None:
+			claims["reqHash"] = req_hash
+		started = time.perf_counter()
+		import jwt  # PyJWT, imported on first signature to keep startup light
+
+		token = jwt.encode(claims, self._key, algorithm="EdDSA")  # type: ignore[arg-type]
+		elapsed = time.perf_counter() - started
+
+		with self._lock:
+			self.signed += 1
+			self.sign_seconds += elapsed
+			self._tokens[key] = (token, claims["exp"])
+			while len(self._tokens) > self.max_cached:
+				self._tokens.popitem(last=False)
+		return token
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"signed": self.signed,
+			"cacheHits": self.cache_hits,
+			"signMsTotal": round(self.sign_seconds * 1000, 3),
+			"signMsAvg": round(self.sign_seconds * 1000 / self.signed, 3) if self.signed else 0.0,
+		}
+
+
+_signer: CdpSigner | None = None
+_signer_env: Tuple[str, str, str] | None = None
+_signer_lock = threading.Lock()
+
+
+def get_signer() -> CdpSigner:
+	"""Process-wide signer; rebuilt only when the CDP credentials in the environment change."""
+	global _signer, _signer_env
+	env = (
+		_require_env("CDP_PROJECT_ID"),
+		_require_env("CDP_API_KEY_NAME"),
+		_require_env("CDP_API_KEY_PRIVATE_KEY"),
+	)
+	if _signer is not None and env == _signer_env:
+		return _signer
+	with _signer_lock:
+		if _signer is None or env != _signer_env:
+			_signer = CdpSigner(*env)
+			_signer_env = env
+	return _signer
+
+
+def signer_stats() -> Dict[str, Any]:
+	"""Signing metrics, or {} if nothing has been signed in this process."""
+	return _signer.stats() if _signer is not None else {}
+
+
+def build_cdp_jwt(method: str, path: str, body: Dict[str, Any] | None = None) -> str:
+	"""Return a short-lived JWT for CDP v2 auth (iss, sub, nbf, exp, uri, method, reqHash)."""
+	return get_signer().token(method, path, body)
 
 
 def _headers(token: str) -> Dict[str, str]:
@@ -54,7 +161,6 @@ def send_blacklist_tx(chain_id: int, to_address: str, data_hex: str, value_wei:
 	Note: You must fund the server wallet and set the correct contract address.
 	"""
 	path = "/platform/v2/wallets/server/transactions/send"
-	token = build_cdp_jwt("POST", path, None)
 	url = f"{CDP_BASE}{path}"
 	payload = {
 		"networkId": chain_id,
@@ -64,9 +170,11 @@ def send_blacklist_tx(chain_id: int, to_address: str, data_hex: str, value_wei:
 			"data": data_hex,
 		},
 	}
-	resp = requests.post(url, headers=_headers(token), data=json.dumps(payload), timeout=30)
+	token = build_cdp_jwt("POST", path, payload)
+	# Not idempotent: only retried when the request cannot have reached CDP
+	resp = get_http_client().post(url, idempotent=False, headers=_headers(token), data=json.dumps(payload))
 	if resp.status_code >= 300:
-		raise RuntimeError(f"CDP send tx failed: {resp.status_code} {resp.text}")
+		raise CdpApiError(f"CDP send tx failed: {resp.status_code} {resp.text}", resp.status_code)
 	return resp.json()
 
 
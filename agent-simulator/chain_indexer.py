@@ -0,0 +1,369 @@
+"""Mirror ReviewOracle / ActionRegistry events into a local SQLite index.
+
+Tails ReviewOracle.ActionFlagged and ActionRegistry.ActionStatusChanged
+with eth_getLogs over block ranges (several ranges per JSON-RPC batch when
+catching up), records the hash of every indexed block it relies on, and
+checkpoints after each range. On each poll the checkpoint block's hash is
+compared with the chain; on a mismatch the index rewinds to the last
+block whose hash still matches and re-indexes from there.
+
+Status and tasks are answered from the index, so /chain/status/<hash>
+(and /status/<hash>?source=chain, which redirects there) needs no RPC
+round trip. The index only counts as authoritative while it is
+caught_up(): polls succeed and the checkpoint is within INDEXER_MAX_LAG
+blocks of the confirmed head.
+
+Run against a local Hardhat node:
+  python chain_indexer.py run     # poll forever
+  python chain_indexer.py once    # index up to the current head and exit
+
+Environment:
+- INDEXER_RPC_URL: node to index (default LOCAL_RPC_URL)
+- ACTION_REGISTRY_ADDRESS / REVIEW_ORACLE_ADDRESS: contracts to follow
+- INDEXER_START_BLOCK: first block to index (default 0)
+- INDEXER_BATCH_BLOCKS: blocks per eth_getLogs range (default 2000)
+- INDEXER_RANGES_PER_POLL: ranges sent per JSON-RPC batch (default 8)
+- INDEXER_CONFIRMATIONS: blocks to stay behind head (default 0)
+- INDEXER_MAX_LAG: blocks the checkpoint may trail head - confirmations and still answer (default 5)
+- INDEXER_POLL_INTERVAL: seconds between polls (default 2)
+- CHAIN_INDEX_PATH: SQLite file (default chain_index.sqlite3 next to this module)
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from eth_rpc import rpc_batch
+from store import normalize_hash
+
+
+DEFAULT_INDEX_PATH = Path(__file__).parent / "chain_index.sqlite3"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# keccak256 of the event signatures; precomputed so importing needs no Keccak backend
+ACTION_FLAGGED_TOPIC = "0xd7634eb241af278b842df0c14f3313d5a6b0517f382fa0988194c6d741c0f061"  # ActionFlagged(uint256,bytes32)
+STATUS_CHANGED_TOPIC = "0xb3b9fa2cc7f437c1068a87f3d6ff9b29091e3559dc8f4c5611b0ca1688a06d4e"  # ActionStatusChanged(bytes32,uint8)
+# Block hashes kept for reorg detection; deeper reorgs re-index from the start block
+BLOCK_HASHES_RETAINED = 256
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chain_checkpoint (
+	id INTEGER PRIMARY KEY CHECK (id = 0),
+	block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chain_blocks (
+	number INTEGER PRIMARY KEY,
+	hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chain_tasks (
+	task_id INTEGER PRIMARY KEY,
+	hash TEXT NOT NULL,
+	block INTEGER NOT NULL,
+	tx_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS chain_status_events (
+	block INTEGER NOT NULL,
+	log_index INTEGER NOT NULL,
+	hash TEXT NOT NULL,
+	status INTEGER NOT NULL,
+	PRIMARY KEY (block, log_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chain_status_hash_idx ON chain_status_events (hash, block, log_index);
+"""
+
+
+class ChainIndex:
+	"""SQLite-backed view of indexed chain state. Same connection model as store.SqliteStore."""
+
+	def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+		self.path = Path(path)
+		self._local = threading.local()
+		self._conn().executescript(_SCHEMA)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+		return conn
+
+	@contextmanager
+	def _write(self) -> Iterator[sqlite3.Connection]:
+		conn = self._conn()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			yield conn
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		conn.execute("COMMIT")
+
+	def checkpoint(self) -> Optional[int]:
+		row = self._conn().execute("SELECT block FROM chain_checkpoint WHERE id = 0").fetchone()
+		return row[0] if row else None
+
+	def block_hash(self, number: int) -> Optional[str]:
+		row = self._conn().execute("SELECT hash FROM chain_blocks WHERE number = ?", (number,)).fetchone()
+		return row[0] if row else None
+
+	def recent_blocks(self) -> List[Tuple[int, str]]:
+		return self._conn().execute("SELECT number, hash FROM chain_blocks ORDER BY number DESC").fetchall()
+
+	def apply_range(self, to_block: int, to_hash: str, logs: Sequence[Dict[str, Any]]) -> Tuple[int, int]:
+		"""Store one range's decoded logs and advance the checkpoint atomically. Returns (tasks, status changes)."""
+		tasks = []
+		statuses = []
+		blocks = {to_block: to_hash}
+		for log in logs:
+			block = int(log["blockNumber"], 16)
+			blocks[block] = log["blockHash"]
+			topic = log["topics"][0].lower()
+			if topic == ACTION_FLAGGED_TOPIC:
+				tasks.append((int(log["topics"][1], 16), normalize_hash(log["data"][:66]), block, log.get("transactionHash")))
+			elif topic == STATUS_CHANGED_TOPIC:
+				statuses.append((block, int(log["logIndex"], 16), normalize_hash(log["topics"][1]), int(log["data"], 16)))
+		with self._write() as conn:
+			conn.executemany("INSERT OR REPLACE INTO chain_tasks (task_id, hash, block, tx_hash) VALUES (?, ?, ?, ?)", tasks)
+			conn.executemany("INSERT OR REPLACE INTO chain_status_events (block, log_index, hash, status) VALUES (?, ?, ?, ?)", statuses)
+			conn.executemany("INSERT OR REPLACE INTO chain_blocks (number, hash) VALUES (?, ?)", blocks.items())
+			conn.execute("DELETE FROM chain_blocks WHERE number <= ?", (to_block - BLOCK_HASHES_RETAINED,))
+			conn.execute("INSERT OR REPLACE INTO chain_checkpoint (id, block) VALUES (0, ?)", (to_block,))
+		return len(tasks), len(statuses)
+
+	def rewind(self, block: int) -> None:
+		"""Drop everything indexed after `block` and checkpoint there."""
+		with self._write() as conn:
+			conn.execute("DELETE FROM chain_tasks WHERE block > ?", (block,))
+			conn.execute("DELETE FROM chain_status_events WHERE block > ?", (block,))
+			conn.execute("DELETE FROM chain_blocks WHERE number > ?", (block,))
+			conn.execute("INSERT OR REPLACE INTO chain_checkpoint (id, block) VALUES (0, ?)", (block,))
+
+	def status(self, action_hash: str) -> int:
+		row = self._conn().execute(
+			"SELECT status FROM chain_status_events WHERE hash = ? ORDER BY block DESC, log_index DESC LIMIT 1",
+			(normalize_hash(action_hash),),
+		).fetchone()
+		return row[0] if row else 0
+
+	def tasks(self, after: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+		rows = self._conn().execute(
+			"SELECT task_id, hash, block, tx_hash FROM chain_tasks WHERE task_id > ? ORDER BY task_id LIMIT ?",
+			(-1 if after is None else after, limit),
+		).fetchall()
+		return [{"taskId": r[0], "hash": r[1], "blockNumber": r[2], "txHash": r[3], "status": self.status(r[1])} for r in rows]
+
+	def reset(self) -> None:
+		with self._write() as conn:
+			for table in ("chain_checkpoint", "chain_blocks", "chain_tasks", "chain_status_events"):
+				conn.execute(f"DELETE FROM {table}")
+
+
+class ChainIndexer:
+	def __init__(
+		self,
+		index: ChainIndex,
+		rpc_url: str,
+		addresses: Sequence[str],
+		start_block: int = 0,
+		batch_blocks: int = 2000,
+		ranges_per_poll: int = 8,
+		confirmations: int = 0,
+		max_lag: int = 5,
+	):
+		self.index = index
+		self.rpc_url = rpc_url
+		self.addresses = [a for a in addresses if a and a != ZERO_ADDRESS]
+		self.start_block = start_block
+		self.batch_blocks = batch_blocks
+		self.ranges_per_poll = ranges_per_poll
+		self.confirmations = confirmations
+		self.max_lag = max_lag
+		self.head: Optional[int] = None
+		self.reorgs = 0
+		self.polls = 0
+		self.last_error: Optional[str] = None
+
+	def _check_reorg(self, checkpoint: int, chain_hash: Optional[str]) -> Optional[int]:
+		"""Returns the block to rewind to, or None when the checkpoint is still canonical."""
+		stored = self.index.block_hash(checkpoint)
+		if stored is None or chain_hash is None or stored == chain_hash:
+			return None
+		recent = self.index.recent_blocks()
+		results = rpc_batch(self.rpc_url, [("eth_getBlockByNumber", [hex(n), False]) for n, _ in recent])
+		for (number, block_hash), block in zip(recent, results):
+			if isinstance(block, dict) and block.get("hash") == block_hash:
+				return number
+		return self.start_block - 1
+
+	def poll(self) -> Dict[str, int]:
+		"""Index up to head - confirmations. Returns counts for this poll.
+
+		Owns last_error: set when the poll raises or a range fails (the ranges
+		before it are kept), cleared only by a poll that indexed everything it tried.
+		"""
+		self.polls += 1
+		try:
+			totals, error = self._poll()
+		except Exception as exc:
+			self.last_error = str(exc)
+			raise
+		self.last_error = error
+		return totals
+
+	def _poll(self) -> Tuple[Dict[str, int], Optional[str]]:
+		checkpoint = self.index.checkpoint()
+		calls: List[Tuple[str, Sequence[Any]]] = [("eth_blockNumber", [])]
+		if checkpoint is not None:
+			calls.append(("eth_getBlockByNumber", [hex(checkpoint), False]))
+		results = rpc_batch(self.rpc_url, calls)
+		if isinstance(results[0], Exception):
+			raise results[0]
+		self.head = int(results[0], 16)
+		if checkpoint is not None:
+			block = results[1] if isinstance(results[1], dict) else None
+			rewind_to = self._check_reorg(checkpoint, block.get("hash") if block else None)
+			if rewind_to is not None:
+				self.reorgs += 1
+				self.index.rewind(rewind_to)
+				checkpoint = rewind_to
+		next_block = self.start_block if checkpoint is None else checkpoint + 1
+		target = self.head - self.confirmations
+		ranges = []
+		while next_block <= target and len(ranges) < self.ranges_per_poll:
+			end = min(next_block + self.batch_blocks - 1, target)
+			ranges.append((next_block, end))
+			next_block = end + 1
+		if not ranges:
+			return {"ranges": 0, "tasks": 0, "statusChanges": 0}, None
+		# One HTTP round trip: logs for every range plus the hash of each range's last block
+		calls = []
+		for start, end in ranges:
+			flt = {"fromBlock": hex(start), "toBlock": hex(end), "address": self.addresses, "topics": [[ACTION_FLAGGED_TOPIC, STATUS_CHANGED_TOPIC]]}
+			calls.append(("eth_getLogs", [flt]))
+			calls.append(("eth_getBlockByNumber", [hex(end), False]))
+		results = rpc_batch(self.rpc_url, calls)
+		totals = {"ranges": 0, "tasks": 0, "statusChanges": 0}
+		error = None
+		for i, (start, end) in enumerate(ranges):
+			logs, block = results[2 * i], results[2 * i + 1]
+			if isinstance(logs, Exception) or not isinstance(block, dict):
+				# Usually a provider's result-size limit: retry smaller ranges next poll
+				self.batch_blocks = max(1, self.batch_blocks // 2)
+				error = str(logs if isinstance(logs, Exception) else block)
+				break
+			logs = sorted((l for l in logs if not l.get("removed")), key=lambda l: (int(l["blockNumber"], 16), int(l["logIndex"], 16)))
+			tasks, statuses = self.index.apply_range(end, block["hash"], logs)
+			totals["ranges"] += 1
+			totals["tasks"] += tasks
+			totals["statusChanges"] += statuses
+		return totals, error
+
+	def run_forever(self, interval: float) -> None:
+		while True:
+			try:
+				self.poll()
+			except Exception:  # recorded in last_error by poll(); try again next tick
+				pass
+			time.sleep(interval)
+
+	def caught_up(self) -> bool:
+		"""Whether the index reflects the chain closely enough to answer status reads."""
+		checkpoint = self.index.checkpoint()
+		if self.head is None or checkpoint is None or self.last_error is not None:
+			return False
+		return self.head - self.confirmations - checkpoint <= self.max_lag
+
+	def stats(self) -> Dict[str, Any]:
+		checkpoint = self.index.checkpoint()
+		return {
+			"checkpoint": checkpoint,
+			"head": self.head,
+			"lag": None if self.head is None or checkpoint is None else self.head - checkpoint,
+			"reorgs": self.reorgs,
+			"polls": self.polls,
+			"batchBlocks": self.batch_blocks,
+			"lastError": self.last_error,
+			"caughtUp": self.caught_up(),
+		}
+
+
+def _rpc_url() -> Optional[str]:
+	return os.getenv("INDEXER_RPC_URL") or os.getenv("LOCAL_RPC_URL")
+
+
+def build_indexer() -> ChainIndexer:
+	rpc_url = _rpc_url()
+	addresses = [os.getenv("ACTION_REGISTRY_ADDRESS", ZERO_ADDRESS), os.getenv("REVIEW_ORACLE_ADDRESS", ZERO_ADDRESS)]
+	if not rpc_url or all(a == ZERO_ADDRESS for a in addresses):
+		raise RuntimeError("Set INDEXER_RPC_URL (or LOCAL_RPC_URL) and ACTION_REGISTRY_ADDRESS / REVIEW_ORACLE_ADDRESS")
+	return ChainIndexer(
+		get_chain_index(),
+		rpc_url,
+		addresses,
+		start_block=int(os.getenv("INDEXER_START_BLOCK", "0")),
+		batch_blocks=int(os.getenv("INDEXER_BATCH_BLOCKS", "2000")),
+		ranges_per_poll=int(os.getenv("INDEXER_RANGES_PER_POLL", "8")),
+		confirmations=int(os.getenv("INDEXER_CONFIRMATIONS", "0")),
+		max_lag=int(os.getenv("INDEXER_MAX_LAG", "5")),
+	)
+
+
+_index: Optional[ChainIndex] = None
+_indexer: Optional[ChainIndexer] = None
+_lock = threading.Lock()
+
+
+def get_chain_index() -> ChainIndex:
+	global _index
+	if _index is not None:
+		return _index
+	with _lock:
+		if _index is None:
+			_index = ChainIndex(Path(os.getenv("CHAIN_INDEX_PATH", str(DEFAULT_INDEX_PATH))))
+	return _index
+
+
+def start_indexer() -> Optional[ChainIndexer]:
+	"""Start the background indexer once per process if an RPC URL and contract are configured."""
+	global _indexer
+	try:
+		indexer = build_indexer()
+	except RuntimeError:
+		return None
+	with _lock:
+		if _indexer is None:
+			_indexer = indexer
+			interval = float(os.getenv("INDEXER_POLL_INTERVAL", "2"))
+			threading.Thread(target=indexer.run_forever, args=(interval,), name="chain-indexer", daemon=True).start()
+	return _indexer
+
+
+def get_indexer() -> Optional[ChainIndexer]:
+	return _indexer
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Index ReviewOracle / ActionRegistry events")
+	parser.add_argument("command", choices=["run", "once", "reset"])
+	args = parser.parse_args()
+	if args.command == "reset":
+		get_chain_index().reset()
+		return
+	indexer = build_indexer()
+	if args.command == "run":
+		indexer.run_forever(float(os.getenv("INDEXER_POLL_INTERVAL", "2")))
+	while True:
+		totals = indexer.poll()
+		print(totals, indexer.stats())
+		if indexer.stats()["lag"] in (0, None) or not totals["ranges"]:
+			break
+
+
+if __name__ == "__main__":
+	main()
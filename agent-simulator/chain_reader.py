@@ -0,0 +1,217 @@
+"""Batched ActionRegistry.getActionStatus reads for real (on-chain) mode.
+
+One process-wide reader talks JSON-RPC over the pooled HTTP client (no
+web3 import). Many lookups become one round trip:
+- Multicall3.blockAndAggregate when the contract exists on the chain
+  (chunked, all chunks in one JSON-RPC batch request);
+- otherwise a JSON-RPC batch of plain eth_calls.
+
+Results are cached per (block number, hash). The block number seen last
+is reused for CHAIN_READ_TTL seconds, so repeated checks within that window
+are answered from memory and stay consistent with one block.
+
+Environment:
+- LOCAL_RPC_URL: node to read (default http://127.0.0.1:8545)
+- ACTION_REGISTRY_ADDRESS: registry to query
+- MULTICALL3_ADDRESS: Multicall3 deployment (default the canonical address; "" disables)
+- CHAIN_READ_TTL: seconds a block number is reused (default 2)
+- CHAIN_READ_CHUNK: lookups per eth_call (default 500)
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from eth_rpc import RpcError, rpc_batch, rpc_call
+from store import normalize_hash
+
+
+CANONICAL_MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# keccak256(signature)[:4]; precomputed so importing needs no Keccak backend
+GET_ACTION_STATUS_SELECTOR = bytes.fromhex("bea0897c")  # getActionStatus(bytes32)
+BLOCK_AND_AGGREGATE_SELECTOR = bytes.fromhex("c3077fa9")  # blockAndAggregate((address,bytes)[])
+
+
+def _word(n: int) -> bytes:
+	return n.to_bytes(32, "big")
+
+
+def encode_get_action_status(action_hash: str) -> bytes:
+	return GET_ACTION_STATUS_SELECTOR + bytes.fromhex(normalize_hash(action_hash)).rjust(32, b"\x00")
+
+
+def encode_block_and_aggregate(target: str, calls: Sequence[bytes]) -> str:
+	"""ABI-encode blockAndAggregate((address,bytes)[]) for calls to one target."""
+	address = bytes.fromhex(target[2:] if target.startswith("0x") else target).rjust(32, b"\x00")
+	tuples = []
+	for data in calls:
+		padded = data + b"\x00" * (-len(data) % 32)
+		tuples.append(address + _word(64) + _word(len(data)) + padded)
+	offsets = []
+	position = 32 * len(tuples)
+	for t in tuples:
+		offsets.append(_word(position))
+		position += len(t)
+	body = _word(32) + _word(len(tuples)) + b"".join(offsets) + b"".join(tuples)
+	return "0x" + (BLOCK_AND_AGGREGATE_SELECTOR + body).hex()
+
+
+def decode_block_and_aggregate(result: str) -> Tuple[int, List[Optional[bytes]]]:
+	"""Returns (block number, return data per call, None where a call failed)."""
+	raw = bytes.fromhex(result[2:])
+
+	def word(offset: int) -> int:
+		return int.from_bytes(raw[offset:offset + 32], "big")
+
+	block = word(0)
+	array = word(64)
+	count = word(array)
+	base = array + 32
+	out: List[Optional[bytes]] = []
+	for i in range(count):
+		item = base + word(base + 32 * i)
+		success = word(item) != 0
+		data_at = item + word(item + 32)
+		length = word(data_at)
+		out.append(raw[data_at + 32:data_at + 32 + length] if success else None)
+	return block, out
+
+
+class ChainReader:
+	def __init__(
+		self,
+		rpc_url: str,
+		registry: str,
+		multicall: Optional[str] = CANONICAL_MULTICALL3,
+		ttl: float = 2.0,
+		chunk: int = 500,
+		max_cached_blocks: int = 4,
+	):
+		self.rpc_url = rpc_url
+		self.registry = registry
+		self.multicall = multicall or None
+		self._multicall_checked = False
+		self.ttl = ttl
+		self.chunk = chunk
+		self.max_cached_blocks = max_cached_blocks
+		self._block: Optional[int] = None
+		self._block_seen_at = 0.0
+		self._cache: Dict[int, Dict[str, int]] = {}
+		self._lock = threading.Lock()
+		self.round_trips = 0
+		self.lookups = 0
+		self.cache_hits = 0
+
+	def _use_multicall(self) -> bool:
+		if self.multicall and not self._multicall_checked:
+			# Local nodes (Hardhat, anvil) usually lack Multicall3; fall back to batched eth_calls
+			self.round_trips += 1
+			code = rpc_call(self.rpc_url, "eth_getCode", [self.multicall, "latest"])
+			if not code or code == "0x":
+				self.multicall = None
+			self._multicall_checked = True
+		return self.multicall is not None
+
+	def _current_block(self) -> Optional[int]:
+		if self._block is not None and time.monotonic() - self._block_seen_at < self.ttl:
+			return self._block
+		return None
+
+	def _remember(self, block: int, statuses: Dict[str, int]) -> None:
+		with self._lock:
+			if self._block is None or block >= self._block:
+				self._block = block
+				self._block_seen_at = time.monotonic()
+			self._cache.setdefault(block, {}).update(statuses)
+			for old in sorted(self._cache)[:-self.max_cached_blocks]:
+				del self._cache[old]
+
+	def _fetch_multicall(self, keys: List[str], block: Optional[int]) -> Tuple[int, Dict[str, int]]:
+		tag = hex(block) if block is not None else "latest"
+		chunks = [keys[i:i + self.chunk] for i in range(0, len(keys), self.chunk)]
+		calls = [
+			("eth_call", [{"to": self.multicall, "data": encode_block_and_aggregate(self.registry, [encode_get_action_status(k) for k in c])}, tag])
+			for c in chunks
+		]
+		self.round_trips += 1
+		statuses: Dict[str, int] = {}
+		seen_block = block
+		for c, result in zip(chunks, rpc_batch(self.rpc_url, calls)):
+			if isinstance(result, Exception):
+				raise result
+			result_block, datas = decode_block_and_aggregate(result)
+			# "latest" may advance between chunks; keep the lowest block seen
+			seen_block = result_block if seen_block is None else min(seen_block, result_block)
+			for k, data in zip(c, datas):
+				statuses[k] = int.from_bytes(data, "big") if data else 0
+		return seen_block if seen_block is not None else 0, statuses
+
+	def _fetch_batch(self, keys: List[str], block: Optional[int]) -> Tuple[int, Dict[str, int]]:
+		calls: List[Tuple[str, Sequence[object]]] = []
+		if block is None:
+			calls.append(("eth_blockNumber", []))
+		tag = hex(block) if block is not None else "latest"
+		calls.extend(("eth_call", [{"to": self.registry, "data": "0x" + encode_get_action_status(k).hex()}, tag]) for k in keys)
+		self.round_trips += 1
+		results = rpc_batch(self.rpc_url, calls)
+		if block is None:
+			if isinstance(results[0], Exception):
+				raise results[0]
+			block = int(results[0], 16)
+			results = results[1:]
+		statuses: Dict[str, int] = {}
+		for k, result in zip(keys, results):
+			if isinstance(result, Exception):
+				raise RpcError(f"getActionStatus({k}) failed: {result}")
+			statuses[k] = int(result, 16) if result and result != "0x" else 0
+		return block, statuses
+
+	def statuses(self, action_hashes: Sequence[str]) -> List[int]:
+		"""getActionStatus for each hash, in order, in at most one RPC round trip (plus a one-time Multicall3 probe)."""
+		keys = [normalize_hash(h) for h in action_hashes]
+		self.lookups += len(keys)
+		block = self._current_block()
+		cached = self._cache.get(block, {}) if block is not None else {}
+		missing = list(dict.fromkeys(k for k in keys if k not in cached))
+		self.cache_hits += len(keys) - sum(1 for k in keys if k not in cached)
+		if missing:
+			fetch = self._fetch_multicall if self._use_multicall() else self._fetch_batch
+			block, fetched = fetch(missing, block)
+			self._remember(block, fetched)
+			cached = {**cached, **fetched}
+		return [cached[k] for k in keys]
+
+	def status(self, action_hash: str) -> int:
+		return self.statuses([action_hash])[0]
+
+	def stats(self) -> Dict[str, object]:
+		return {
+			"block": self._block,
+			"multicall": self.multicall,
+			"lookups": self.lookups,
+			"cacheHits": self.cache_hits,
+			"roundTrips": self.round_trips,
+		}
+
+
+_reader: Optional[ChainReader] = None
+_reader_lock = threading.Lock()
+
+
+def get_chain_reader() -> ChainReader:
+	global _reader
+	if _reader is not None:
+		return _reader
+	with _reader_lock:
+		if _reader is None:
+			registry = os.getenv("ACTION_REGISTRY_ADDRESS")
+			if not registry:
+				raise RuntimeError("Set ACTION_REGISTRY_ADDRESS to query real ActionRegistry")
+			_reader = ChainReader(
+				os.getenv("LOCAL_RPC_URL", "http://127.0.0.1:8545"),
+				registry,
+				multicall=os.getenv("MULTICALL3_ADDRESS", CANONICAL_MULTICALL3),
+				ttl=float(os.getenv("CHAIN_READ_TTL", "2")),
+				chunk=int(os.getenv("CHAIN_READ_CHUNK", "500")),
+			)
+	return _reader
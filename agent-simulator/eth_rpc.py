@@ -0,0 +1,49 @@
+"""Minimal Ethereum JSON-RPC helpers over the shared HTTP client (no web3 import)."""
+import itertools
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from http_client import get_http_client
+
+
+_ids = itertools.count(1)
+
+
+class RpcError(RuntimeError):
+	"""status is the HTTP status of a failed request, None when the node answered
+	with a JSON-RPC error object."""
+
+	def __init__(self, message: str, status: Optional[int] = None):
+		super().__init__(message)
+		self.status = status
+
+
+def rpc_call(url: str, method: str, params: Sequence[Any] = (), idempotent: bool = True) -> Any:
+	"""Pass idempotent=False for state-changing methods (eth_sendTransaction) so a
+	timed-out request is not resent by the HTTP client."""
+	payload = {"jsonrpc": "2.0", "id": next(_ids), "method": method, "params": list(params)}
+	resp = get_http_client().post(url, idempotent=idempotent, headers={"Content-Type": "application/json"}, data=json.dumps(payload))
+	if resp.status_code >= 300:
+		raise RpcError(f"RPC {method} failed: {resp.status_code} {resp.text}", resp.status_code)
+	body = resp.json()
+	if body.get("error"):
+		raise RpcError(f"RPC {method} error: {body['error']}")
+	return body.get("result")
+
+
+def rpc_batch(url: str, calls: Sequence[Tuple[str, Sequence[Any]]]) -> List[Any]:
+	"""Send many calls in one JSON-RPC batch request. Results come back in call order;
+	a failed call yields an RpcError instance in its slot instead of raising."""
+	if not calls:
+		return []
+	# Ids only need to be unique within one batch; use the call index
+	payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": list(p)} for i, (m, p) in enumerate(calls)]
+	resp = get_http_client().post(url, headers={"Content-Type": "application/json"}, data=json.dumps(payload))
+	if resp.status_code >= 300:
+		raise RpcError(f"RPC batch failed: {resp.status_code} {resp.text}", resp.status_code)
+	results: List[Any] = [RpcError("missing response")] * len(calls)
+	for item in resp.json():
+		idx = item.get("id")
+		if isinstance(idx, int) and 0 <= idx < len(calls):
+			results[idx] = RpcError(str(item["error"])) if item.get("error") else item.get("result")
+	return results
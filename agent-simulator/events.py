@@ -0,0 +1,146 @@
+"""In-process task event log feeding the reviewer Server-Sent Events stream.
+
+Handlers publish task changes (flagged, voted, resolved) to a bounded ring
+buffer with increasing sequence numbers. Stream clients resume from a token
+("<epoch>.<seq>"); if the token is from another server process or older
+than the buffer, they get a "reset" event and should refetch GET /tasks.
+
+Environment:
+- TASK_EVENTS_RETAINED: events kept for resuming clients (default 10000)
+- SSE_KEEPALIVE: seconds between keep-alive comments (default 15)
+"""
+import collections
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+class TaskEventLog:
+	def __init__(self, max_events: int = 10000):
+		self.epoch = uuid.uuid4().hex[:8]
+		self.seq = 0
+		self._events: Deque[Tuple[int, str, Dict[str, Any]]] = collections.deque(maxlen=max_events)
+		self._cond = threading.Condition()
+
+	def token(self, seq: Optional[int] = None) -> str:
+		return f"{self.epoch}.{self.seq if seq is None else seq}"
+
+	def publish(self, kind: str, data: Dict[str, Any]) -> None:
+		with self._cond:
+			self.seq += 1
+			self._events.append((self.seq, kind, data))
+			self._cond.notify_all()
+
+	def parse_token(self, token: Optional[str]) -> Optional[int]:
+		"""Sequence number for a resume token, or None if it cannot be resumed from here."""
+		if not token:
+			return self.seq
+		epoch, _, seq = token.partition(".")
+		if epoch != self.epoch or not seq.isdigit():
+			return None
+		seq_no = int(seq)
+		with self._cond:
+			oldest = self._events[0][0] if self._events else self.seq + 1
+			if seq_no > self.seq or seq_no < oldest - 1:
+				return None
+		return seq_no
+
+	def since(self, seq: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+		with self._cond:
+			if seq >= self.seq:
+				return []
+			return [e for e in self._events if e[0] > seq]
+
+	def wait(self, seq: int, timeout: float) -> None:
+		with self._cond:
+			if self.seq <= seq:
+				self._cond.wait(timeout)
+
+
+def _format(event: str, data: Any, event_id: Optional[str] = None) -> str:
+	lines = [f"id: {event_id}"] if event_id else []
+	lines.append(f"event: {event}")
+	lines.append("data: " + json.dumps(data, separators=(",", ":")))
+	return "\n".join(lines) + "\n\n"
+
+
+class EventStream:
+	"""An SSE response body. Server adapters stream it with iter_sync() or iter_async()."""
+
+	media_type = "text/event-stream"
+	headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+	def __init__(self, log: TaskEventLog, resume_token: Optional[str], keepalive: float):
+		self.log = log
+		self.keepalive = keepalive
+		self._seq = log.parse_token(resume_token)
+
+	def _start(self) -> str:
+		if self._seq is None:
+			# Too old or from another process: the client must refetch
+			self._seq = self.log.seq
+			return _format("reset", {"reason": "resume token expired"}, self.log.token(self._seq))
+		return _format("ready", {"resumeToken": self.log.token(self._seq)}, self.log.token(self._seq))
+
+	def _drain(self) -> str:
+		events = self.log.since(self._seq)
+		if not events:
+			return ""
+		self._seq = events[-1][0]
+		return "".join(_format(kind, data, self.log.token(seq)) for seq, kind, data in events)
+
+	def iter_sync(self) -> Iterator[str]:
+		yield self._start()
+		last_sent = time.monotonic()
+		while True:
+			chunk = self._drain()
+			if chunk:
+				yield chunk
+				last_sent = time.monotonic()
+			elif time.monotonic() - last_sent >= self.keepalive:
+				yield ": keepalive\n\n"
+				last_sent = time.monotonic()
+			else:
+				self.log.wait(self._seq, self.keepalive)
+
+	async def iter_async(self, poll_interval: float = 0.25) -> AsyncIterator[str]:
+		import anyio
+
+		yield self._start()
+		last_sent = time.monotonic()
+		while True:
+			# Polling the in-memory log keeps idle streams off the worker threads
+			chunk = self._drain()
+			if chunk:
+				yield chunk
+				last_sent = time.monotonic()
+			elif time.monotonic() - last_sent >= self.keepalive:
+				yield ": keepalive\n\n"
+				last_sent = time.monotonic()
+			else:
+				await anyio.sleep(poll_interval)
+
+
+_log: Optional[TaskEventLog] = None
+_log_lock = threading.Lock()
+
+
+def get_event_log() -> TaskEventLog:
+	global _log
+	if _log is not None:
+		return _log
+	with _log_lock:
+		if _log is None:
+			_log = TaskEventLog(int(os.getenv("TASK_EVENTS_RETAINED", "10000")))
+	return _log
+
+
+def publish_task_event(kind: str, data: Dict[str, Any]) -> None:
+	get_event_log().publish(kind, data)
+
+
+def open_stream(resume_token: Optional[str]) -> EventStream:
+	return EventStream(get_event_log(), resume_token, float(os.getenv("SSE_KEEPALIVE", "15")))
@@ -0,0 +1,201 @@
+"""Guarded execution for POST /guard/execute: check an action, then run it.
+
+The action is hashed once. The checks then run side by side under one
+deadline, so the gate costs about as much as its slowest check instead of
+the sum of /hash, /status, /flag and /agent/run round trips:
+- blacklist: the resident blacklist cache (mock store)
+- chain: the chain event index when the indexer is caught up, else a
+  getActionStatus read when USE_MOCK=0; an index that is behind with no
+  RPC fallback leaves the check pending (handled like a missed deadline)
+- heuristic: the rule engine (risk_rules.py)
+- llm: the cached LLM assessment (analyzer.py), when OPENAI_API_KEY is set
+
+Slow checks (chain, llm) go to a small thread pool first; the in-memory
+ones run on the request thread meanwhile. The first blacklist hit or
+"suspicious" verdict ends the gate; checks still in flight are abandoned
+(an LLM call that finishes later still fills the assessment cache). Only
+clean actions are passed to run_agent_action.
+
+Environment:
+- GUARD_DEADLINE_MS: time budget for the checks (default 2000)
+- GUARD_ON_TIMEOUT: "deny" (default) rejects actions whose checks missed the deadline; "allow" decides on the checks that finished
+- GUARD_WORKERS: threads for the slow checks (default 8)
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from agent_sim import USE_MOCK, compute_action_hash, get_chain_status, get_mock_status
+from agentkit_runner import run_agent_action
+from analyzer import assess_action
+from chain_indexer import get_chain_index, get_indexer
+from risk_rules import get_risk_engine
+
+
+BLACKLISTED = 2
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+	global _pool
+	if _pool is not None:
+		return _pool
+	with _pool_lock:
+		if _pool is None:
+			_pool = ThreadPoolExecutor(max_workers=int(os.getenv("GUARD_WORKERS", "8")), thread_name_prefix="guard")
+	return _pool
+
+
+class _GuardStats:
+	def __init__(self):
+		self.counts = {"allow": 0, "block": 0, "timeout": 0}
+		self.executed = 0
+		self._lock = threading.Lock()
+
+	def record(self, decision: str, executed: bool) -> None:
+		with self._lock:
+			self.counts[decision] += 1
+			if executed:
+				self.executed += 1
+
+	def to_dict(self) -> Dict[str, Any]:
+		with self._lock:
+			return {"decisions": dict(self.counts), "executed": self.executed}
+
+
+_stats = _GuardStats()
+
+
+def guard_stats() -> Dict[str, Any]:
+	return _stats.to_dict()
+
+
+def _chain_check() -> Optional[Callable[[str], int]]:
+	indexer = get_indexer()
+	if indexer is not None and indexer.caught_up():
+		return get_chain_index().status
+	if not USE_MOCK and os.getenv("ACTION_REGISTRY_ADDRESS"):
+		return get_chain_status
+	return None
+
+
+def _verdict(stage: str, value: Any) -> Optional[str]:
+	"""Reason to block on this check's result, or None if it passes."""
+	if stage in ("blacklist", "chain"):
+		return "Action is blacklisted" if value == BLACKLISTED else None
+	if value.get("label") == "suspicious":
+		return f"{stage} assessment: suspicious (riskScore {value.get('riskScore')})"
+	return None
+
+
+def _ms(seconds: float) -> float:
+	return round(seconds * 1000, 3)
+
+
+def _timed_call(fn: Callable[[], Any]) -> Tuple[Any, float]:
+	start = time.perf_counter()
+	return fn(), time.perf_counter() - start
+
+
+def guard_action(
+	action: str,
+	params: Dict[str, Any],
+	deadline_ms: Optional[float] = None,
+	use_llm: Optional[bool] = None,
+	execute: bool = True,
+) -> Tuple[Dict[str, Any], int]:
+	"""Check one action and run it if clean. Returns (payload, HTTP status):
+	200 allowed (and run unless execute=False), 403 blocked, 504 checks missed the deadline."""
+	started = time.perf_counter()
+	budget = (float(os.getenv("GUARD_DEADLINE_MS", "2000")) if deadline_ms is None else deadline_ms) / 1000
+	timings: Dict[str, Optional[float]] = {}
+
+	action_hash_hex, elapsed = _timed_call(lambda: compute_action_hash(action, params))
+	timings["hash"] = _ms(elapsed)
+	deadline = started + budget
+
+	slow: Dict[str, Callable[[], Any]] = {}
+	chain = _chain_check()
+	if chain is not None:
+		slow["chain"] = lambda: chain(action_hash_hex)
+	# A lagging index with nothing to fall back on can't clear the action
+	stalled = ["chain"] if chain is None and get_indexer() is not None else []
+	if use_llm if use_llm is not None else bool(os.getenv("OPENAI_API_KEY")):
+		slow["llm"] = lambda: assess_action(action, params, action_hash_hex)[0]
+	pool = _get_pool()
+	pending: Dict[Future, str] = {pool.submit(_timed_call, fn): name for name, fn in slow.items()}
+
+	assessments: Dict[str, Any] = {}
+	statuses: Dict[str, int] = {}
+
+	def finish(decision: str, status: int, **extra: Any) -> Tuple[Dict[str, Any], int]:
+		for future, name in pending.items():
+			future.cancel()
+			timings.setdefault(name, None)
+		for name in stalled:
+			timings.setdefault(name, None)
+		executed = "result" in extra
+		_stats.record(decision, executed)
+		timings.setdefault("gate", _ms(time.perf_counter() - started))
+		timings["total"] = _ms(time.perf_counter() - started)
+		payload = {
+			"ok": decision == "allow",
+			"decision": decision,
+			"hash": action_hash_hex,
+			"statuses": statuses,
+			"assessments": assessments,
+			"executed": executed,
+			**extra,
+			"timings": timings,
+		}
+		return payload, status
+
+	def check(stage: str, value: Any, seconds: float) -> Optional[str]:
+		timings[stage] = _ms(seconds)
+		if stage in ("blacklist", "chain"):
+			statuses[stage] = value
+		else:
+			assessments[stage] = value
+		return _verdict(stage, value)
+
+	# In-memory checks run here while the slow ones are in flight
+	inline = (
+		("blacklist", lambda: get_mock_status(action_hash_hex)),
+		("heuristic", lambda: get_risk_engine().score(action, params)),
+	)
+	for stage, fn in inline:
+		value, seconds = _timed_call(fn)
+		reason = check(stage, value, seconds)
+		if reason:
+			return finish("block", 403, blockedBy=stage, reason=reason)
+
+	while pending:
+		done, _ = wait(pending, timeout=max(0.0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+		if not done:
+			break
+		for future in done:
+			stage = pending.pop(future)
+			try:
+				value, seconds = future.result()
+			except Exception as exc:
+				# A failed check cannot clear the action
+				timings[stage] = None
+				return finish("block", 403, blockedBy=stage, reason=f"{stage} check failed: {exc}")
+			reason = check(stage, value, seconds)
+			if reason:
+				return finish("block", 403, blockedBy=stage, reason=reason)
+
+	missed = sorted([*pending.values(), *stalled])
+	if missed and os.getenv("GUARD_ON_TIMEOUT", "deny").lower() != "allow":
+		return finish("timeout", 504, pending=missed, deadlineMs=_ms(budget))
+	if not execute:
+		return finish("allow", 200, **({"skipped": missed} if missed else {}))
+	timings["gate"] = _ms(time.perf_counter() - started)
+	result, seconds = _timed_call(lambda: run_agent_action(action, params))
+	timings["execute"] = _ms(seconds)
+	# 202 when the action outlived AgentKit's timeout: it may still land (poll /agent/run/<requestId>)
+	return finish("allow", 202 if result.get("pending") else 200, result=result, **({"skipped": missed} if missed else {}))
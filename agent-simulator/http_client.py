@@ -0,0 +1,197 @@
+"""Shared outbound HTTP client for CDP (and other) API calls.
+
+- One pooled keep-alive requests.Session per host
+- Separate connect/read timeouts
+- Retries with full-jitter exponential backoff on 429/5xx and connection
+  errors (honoring Retry-After); non-idempotent calls only retry when the
+  request cannot have reached the server
+- A per-host circuit breaker whose state is reported by /health
+
+Environment:
+- HTTP_CONNECT_TIMEOUT: seconds (default 3.05)
+- HTTP_READ_TIMEOUT: seconds (default 30)
+- HTTP_MAX_RETRIES: retries after the first attempt (default 3)
+- HTTP_BACKOFF_BASE / HTTP_BACKOFF_MAX: backoff seconds (default 0.2 / 5)
+- HTTP_POOL_SIZE: keep-alive connections per host (default 20)
+- HTTP_BREAKER_THRESHOLD: consecutive failures that open the breaker (default 5)
+- HTTP_BREAKER_RESET: seconds before a half-open trial call (default 30)
+"""
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from metrics import timed
+
+if TYPE_CHECKING:
+	import requests
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(RuntimeError):
+	pass
+
+
+class CircuitBreaker:
+	"""Consecutive-failure breaker: closed -> open -> half_open -> closed."""
+
+	def __init__(self, threshold: int, reset_after: float):
+		self.threshold = threshold
+		self.reset_after = reset_after
+		self.state = "closed"
+		self.failures = 0
+		self.opened_at = 0.0
+		self._trial_in_flight = False
+		self._lock = threading.Lock()
+
+	def allow(self) -> bool:
+		with self._lock:
+			if self.state == "closed":
+				return True
+			if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+				self.state = "half_open"
+			if self.state == "half_open" and not self._trial_in_flight:
+				self._trial_in_flight = True
+				return True
+			return False
+
+	def record_success(self) -> None:
+		with self._lock:
+			self.state = "closed"
+			self.failures = 0
+			self._trial_in_flight = False
+
+	def record_failure(self) -> None:
+		with self._lock:
+			self.failures += 1
+			self._trial_in_flight = False
+			if self.state == "half_open" or self.failures >= self.threshold:
+				self.state = "open"
+				self.opened_at = time.monotonic()
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {"state": self.state, "consecutiveFailures": self.failures}
+
+
+class HttpClient:
+	def __init__(
+		self,
+		connect_timeout: float = 3.05,
+		read_timeout: float = 30.0,
+		max_retries: int = 3,
+		backoff_base: float = 0.2,
+		backoff_max: float = 5.0,
+		pool_size: int = 20,
+		breaker_threshold: int = 5,
+		breaker_reset: float = 30.0,
+	):
+		self.timeout = (connect_timeout, read_timeout)
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.pool_size = pool_size
+		self.breaker_threshold = breaker_threshold
+		self.breaker_reset = breaker_reset
+		self._sessions: Dict[str, "requests.Session"] = {}
+		self._breakers: Dict[str, CircuitBreaker] = {}
+		self._lock = threading.Lock()
+
+	def _host_state(self, url: str) -> "tuple[requests.Session, CircuitBreaker]":
+		parts = urlsplit(url)
+		host = f"{parts.scheme}://{parts.netloc}"
+		with self._lock:
+			session = self._sessions.get(host)
+			if session is None:
+				# requests is imported with the first outbound call, not at server start
+				import requests
+				from requests.adapters import HTTPAdapter
+
+				session = requests.Session()
+				adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+				session.mount(host, adapter)
+				self._sessions[host] = session
+				self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+			return session, self._breakers[host]
+
+	def _backoff(self, attempt: int, resp: "Optional[requests.Response]") -> float:
+		if resp is not None:
+			retry_after = resp.headers.get("Retry-After")
+			if retry_after and retry_after.isdigit():
+				return min(float(retry_after), self.backoff_max)
+		return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+	@timed("outbound")
+	def request(self, method: str, url: str, idempotent: bool = True, **kwargs: Any) -> "requests.Response":
+		"""Send a request with retries. Returns the last response (callers check status_code).
+
+		Raises CircuitOpen when the host's breaker is open, or the last network error.
+		"""
+		import requests
+
+		session, breaker = self._host_state(url)
+		kwargs.setdefault("timeout", self.timeout)
+		attempt = 0
+		while True:
+			if not breaker.allow():
+				raise CircuitOpen(f"Circuit open for {urlsplit(url).netloc}")
+			resp: "Optional[requests.Response]" = None
+			try:
+				resp = session.request(method, url, **kwargs)
+			except requests.exceptions.ConnectTimeout:
+				breaker.record_failure()
+				if attempt >= self.max_retries:
+					raise
+			except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+				breaker.record_failure()
+				# The request may have been delivered; only idempotent calls retry
+				if not idempotent or attempt >= self.max_retries:
+					raise
+			except Exception:
+				# InvalidURL, TooManyRedirects, ChunkedEncodingError, ...: not retried, but
+				# still a failed call, and it must not leave a half-open trial in flight
+				breaker.record_failure()
+				raise
+			else:
+				if resp.status_code not in RETRY_STATUSES:
+					breaker.record_success()
+					return resp
+				breaker.record_failure()
+				retryable = resp.status_code == 429 or idempotent
+				if not retryable or attempt >= self.max_retries:
+					return resp
+			time.sleep(self._backoff(attempt, resp))
+			attempt += 1
+
+	def post(self, url: str, idempotent: bool = True, **kwargs: Any) -> "requests.Response":
+		return self.request("POST", url, idempotent=idempotent, **kwargs)
+
+	def breaker_states(self) -> Dict[str, Dict[str, Any]]:
+		with self._lock:
+			return {host: b.to_dict() for host, b in self._breakers.items()}
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+	global _client
+	if _client is not None:
+		return _client
+	with _client_lock:
+		if _client is None:
+			_client = HttpClient(
+				connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+				read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+				max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+				backoff_base=float(os.getenv("HTTP_BACKOFF_BASE", "0.2")),
+				backoff_max=float(os.getenv("HTTP_BACKOFF_MAX", "5")),
+				pool_size=int(os.getenv("HTTP_POOL_SIZE", "20")),
+				breaker_threshold=int(os.getenv("HTTP_BREAKER_THRESHOLD", "5")),
+				breaker_reset=float(os.getenv("HTTP_BREAKER_RESET", "30")),
+			)
+	return _client
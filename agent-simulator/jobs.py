@@ -0,0 +1,111 @@
+"""Background job queue for mock review/blacklist work.
+
+Endpoints submit a job and return 202 with its id right away; a bounded
+worker pool runs the job and clients poll GET /jobs/<id> for the outcome.
+
+Environment:
+- REVIEW_WORKERS: worker threads (default 4)
+- JOBS_RETAINED: finished jobs kept for polling (default 1000)
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class Job:
+	def __init__(self, kind: str):
+		self.id = uuid.uuid4().hex
+		self.kind = kind
+		self.status = "queued"
+		self.result: Any = None
+		self.error: Optional[str] = None
+		self.created_at = time.time()
+		self.started_at: Optional[float] = None
+		self.finished_at: Optional[float] = None
+
+	@property
+	def done(self) -> bool:
+		return self.status in ("succeeded", "failed")
+
+	def to_dict(self) -> Dict[str, Any]:
+		return {
+			"id": self.id,
+			"kind": self.kind,
+			"status": self.status,
+			"result": self.result,
+			"error": self.error,
+			"createdAt": self.created_at,
+			"startedAt": self.started_at,
+			"finishedAt": self.finished_at,
+		}
+
+
+class JobQueue:
+	def __init__(self, max_workers: int = 4, max_retained: int = 1000):
+		self.max_workers = max_workers
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="review-job")
+		self._max_retained = max_retained
+		self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def submit(self, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+		job = Job(kind)
+		with self._lock:
+			self._jobs[job.id] = job
+			self._evict_finished()
+		self._executor.submit(self._run, job, fn, args, kwargs)
+		return job
+
+	def _run(self, job: Job, fn: Callable[..., Any], args: Any, kwargs: Any) -> None:
+		job.status = "running"
+		job.started_at = time.time()
+		try:
+			job.result = fn(*args, **kwargs)
+			job.status = "succeeded"
+		except Exception as exc:
+			job.error = str(exc)
+			job.status = "failed"
+		finally:
+			job.finished_at = time.time()
+
+	def _evict_finished(self) -> None:
+		# Oldest finished jobs go first; queued/running jobs are never dropped
+		excess = len(self._jobs) - self._max_retained
+		if excess <= 0:
+			return
+		for job_id in [j.id for j in self._jobs.values() if j.done][:excess]:
+			del self._jobs[job_id]
+
+	def get(self, job_id: str) -> Optional[Job]:
+		return self._jobs.get(job_id)
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			jobs = list(self._jobs.values())
+		return {
+			"workers": self.max_workers,
+			"queued": sum(1 for j in jobs if j.status == "queued"),
+			"running": sum(1 for j in jobs if j.status == "running"),
+			"retained": len(jobs),
+		}
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+	global _queue
+	if _queue is not None:
+		return _queue
+	with _queue_lock:
+		if _queue is None:
+			_queue = JobQueue(
+				max_workers=int(os.getenv("REVIEW_WORKERS", "4")),
+				max_retained=int(os.getenv("JOBS_RETAINED", "1000")),
+			)
+	return _queue
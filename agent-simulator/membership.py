@@ -0,0 +1,209 @@
+"""Resident blacklist membership cache for the /status hot path.
+
+A Bloom filter sits in front of an exact in-memory set, so the common
+"unknown" answer is returned without touching the set or the store. The
+cache is loaded from the store once and updated in place on every
+blacklist write made by this process. Writes by other processes (another
+server worker, the agent_sim.py CLI) bump the store's blacklist generation;
+a watcher thread polls it and reloads, so lookups never touch the store.
+
+Environment:
+- BLACKLIST_REFRESH_INTERVAL: seconds between generation checks (default 0.25;
+  0 disables, for single-process deployments only)
+"""
+import hashlib
+import math
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, Union
+
+from store import BaseStore, get_store, normalize_hash
+
+
+Key = Union[bytes, str]
+
+
+def _key(action_hash: str) -> Key:
+	# 32-byte keys take about half the memory of 64-char hex strings
+	h = normalize_hash(action_hash)
+	if len(h) == 64:
+		try:
+			return bytes.fromhex(h)
+		except ValueError:
+			pass
+	return h
+
+
+class BloomFilter:
+	"""Fixed-size Bloom filter with double hashing over a blake2b digest."""
+
+	def __init__(self, capacity: int, error_rate: float = 0.001):
+		capacity = max(int(capacity), 1)
+		self.capacity = capacity
+		self.error_rate = error_rate
+		self.num_bits = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+		self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+		self._bits = bytearray((self.num_bits + 7) // 8)
+
+	def _positions(self, key: Key) -> Iterable[int]:
+		data = key if isinstance(key, bytes) else key.encode("utf-8")
+		digest = hashlib.blake2b(data, digest_size=16).digest()
+		h1 = int.from_bytes(digest[:8], "little")
+		h2 = int.from_bytes(digest[8:], "little") | 1
+		m = self.num_bits
+		return ((h1 + i * h2) % m for i in range(self.num_hashes))
+
+	def add(self, key: Key) -> None:
+		bits = self._bits
+		for pos in self._positions(key):
+			bits[pos >> 3] |= 1 << (pos & 7)
+
+	def __contains__(self, key: Key) -> bool:
+		bits = self._bits
+		for pos in self._positions(key):
+			if not bits[pos >> 3] & (1 << (pos & 7)):
+				return False
+		return True
+
+	@property
+	def size_bytes(self) -> int:
+		return len(self._bits)
+
+
+class BlacklistCache:
+	"""Bloom filter + exact set over the store's blacklist.
+
+	Counters:
+	- lookups: total contains() calls
+	- bloomNegatives: answered "unknown" by the filter alone
+	- hits: confirmed blacklisted
+	- falsePositives: filter said maybe, exact set said no
+	- reloads: full reloads after another writer changed the blacklist
+	"""
+
+	def __init__(self, store: BaseStore, error_rate: float = 0.001, min_capacity: int = 1024):
+		self._store = store
+		self._error_rate = error_rate
+		self._min_capacity = min_capacity
+		self._lock = threading.Lock()
+		self._members: set = set()
+		self._bloom = BloomFilter(min_capacity, error_rate)
+		self.lookups = 0
+		self.bloom_negatives = 0
+		self.hits = 0
+		self.false_positives = 0
+		self.reloads = 0
+		self.generation: Optional[int] = None
+		self._stop = threading.Event()
+		self._watcher: Optional[threading.Thread] = None
+		self.reload()
+
+	def _build_bloom(self, members: set, capacity: int) -> BloomFilter:
+		bloom = BloomFilter(max(capacity, self._min_capacity), self._error_rate)
+		for key in members:
+			bloom.add(key)
+		return bloom
+
+	def reload(self) -> None:
+		"""(Re)load the full blacklist from the store."""
+		with self._lock:
+			# Read the generation first: a write racing the load bumps it again
+			generation = self._store.blacklist_generation()
+			members = {_key(h) for h in self._store.iter_blacklisted()}
+			bloom = self._build_bloom(members, len(members) * 2)
+			# Filter first: it covers both the old and the new members until the set is swapped
+			self._bloom = bloom
+			self._members = members
+			self.generation = generation
+
+	def refresh(self) -> bool:
+		"""Reload if another writer changed the blacklist since the last load. Returns True if it did."""
+		if self._store.blacklist_generation() == self.generation:
+			return False
+		self.reload()
+		self.reloads += 1
+		return True
+
+	def watch(self, interval: float) -> None:
+		"""Start a daemon thread that calls refresh() every interval seconds."""
+		if self._watcher is not None:
+			return
+		self._watcher = threading.Thread(target=self._watch, args=(interval,), name="blacklist-cache-watch", daemon=True)
+		self._watcher.start()
+
+	def stop(self) -> None:
+		self._stop.set()
+
+	def _watch(self, interval: float) -> None:
+		while not self._stop.wait(interval):
+			try:
+				self.refresh()
+			except Exception:  # a busy or briefly missing store; try again next tick
+				pass
+
+	def contains(self, action_hash: str) -> bool:
+		key = _key(action_hash)
+		self.lookups += 1
+		if key not in self._bloom:
+			self.bloom_negatives += 1
+			return False
+		if key in self._members:
+			self.hits += 1
+			return True
+		self.false_positives += 1
+		return False
+
+	def add(self, action_hash: str) -> None:
+		key = _key(action_hash)
+		with self._lock:
+			if key in self._members:
+				return
+			# Set filter bits before the exact set so readers never see a member the filter rejects
+			self._bloom.add(key)
+			self._members.add(key)
+			if len(self._members) > self._bloom.capacity:
+				self._bloom = self._build_bloom(self._members, len(self._members) * 2)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._members = set()
+			self._bloom = BloomFilter(self._min_capacity, self._error_rate)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"entries": len(self._members),
+			"bloomBytes": self._bloom.size_bytes,
+			"bloomHashes": self._bloom.num_hashes,
+			"lookups": self.lookups,
+			"bloomNegatives": self.bloom_negatives,
+			"hits": self.hits,
+			"falsePositives": self.false_positives,
+			"reloads": self.reloads,
+			"generation": self.generation,
+		}
+
+
+_cache: Optional[BlacklistCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_blacklist_cache() -> BlacklistCache:
+	"""Process-wide cache over get_store(), loaded on first use and kept in step
+	with other writers unless BLACKLIST_REFRESH_INTERVAL=0."""
+	global _cache
+	if _cache is not None:
+		return _cache
+	with _cache_lock:
+		if _cache is None:
+			cache = BlacklistCache(get_store())
+			interval = float(os.getenv("BLACKLIST_REFRESH_INTERVAL", "0.25"))
+			if interval > 0:
+				cache.watch(interval)
+			_cache = cache
+	return _cache
+
+
+def note_blacklisted(action_hash: str) -> None:
+	"""Record a new blacklist entry in the resident cache, if this process has loaded one."""
+	if _cache is not None:
+		_cache.add(action_hash)
@@ -0,0 +1,255 @@
+"""Process-wide request metrics, exported in Prometheus text format.
+
+- Per-route request latency histograms (route template, method, status)
+- Timing spans around storage, hashing, analyzer/LLM and outbound HTTP,
+  recorded as a histogram per span name
+- Gauges pulled from registered collectors at scrape time (cache hit
+  ratios, queue depths, ...)
+- An optional per-request breakdown returned as a Server-Timing header
+
+Recording a span or request is a few dict/list operations under a lock,
+with no dependency on prometheus_client.
+
+Environment:
+- METRICS_ENABLED: "0" turns recording into no-ops (default 1)
+- METRICS_TRACE_HEADER: request header asking for a Server-Timing breakdown (default X-Trace-Timing)
+- METRICS_TRACE_ALL: "1" adds Server-Timing to every response
+"""
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+TRACE_HEADER = os.getenv("METRICS_TRACE_HEADER", "X-Trace-Timing")
+TRACE_ALL = os.getenv("METRICS_TRACE_ALL", "0").lower() in ("1", "true", "yes")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans are mostly sub-millisecond, requests up to LLM/CDP round trips
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SPAN_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0, 5.0)
+
+# (name, value) pairs for the request being served, when it asked for a trace
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+	parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+	def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+		self.name = name
+		self.help = help_text
+		self.label_names = tuple(label_names)
+		self.buckets = tuple(buckets)
+		# label values -> [count per bucket..., count in +Inf, sum]
+		self._children: Dict[Tuple[str, ...], List[float]] = {}
+		self._lock = threading.Lock()
+
+	def observe(self, value: float, *label_values: str) -> None:
+		i = bisect.bisect_left(self.buckets, value)
+		with self._lock:
+			child = self._children.get(label_values)
+			if child is None:
+				child = self._children[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+			child[i] += 1
+			child[-1] += value
+
+	def render(self) -> Iterable[str]:
+		yield f"# HELP {self.name} {self.help}"
+		yield f"# TYPE {self.name} histogram"
+		with self._lock:
+			children = [(k, list(v)) for k, v in self._children.items()]
+		for label_values, child in sorted(children):
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float("inf"),), child):
+				cumulative += count
+				le = 'le="' + _number(bound) + '"'
+				yield f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}"
+			labels = _labels(self.label_names, label_values)
+			yield f"{self.name}_sum{labels} {child[-1]}"
+			yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Counter:
+	def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+		self.name = name
+		self.help = help_text
+		self.label_names = tuple(label_names)
+		self._values: Dict[Tuple[str, ...], float] = {}
+		self._lock = threading.Lock()
+
+	def inc(self, *label_values: str, amount: float = 1) -> None:
+		with self._lock:
+			self._values[label_values] = self._values.get(label_values, 0) + amount
+
+	def render(self) -> Iterable[str]:
+		yield f"# HELP {self.name} {self.help}"
+		yield f"# TYPE {self.name} counter"
+		with self._lock:
+			values = sorted(self._values.items())
+		for label_values, value in values:
+			yield f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+
+
+REQUEST_SECONDS = Histogram("agent_http_request_duration_seconds", "Request latency by route template.", ("route", "method", "status"), REQUEST_BUCKETS)
+SPAN_SECONDS = Histogram("agent_span_duration_seconds", "Time spent in storage, hashing, analyzer and outbound calls.", ("span",), SPAN_BUCKETS)
+SPAN_ERRORS = Counter("agent_span_errors_total", "Spans that ended with an exception.", ("span",))
+_METRICS: List[Any] = [REQUEST_SECONDS, SPAN_SECONDS, SPAN_ERRORS]
+
+# Gauge samples: (name, help, labels, value)
+Sample = Tuple[str, str, Mapping[str, str], Optional[float]]
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def register_collector(collect: Callable[[], Iterable[Sample]]) -> None:
+	"""Add a callable that returns gauge samples; it runs on every scrape."""
+	_collectors.append(collect)
+
+
+class _Span:
+	__slots__ = ("name", "start")
+
+	def __init__(self, name: str):
+		self.name = name
+
+	def __enter__(self) -> "_Span":
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+		elapsed = time.perf_counter() - self.start
+		SPAN_SECONDS.observe(elapsed, self.name)
+		if exc_type is not None:
+			SPAN_ERRORS.inc(self.name)
+		trace = _trace.get()
+		if trace is not None:
+			trace.append((self.name, elapsed))
+
+
+class _NoSpan:
+	__slots__ = ()
+
+	def __enter__(self) -> "_NoSpan":
+		return self
+
+	def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+		return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str) -> Any:
+	"""Context manager timing one unit of work, e.g. span("storage.get_task")."""
+	return _Span(name) if ENABLED else _NO_SPAN
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+	"""Decorator form of span()."""
+	def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+		if not ENABLED:
+			return fn
+
+		@functools.wraps(fn)
+		def wrapper(*args: Any, **kwargs: Any) -> Any:
+			with _Span(name):
+				return fn(*args, **kwargs)
+		return wrapper
+	return decorate
+
+
+class RequestTimer:
+	"""Times one request. Create at dispatch, call finish() with the response status."""
+
+	__slots__ = ("start", "_trace", "_token")
+
+	def __init__(self, headers: Mapping[str, str]):
+		global _in_flight
+		self.start = time.perf_counter()
+		self._trace: Optional[List[Tuple[str, float]]] = None
+		self._token = None
+		if not ENABLED:
+			return
+		with _in_flight_lock:
+			_in_flight += 1
+		if TRACE_ALL or headers.get(TRACE_HEADER):
+			self._trace = []
+			self._token = _trace.set(self._trace)
+
+	def finish(self, route: str, method: str, status: int) -> Dict[str, str]:
+		"""Record the request; returns extra response headers (Server-Timing when traced)."""
+		global _in_flight
+		if not ENABLED:
+			return {}
+		elapsed = time.perf_counter() - self.start
+		with _in_flight_lock:
+			_in_flight -= 1
+		REQUEST_SECONDS.observe(elapsed, route, method, str(status))
+		if self._trace is None:
+			return {}
+		_trace.reset(self._token)
+		return {"Server-Timing": server_timing(self._trace, elapsed)}
+
+
+def server_timing(trace: Sequence[Tuple[str, float]], total: float) -> str:
+	"""Server-Timing value: spans summed per name, plus the total, in milliseconds."""
+	totals: Dict[str, List[float]] = {}
+	for name, seconds in trace:
+		entry = totals.setdefault(name, [0.0, 0])
+		entry[0] += seconds
+		entry[1] += 1
+	parts = [
+		f'{name};dur={seconds * 1000:.3f}' + (f';desc="x{count}"' if count > 1 else "")
+		for name, (seconds, count) in totals.items()
+	]
+	parts.append(f"total;dur={total * 1000:.3f}")
+	return ", ".join(parts)
+
+
+def _render_samples(samples: Iterable[Sample]) -> Iterable[str]:
+	by_name: Dict[str, Tuple[str, List[Tuple[Mapping[str, str], float]]]] = {}
+	for name, help_text, labels, value in samples:
+		if value is None:
+			continue
+		by_name.setdefault(name, (help_text, []))[1].append((labels, value))
+	for name, (help_text, values) in by_name.items():
+		yield f"# HELP {name} {help_text}"
+		yield f"# TYPE {name} gauge"
+		for labels, value in values:
+			yield f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}"
+
+
+def render() -> str:
+	"""All metrics in Prometheus text exposition format."""
+	samples: List[Sample] = [("agent_http_requests_in_flight", "Requests being served.", {}, _in_flight)]
+	for collect in _collectors:
+		try:
+			samples.extend(collect())
+		except Exception as exc:  # a broken collector must not take /metrics down
+			samples.append(("agent_metrics_collector_errors", "Collectors that failed on this scrape.", {"error": type(exc).__name__}, 1))
+	lines: List[str] = []
+	for metric in _METRICS:
+		lines.extend(metric.render())
+	lines.extend(_render_samples(samples))
+	return "\n".join(lines) + "\n"
@@ -0,0 +1,220 @@
+"""Declarative heuristic risk rules, evaluated column-wise over batches of actions.
+
+Rules are loaded from a JSON file (RISK_RULES_PATH, default risk_rules.json
+next to this module) and compiled once. Each rule that fires adds its
+weight to a base score; scores at or above the threshold are labelled
+"suspicious". Batches are evaluated per rule over whole columns (NumPy when
+installed, plain lists otherwise), and per-rule contributions are returned
+so every score can be explained.
+
+Rule types:
+- action_regex: {"pattern"} searched case-insensitively in the action name
+- amount_above: {"field" (default "amount"), "threshold", optional "action" regex}
+- recipient_in: {"field" (default "to"), "addresses"} compared case-insensitively
+"""
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# NumPy is imported on the first vectorized batch; it costs ~100 ms at startup
+np: Any = None
+_numpy_checked = False
+
+
+def _load_numpy() -> bool:
+	global np, _numpy_checked
+	if not _numpy_checked:
+		try:
+			import numpy
+
+			np = numpy
+		except ImportError:  # pure-Python fallback
+			pass
+		_numpy_checked = True
+	return np is not None
+
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("risk_rules.json")
+
+
+def _to_float(value: Any) -> float:
+	try:
+		return float(value)
+	except Exception:
+		return 0.0
+
+
+class _Columns:
+	"""Column views over a batch of (action, params), extracted once per field."""
+
+	def __init__(self, items: Sequence[Tuple[str, Any]], vector: bool):
+		self.actions = [(a or "") for a, _ in items]
+		self.params = [p if isinstance(p, dict) else {} for _, p in items]
+		self.n = len(items)
+		self.vector = vector
+		self._cache: Dict[Tuple[str, str], Any] = {}
+
+	def amounts(self, field: str) -> Any:
+		key = ("amount", field)
+		if key not in self._cache:
+			values = (_to_float(p.get(field, 0)) for p in self.params)
+			self._cache[key] = np.fromiter(values, float, self.n) if self.vector else list(values)
+		return self._cache[key]
+
+	def strings(self, field: str) -> List[Optional[str]]:
+		key = ("str", field)
+		if key not in self._cache:
+			self._cache[key] = [str(p[field]).lower() if field in p else None for p in self.params]
+		return self._cache[key]
+
+	def action_mask(self, regex: "re.Pattern[str]") -> Any:
+		key = ("action", regex.pattern)
+		if key not in self._cache:
+			# Few distinct action names per batch: match each name once
+			seen: Dict[str, bool] = {}
+			for a in self.actions:
+				if a not in seen:
+					seen[a] = regex.search(a) is not None
+			if self.vector:
+				self._cache[key] = np.fromiter((seen[a] for a in self.actions), bool, self.n)
+			else:
+				self._cache[key] = [seen[a] for a in self.actions]
+		return self._cache[key]
+
+
+class Rule(ABC):
+	def __init__(self, spec: Dict[str, Any]):
+		self.id = str(spec["id"])
+		self.weight = float(spec["weight"])
+		self.reason = str(spec.get("reason", self.id))
+
+	@abstractmethod
+	def mask(self, cols: _Columns) -> Any:
+		"""Boolean column: whether the rule fires for each action in the batch."""
+
+
+class ActionRegexRule(Rule):
+	def __init__(self, spec: Dict[str, Any]):
+		super().__init__(spec)
+		self.regex = re.compile(spec["pattern"], re.IGNORECASE)
+
+	def mask(self, cols: _Columns) -> Any:
+		return cols.action_mask(self.regex)
+
+
+class AmountAboveRule(Rule):
+	def __init__(self, spec: Dict[str, Any]):
+		super().__init__(spec)
+		self.field = spec.get("field", "amount")
+		self.threshold = float(spec["threshold"])
+		self.action = re.compile(spec["action"], re.IGNORECASE) if spec.get("action") else None
+
+	def mask(self, cols: _Columns) -> Any:
+		amounts = cols.amounts(self.field)
+		if cols.vector:
+			m = amounts > self.threshold
+			return m & cols.action_mask(self.action) if self.action else m
+		m = [v > self.threshold for v in amounts]
+		if self.action:
+			m = [x and y for x, y in zip(m, cols.action_mask(self.action))]
+		return m
+
+
+class RecipientInRule(Rule):
+	def __init__(self, spec: Dict[str, Any]):
+		super().__init__(spec)
+		self.field = spec.get("field", "to")
+		self.addresses = frozenset(str(a).lower() for a in spec["addresses"])
+
+	def mask(self, cols: _Columns) -> Any:
+		values = cols.strings(self.field)
+		if cols.vector:
+			return np.fromiter((v in self.addresses for v in values), bool, cols.n)
+		return [v in self.addresses for v in values]
+
+
+RULE_TYPES = {
+	"action_regex": ActionRegexRule,
+	"amount_above": AmountAboveRule,
+	"recipient_in": RecipientInRule,
+}
+
+
+class BatchScores:
+	"""Scores for a batch. contributions[r][i] is rule r's added weight for item i."""
+
+	def __init__(self, engine: "RiskEngine", scores: Any, contributions: Any):
+		self.engine = engine
+		self.scores = scores
+		self.contributions = contributions
+
+	def __len__(self) -> int:
+		return len(self.scores)
+
+	def item(self, i: int) -> Dict[str, Any]:
+		"""Assessment dict for item i, in the analyzer's {riskScore, label, reasons} shape."""
+		score = round(float(self.scores[i]), 2)
+		fired = [(rule, float(c[i])) for rule, c in zip(self.engine.rules, self.contributions) if c[i]]
+		return {
+			"riskScore": score,
+			"label": "suspicious" if score >= self.engine.threshold else "benign",
+			"reasons": [rule.reason for rule, _ in fired],
+			"contributions": {rule.id: weight for rule, weight in fired},
+		}
+
+	def to_dicts(self) -> List[Dict[str, Any]]:
+		return [self.item(i) for i in range(len(self))]
+
+
+class RiskEngine:
+	def __init__(self, config: Dict[str, Any]):
+		self.base = float(config.get("base", 0.0))
+		self.threshold = float(config.get("threshold", 0.5))
+		self.rules: List[Rule] = []
+		for spec in config.get("rules", []):
+			rule_type = RULE_TYPES.get(spec.get("type"))
+			if rule_type is None:
+				raise RuntimeError(f"Unknown risk rule type: {spec.get('type')!r}")
+			self.rules.append(rule_type(spec))
+
+	@classmethod
+	def from_file(cls, path: Path) -> "RiskEngine":
+		return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+	def score_batch(self, items: Iterable[Tuple[str, Any]], vector: Optional[bool] = None) -> BatchScores:
+		"""Score (action, params) pairs. vector=None uses NumPy when installed."""
+		items = list(items)
+		cols = _Columns(items, vector is not False and _load_numpy())
+		if cols.vector:
+			masks = np.array([rule.mask(cols) for rule in self.rules], dtype=bool).reshape(len(self.rules), cols.n)
+			weights = np.array([rule.weight for rule in self.rules], dtype=float)
+			contributions = masks * weights[:, None]
+			scores = np.clip(self.base + contributions.sum(axis=0), 0.0, 1.0)
+			return BatchScores(self, scores, contributions)
+		contributions = [[rule.weight if m else 0.0 for m in rule.mask(cols)] for rule in self.rules]
+		scores = [self.base] * cols.n
+		for column in contributions:
+			scores = [s + c for s, c in zip(scores, column)]
+		return BatchScores(self, [min(max(s, 0.0), 1.0) for s in scores], contributions)
+
+	def score(self, action: str, params: Any) -> Dict[str, Any]:
+		# NumPy setup costs more than it saves for a single item
+		return self.score_batch([(action, params)], vector=False).item(0)
+
+
+_engine: Optional[RiskEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine() -> RiskEngine:
+	global _engine
+	if _engine is not None:
+		return _engine
+	with _engine_lock:
+		if _engine is None:
+			_engine = RiskEngine.from_file(Path(os.getenv("RISK_RULES_PATH", str(DEFAULT_RULES_PATH))))
+	return _engine
@@ -0,0 +1,826 @@
+"""Storage backends for the mock blacklist and reviewer tasks.
+
+Two implementations share one interface:
+- JsonStore: the original whole-file mock_blacklist.json (handy for demos)
+- SqliteStore: WAL-mode SQLite with indexed lookups and per-row updates
+
+Both keep open and recently resolved tasks; archive_resolved() moves older
+resolved tasks to a TaskArchive (task_archive.py), which answers for them
+afterwards.
+
+Environment:
+- AGENT_STORE: "sqlite" (default) or "json"
+- AGENT_DB_PATH: SQLite file (default: agent_store.sqlite3 next to this module)
+- AGENT_JSON_DB_PATH: JSON file (default: mock_blacklist.json next to this module)
+- TASK_ARCHIVE_DIR, TASK_ARCHIVE_SEGMENT_TASKS, TASK_ARCHIVE_COMPACT_RATIO: see task_archive.py
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from metrics import timed
+from task_archive import TaskArchive
+
+
+DEFAULT_JSON_PATH = Path(__file__).parent / "mock_blacklist.json"
+DEFAULT_SQLITE_PATH = Path(__file__).parent / "agent_store.sqlite3"
+
+
+class TaskNotFound(LookupError):
+	pass
+
+
+class TaskResolved(RuntimeError):
+	pass
+
+
+class DuplicateVote(RuntimeError):
+	pass
+
+
+def normalize_hash(action_hash: str) -> str:
+	"""Canonical storage key for an action hash: lowercase hex without 0x."""
+	h = (action_hash or "").strip().lower()
+	return h[2:] if h.startswith("0x") else h
+
+
+# Public operations timed as "storage.<name>" spans in every backend
+_TIMED_METHODS = (
+	"is_blacklisted", "add_blacklisted", "blacklisted_many", "create_task", "find_open_task", "flag_task",
+	"get_task", "list_tasks", "query_tasks", "record_vote", "has_voted", "resolve_task", "set_task_tx_hash", "reset",
+	"archive_resolved",
+)
+
+
+def _archive_dir(path: Path) -> Path:
+	return Path(os.getenv("TASK_ARCHIVE_DIR") or path.with_name(path.stem + "_archive"))
+
+
+class BaseStore(ABC):
+	"""Interface shared by all backends. Tasks are plain dicts in the API shape."""
+
+	archive: TaskArchive
+
+	def __init_subclass__(cls, **kwargs: Any):
+		super().__init_subclass__(**kwargs)
+		for name in _TIMED_METHODS:
+			if name in cls.__dict__:
+				setattr(cls, name, timed(f"storage.{name}")(cls.__dict__[name]))
+
+	def _open_archive(self, path: Path, archive_dir: Optional[Path]) -> None:
+		self.archive = TaskArchive(
+			archive_dir or _archive_dir(path),
+			segment_tasks=int(os.getenv("TASK_ARCHIVE_SEGMENT_TASKS", "100000")),
+			compact_ratio=float(os.getenv("TASK_ARCHIVE_COMPACT_RATIO", "0.2")),
+		)
+
+	@abstractmethod
+	def is_blacklisted(self, action_hash: str) -> bool:
+		...
+
+	@abstractmethod
+	def add_blacklisted(self, action_hash: str) -> bool:
+		"""Add a hash to the blacklist. Returns True if it was not present before."""
+
+	@abstractmethod
+	def blacklisted_many(self, action_hashes: Iterable[str]) -> Set[str]:
+		"""Return the normalized subset of action_hashes that is blacklisted."""
+
+	@abstractmethod
+	def iter_blacklisted(self) -> Iterator[str]:
+		...
+
+	@abstractmethod
+	def blacklist_generation(self) -> int:
+		"""A value that changes whenever any process changes the blacklist. Only
+		compare it for equality; resident caches reload when it moves."""
+
+	@abstractmethod
+	def create_task(self, action_hash: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+		...
+
+	@abstractmethod
+	def find_open_task(self, action_hash: str) -> Optional[Dict[str, Any]]:
+		"""The oldest unresolved task for a hash, if any."""
+
+	@abstractmethod
+	def flag_task(self, action_hash: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+		"""Atomically attach a flag to the open task for this hash (bumping flagCount
+		and lastSeen) or create one. Returns (task, created)."""
+
+	@abstractmethod
+	def get_task(self, task_id: int) -> Optional[Dict[str, Any]]:
+		"""A task by id; archived tasks come back with archived: true."""
+
+	@abstractmethod
+	def list_tasks(self) -> List[Dict[str, Any]]:
+		"""Tasks in the hot store (open and not yet archived), in id order."""
+
+	def query_tasks(
+		self,
+		after: Optional[int] = None,
+		limit: int = 100,
+		unresolved: bool = False,
+		label: Optional[str] = None,
+		min_risk: Optional[float] = None,
+	) -> List[Dict[str, Any]]:
+		"""Tasks with id > after in id order, filtered by resolution and AI label/risk."""
+		page: List[Dict[str, Any]] = []
+		for task in self.list_tasks():
+			ai = task.get("ai") or {}
+			if after is not None and task["id"] <= after:
+				continue
+			if unresolved and task.get("resolved"):
+				continue
+			if label is not None and ai.get("label") != label:
+				continue
+			if min_risk is not None and float(ai.get("riskScore", -1)) < min_risk:
+				continue
+			page.append(task)
+			if len(page) >= limit:
+				break
+		return page
+
+	@abstractmethod
+	def record_vote(self, task_id: int, support: bool, voter: Optional[str] = None) -> Dict[str, Any]:
+		"""Atomically count one vote, at most one per (task, voter) when a voter is given.
+
+		Raises TaskNotFound, TaskResolved or DuplicateVote.
+		"""
+
+	@abstractmethod
+	def has_voted(self, task_id: int, voter: str) -> bool:
+		...
+
+	@abstractmethod
+	def resolve_task(self, task_id: int, quorum: int) -> Tuple[Dict[str, Any], bool]:
+		"""Mark a task resolved if votesFor >= quorum, and blacklist its hash in
+		the same write so a resolved task is never left off the blacklist.
+
+		Returns (task, resolved_now). resolved_now is False when the task was
+		already resolved or quorum is not reached. Raises TaskNotFound.
+		"""
+
+	@abstractmethod
+	def set_task_tx_hash(self, task_id: int, tx_hash: Optional[str]) -> None:
+		...
+
+	def unsubmitted_resolved(self) -> List[Dict[str, Any]]:
+		"""Resolved tasks in the hot store with no txHash yet, in id order."""
+		return [t for t in self.list_tasks() if t.get("resolved") and not t.get("txHash")]
+
+	def claim(self, name: str, ttl: float) -> bool:
+		"""True for only one caller per name within ttl seconds, across processes
+		sharing the store. The JSON store serves a single process, so it always wins."""
+		return True
+
+	@abstractmethod
+	def archive_resolved(self, resolved_before: float, batch: int = 500) -> int:
+		"""Move tasks resolved before this time (epoch seconds) to the archive, with
+		their votes. Returns how many moved."""
+
+	def _archived_or_missing(self, task_id: int) -> Dict[str, Any]:
+		"""The archived task for an id the hot store does not hold; TaskNotFound if there is none."""
+		task = self.archive.get(task_id)
+		if task is None:
+			raise TaskNotFound(task_id)
+		return task
+
+	def _archived_voters(self, task_id: int) -> Dict[str, bool]:
+		record = self.archive.get_record(task_id)
+		return record.get("votes", {}) if record else {}
+
+	@abstractmethod
+	def reset(self) -> None:
+		...
+
+	def close(self) -> None:
+		pass
+
+
+class JsonStore(BaseStore):
+	"""Whole-file JSON store. Every call re-reads the file; writes are serialized
+	within the process and replaced atomically on disk."""
+
+	def __init__(self, path: Path = DEFAULT_JSON_PATH, archive_dir: Optional[Path] = None):
+		self.path = Path(path)
+		self._lock = threading.RLock()
+		self._open_archive(self.path, archive_dir)
+
+	def load(self) -> Dict[str, Any]:
+		if self.path.exists():
+			with open(self.path, "r", encoding="utf-8") as f:
+				try:
+					return json.load(f)
+				except json.JSONDecodeError:
+					return {"blacklisted": []}
+		return {"blacklisted": []}
+
+	def save(self, db: Dict[str, Any]) -> None:
+		tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+		with open(tmp, "w", encoding="utf-8") as f:
+			json.dump(db, f, indent=2)
+		os.replace(tmp, self.path)
+
+	def _load_with_tasks(self) -> Dict[str, Any]:
+		db = self.load()
+		if not isinstance(db.get("blacklisted"), list):
+			db["blacklisted"] = []
+		if not isinstance(db.get("tasks"), list):
+			db["tasks"] = []
+		return db
+
+	def _find_task(self, db: Dict[str, Any], task_id: int) -> Dict[str, Any]:
+		tasks = db["tasks"]
+		# Ids match list positions until resolved tasks have been archived
+		if 0 <= task_id < len(tasks) and tasks[task_id].get("id") == task_id:
+			return tasks[task_id]
+		task = next((t for t in tasks if t.get("id") == task_id), None)
+		if task is None:
+			raise TaskNotFound(task_id)
+		return task
+
+	def is_blacklisted(self, action_hash: str) -> bool:
+		key = normalize_hash(action_hash)
+		return any(normalize_hash(h) == key for h in self.load().get("blacklisted", []))
+
+	def add_blacklisted(self, action_hash: str) -> bool:
+		key = normalize_hash(action_hash)
+		with self._lock:
+			db = self._load_with_tasks()
+			if any(normalize_hash(h) == key for h in db["blacklisted"]):
+				return False
+			db["blacklisted"].append(key)
+			self.save(db)
+			return True
+
+	def blacklisted_many(self, action_hashes: Iterable[str]) -> Set[str]:
+		blacklisted = set(self.iter_blacklisted())
+		return {k for k in (normalize_hash(h) for h in action_hashes) if k in blacklisted}
+
+	def iter_blacklisted(self) -> Iterator[str]:
+		for h in self.load().get("blacklisted", []):
+			yield normalize_hash(h)
+
+	def blacklist_generation(self) -> int:
+		# save() replaces the file, so any write (not only blacklist ones) moves it
+		try:
+			return self.path.stat().st_mtime_ns
+		except FileNotFoundError:
+			return 0
+
+	def _append_task(self, db: Dict[str, Any], key: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+		tasks = db["tasks"]
+		now = time.time()
+		task_id = max(db.get("nextTaskId", 0), tasks[-1]["id"] + 1 if tasks else 0)
+		task = {
+			"id": task_id,
+			"hash": key,
+			"action": action,
+			"params": params,
+			"votesFor": 0,
+			"votesAgainst": 0,
+			"resolved": False,
+			"ai": ai,
+			"flagCount": 1,
+			"firstSeen": now,
+			"lastSeen": now,
+		}
+		tasks.append(task)
+		return task
+
+	def create_task(self, action_hash: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+		with self._lock:
+			db = self._load_with_tasks()
+			task = self._append_task(db, normalize_hash(action_hash), action, params, ai)
+			self.save(db)
+			return task
+
+	@staticmethod
+	def _open_task(db: Dict[str, Any], key: str) -> Optional[Dict[str, Any]]:
+		return next((t for t in db["tasks"] if not t.get("resolved") and normalize_hash(t.get("hash", "")) == key), None)
+
+	def find_open_task(self, action_hash: str) -> Optional[Dict[str, Any]]:
+		return self._open_task(self._load_with_tasks(), normalize_hash(action_hash))
+
+	def flag_task(self, action_hash: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+		key = normalize_hash(action_hash)
+		with self._lock:
+			db = self._load_with_tasks()
+			task = self._open_task(db, key)
+			created = task is None
+			if task is None:
+				task = self._append_task(db, key, action, params, ai)
+			else:
+				task["flagCount"] = task.get("flagCount", 1) + 1
+				task["lastSeen"] = time.time()
+			self.save(db)
+			return task, created
+
+	def get_task(self, task_id: int) -> Optional[Dict[str, Any]]:
+		db = self._load_with_tasks()
+		try:
+			return self._find_task(db, task_id)
+		except TaskNotFound:
+			return self.archive.get(task_id)
+
+	def list_tasks(self) -> List[Dict[str, Any]]:
+		return self._load_with_tasks()["tasks"]
+
+	def record_vote(self, task_id: int, support: bool, voter: Optional[str] = None) -> Dict[str, Any]:
+		with self._lock:
+			db = self._load_with_tasks()
+			try:
+				task = self._find_task(db, task_id)
+			except TaskNotFound:
+				self._archived_or_missing(task_id)
+				raise TaskResolved(task_id)
+			if task.get("resolved"):
+				raise TaskResolved(task_id)
+			if voter is not None:
+				# Voters live beside the tasks so task dicts keep their API shape
+				voters = db.setdefault("votes", {}).setdefault(str(task_id), {})
+				if voter in voters:
+					raise DuplicateVote(task_id)
+				voters[voter] = bool(support)
+			if support:
+				task["votesFor"] = task.get("votesFor", 0) + 1
+			else:
+				task["votesAgainst"] = task.get("votesAgainst", 0) + 1
+			self.save(db)
+			return task
+
+	def has_voted(self, task_id: int, voter: str) -> bool:
+		db = self._load_with_tasks()
+		if voter in db.get("votes", {}).get(str(task_id), {}):
+			return True
+		return not any(t.get("id") == task_id for t in db["tasks"]) and voter in self._archived_voters(task_id)
+
+	def resolve_task(self, task_id: int, quorum: int) -> Tuple[Dict[str, Any], bool]:
+		with self._lock:
+			db = self._load_with_tasks()
+			try:
+				task = self._find_task(db, task_id)
+			except TaskNotFound:
+				return self._archived_or_missing(task_id), False
+			if task.get("resolved") or task.get("votesFor", 0) < quorum:
+				return task, False
+			task["resolved"] = True
+			task["resolvedAt"] = time.time()
+			key = normalize_hash(task["hash"])
+			if not any(normalize_hash(h) == key for h in db["blacklisted"]):
+				db["blacklisted"].append(key)
+			self.save(db)
+			return task, True
+
+	def set_task_tx_hash(self, task_id: int, tx_hash: Optional[str]) -> None:
+		with self._lock:
+			db = self._load_with_tasks()
+			try:
+				self._find_task(db, task_id)["txHash"] = tx_hash
+			except TaskNotFound:
+				self.archive.update(task_id, txHash=tx_hash)
+				return
+			self.save(db)
+
+	def archive_resolved(self, resolved_before: float, batch: int = 500) -> int:
+		with self._lock:
+			db = self._load_with_tasks()
+			tasks = db["tasks"]
+			moving = [t for t in tasks if t.get("resolved") and (t.get("resolvedAt") or t.get("lastSeen") or 0) < resolved_before]
+			if not moving:
+				return 0
+			votes = db.get("votes", {})
+			self.archive.append({"task": t, "votes": votes.pop(str(t["id"]), {})} for t in moving)
+			moved = {t["id"] for t in moving}
+			db["nextTaskId"] = max(db.get("nextTaskId", 0), tasks[-1]["id"] + 1)
+			db["tasks"] = [t for t in tasks if t["id"] not in moved]
+			self.save(db)
+			self.archive.flush()
+			return len(moving)
+
+	def reset(self) -> None:
+		with self._lock:
+			self.save({"blacklisted": []})
+			self.archive.clear()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blacklist (
+	hash TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tasks (
+	id INTEGER PRIMARY KEY,
+	hash TEXT NOT NULL,
+	action TEXT NOT NULL,
+	params TEXT NOT NULL,
+	votes_for INTEGER NOT NULL DEFAULT 0,
+	votes_against INTEGER NOT NULL DEFAULT 0,
+	resolved INTEGER NOT NULL DEFAULT 0,
+	ai TEXT,
+	tx_hash TEXT,
+	flag_count INTEGER NOT NULL DEFAULT 1,
+	first_seen REAL,
+	last_seen REAL,
+	resolved_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_hash_idx ON tasks (hash);
+CREATE TABLE IF NOT EXISTS votes (
+	task_id INTEGER NOT NULL,
+	voter TEXT NOT NULL,
+	support INTEGER NOT NULL,
+	PRIMARY KEY (task_id, voter)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tasks_open_idx ON tasks (id) WHERE resolved = 0;
+CREATE TABLE IF NOT EXISTS store_meta (
+	key TEXT PRIMARY KEY,
+	value
+) WITHOUT ROWID;
+"""
+
+# Pending-task index used to coalesce repeat flags; not UNIQUE because older
+# stores may already hold several open tasks for one hash
+_OPEN_HASH_INDEX = "CREATE INDEX IF NOT EXISTS tasks_open_hash_idx ON tasks (hash, id) WHERE resolved = 0"
+
+# Task columns added after the first schema; older files gain them on open
+_TASK_MIGRATIONS = (
+	("flag_count", "INTEGER NOT NULL DEFAULT 1"),
+	("first_seen", "REAL"),
+	("last_seen", "REAL"),
+	("resolved_at", "REAL"),
+)
+
+# Stay below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+_SQL_VARS_PER_QUERY = 900
+
+_TASK_COLUMNS = "id, hash, action, params, votes_for, votes_against, resolved, ai, tx_hash, flag_count, first_seen, last_seen, resolved_at"
+
+
+def _bump_blacklist_generation(conn: sqlite3.Connection) -> None:
+	"""Mark the blacklist as changed, inside the writer's transaction."""
+	conn.execute(
+		"INSERT INTO store_meta (key, value) VALUES ('blacklist_generation', 1) "
+		"ON CONFLICT (key) DO UPDATE SET value = value + 1"
+	)
+
+
+def _row_to_task(row: Tuple[Any, ...]) -> Dict[str, Any]:
+	task = {
+		"id": row[0],
+		"hash": row[1],
+		"action": row[2],
+		"params": json.loads(row[3]),
+		"votesFor": row[4],
+		"votesAgainst": row[5],
+		"resolved": bool(row[6]),
+	}
+	if row[7] is not None:
+		task["ai"] = json.loads(row[7])
+	if row[8] is not None:
+		task["txHash"] = row[8]
+	task["flagCount"] = row[9]
+	if row[10] is not None:
+		task["firstSeen"] = row[10]
+	if row[11] is not None:
+		task["lastSeen"] = row[11]
+	if row[12] is not None:
+		task["resolvedAt"] = row[12]
+	return task
+
+
+class SqliteStore(BaseStore):
+	"""SQLite store in WAL mode. One connection per thread; writes run inside
+	BEGIN IMMEDIATE so concurrent writers (threads or processes) serialize."""
+
+	def __init__(self, path: Path = DEFAULT_SQLITE_PATH, archive_dir: Optional[Path] = None):
+		self.path = Path(path)
+		self._local = threading.local()
+		self._conn().executescript(_SCHEMA)
+		self._migrate()
+		self._open_archive(self.path, archive_dir)
+
+	def _migrate(self) -> None:
+		with self._write() as conn:
+			have = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+			for name, decl in _TASK_MIGRATIONS:
+				if name not in have:
+					conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {decl}")
+			conn.execute(_OPEN_HASH_INDEX)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False, timeout=30)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			self._local.conn = conn
+		return conn
+
+	@contextmanager
+	def _write(self) -> Iterator[sqlite3.Connection]:
+		conn = self._conn()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			yield conn
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		conn.execute("COMMIT")
+
+	def _fetch_task(self, conn: sqlite3.Connection, task_id: int) -> Dict[str, Any]:
+		row = conn.execute(f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id = ?", (task_id,)).fetchone()
+		if row is None:
+			raise TaskNotFound(task_id)
+		return _row_to_task(row)
+
+	def is_blacklisted(self, action_hash: str) -> bool:
+		row = self._conn().execute("SELECT 1 FROM blacklist WHERE hash = ?", (normalize_hash(action_hash),)).fetchone()
+		return row is not None
+
+	def add_blacklisted(self, action_hash: str) -> bool:
+		with self._write() as conn:
+			cur = conn.execute("INSERT OR IGNORE INTO blacklist (hash) VALUES (?)", (normalize_hash(action_hash),))
+			if cur.rowcount == 1:
+				_bump_blacklist_generation(conn)
+		return cur.rowcount == 1
+
+	def blacklisted_many(self, action_hashes: Iterable[str]) -> Set[str]:
+		keys = list({normalize_hash(h) for h in action_hashes})
+		conn = self._conn()
+		found: Set[str] = set()
+		for i in range(0, len(keys), _SQL_VARS_PER_QUERY):
+			chunk = keys[i:i + _SQL_VARS_PER_QUERY]
+			placeholders = ",".join("?" * len(chunk))
+			found.update(h for (h,) in conn.execute(f"SELECT hash FROM blacklist WHERE hash IN ({placeholders})", chunk))
+		return found
+
+	def iter_blacklisted(self) -> Iterator[str]:
+		for (h,) in self._conn().execute("SELECT hash FROM blacklist"):
+			yield h
+
+	def blacklist_generation(self) -> int:
+		row = self._conn().execute("SELECT value FROM store_meta WHERE key = 'blacklist_generation'").fetchone()
+		return row[0] if row else 0
+
+	def _insert_task(self, conn: sqlite3.Connection, key: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> int:
+		# Archived ids are never handed out again
+		(task_id,) = conn.execute(
+			"SELECT MAX(COALESCE((SELECT MAX(id) FROM tasks), -1), COALESCE((SELECT value FROM store_meta WHERE key = 'archived_max_id'), -1)) + 1"
+		).fetchone()
+		now = time.time()
+		conn.execute(
+			"INSERT INTO tasks (id, hash, action, params, ai, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+			(task_id, key, action, json.dumps(params), None if ai is None else json.dumps(ai), now, now),
+		)
+		return task_id
+
+	def create_task(self, action_hash: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+		with self._write() as conn:
+			return self._fetch_task(conn, self._insert_task(conn, normalize_hash(action_hash), action, params, ai))
+
+	def find_open_task(self, action_hash: str) -> Optional[Dict[str, Any]]:
+		row = self._conn().execute(
+			f"SELECT {_TASK_COLUMNS} FROM tasks WHERE hash = ? AND resolved = 0 ORDER BY id LIMIT 1", (normalize_hash(action_hash),)
+		).fetchone()
+		return None if row is None else _row_to_task(row)
+
+	def flag_task(self, action_hash: str, action: str, params: Dict[str, Any], ai: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+		key = normalize_hash(action_hash)
+		with self._write() as conn:
+			row = conn.execute("SELECT id FROM tasks WHERE hash = ? AND resolved = 0 ORDER BY id LIMIT 1", (key,)).fetchone()
+			if row is None:
+				return self._fetch_task(conn, self._insert_task(conn, key, action, params, ai)), True
+			conn.execute("UPDATE tasks SET flag_count = flag_count + 1, last_seen = ? WHERE id = ?", (time.time(), row[0]))
+			return self._fetch_task(conn, row[0]), False
+
+	def get_task(self, task_id: int) -> Optional[Dict[str, Any]]:
+		try:
+			return self._fetch_task(self._conn(), task_id)
+		except TaskNotFound:
+			return self.archive.get(task_id)
+
+	def list_tasks(self) -> List[Dict[str, Any]]:
+		rows = self._conn().execute(f"SELECT {_TASK_COLUMNS} FROM tasks ORDER BY id").fetchall()
+		return [_row_to_task(r) for r in rows]
+
+	def query_tasks(
+		self,
+		after: Optional[int] = None,
+		limit: int = 100,
+		unresolved: bool = False,
+		label: Optional[str] = None,
+		min_risk: Optional[float] = None,
+	) -> List[Dict[str, Any]]:
+		clauses = ["id > ?"]
+		args: List[Any] = [-1 if after is None else after]
+		if unresolved:
+			clauses.append("resolved = 0")
+		if label is not None:
+			clauses.append("json_extract(ai, '$.label') = ?")
+			args.append(label)
+		if min_risk is not None:
+			clauses.append("CAST(json_extract(ai, '$.riskScore') AS REAL) >= ?")
+			args.append(min_risk)
+		args.append(limit)
+		rows = self._conn().execute(
+			f"SELECT {_TASK_COLUMNS} FROM tasks WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?", args
+		).fetchall()
+		return [_row_to_task(r) for r in rows]
+
+	def record_vote(self, task_id: int, support: bool, voter: Optional[str] = None) -> Dict[str, Any]:
+		column = "votes_for" if support else "votes_against"
+		with self._write() as conn:
+			cur = conn.execute(f"UPDATE tasks SET {column} = {column} + 1 WHERE id = ? AND resolved = 0", (task_id,))
+			if cur.rowcount == 0:
+				if conn.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone() is None:
+					self._archived_or_missing(task_id)  # raises TaskNotFound
+				raise TaskResolved(task_id)
+			if voter is not None:
+				# The ledger's primary key makes the vote unique; a repeat rolls back the increment
+				cur = conn.execute("INSERT OR IGNORE INTO votes (task_id, voter, support) VALUES (?, ?, ?)", (task_id, voter, int(support)))
+				if cur.rowcount == 0:
+					raise DuplicateVote(task_id)
+			return self._fetch_task(conn, task_id)
+
+	def has_voted(self, task_id: int, voter: str) -> bool:
+		conn = self._conn()
+		if conn.execute("SELECT 1 FROM votes WHERE task_id = ? AND voter = ?", (task_id, voter)).fetchone() is not None:
+			return True
+		return conn.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone() is None and voter in self._archived_voters(task_id)
+
+	def resolve_task(self, task_id: int, quorum: int) -> Tuple[Dict[str, Any], bool]:
+		with self._write() as conn:
+			cur = conn.execute(
+				"UPDATE tasks SET resolved = 1, resolved_at = ? WHERE id = ? AND resolved = 0 AND votes_for >= ?", (time.time(), task_id, quorum)
+			)
+			row = conn.execute(f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id = ?", (task_id,)).fetchone()
+			if cur.rowcount == 1 and conn.execute("INSERT OR IGNORE INTO blacklist (hash) VALUES (?)", (normalize_hash(row[1]),)).rowcount == 1:
+				_bump_blacklist_generation(conn)
+		if row is None:
+			return self._archived_or_missing(task_id), False
+		return _row_to_task(row), cur.rowcount == 1
+
+	def claim(self, name: str, ttl: float) -> bool:
+		key = f"claim:{name}"
+		now = time.time()
+		with self._write() as conn:
+			row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+			if row is not None and now - row[0] < ttl:
+				return False
+			conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, now))
+		return True
+
+	def unsubmitted_resolved(self) -> List[Dict[str, Any]]:
+		rows = self._conn().execute(f"SELECT {_TASK_COLUMNS} FROM tasks WHERE resolved = 1 AND tx_hash IS NULL ORDER BY id").fetchall()
+		return [_row_to_task(r) for r in rows]
+
+	def set_task_tx_hash(self, task_id: int, tx_hash: Optional[str]) -> None:
+		cur = self._conn().execute("UPDATE tasks SET tx_hash = ? WHERE id = ?", (tx_hash, task_id))
+		if cur.rowcount == 0:
+			self.archive.update(task_id, txHash=tx_hash)
+
+	def archive_resolved(self, resolved_before: float, batch: int = 500) -> int:
+		batch = min(batch, _SQL_VARS_PER_QUERY)
+		moved = 0
+		after = -1
+		while True:
+			with self._write() as conn:
+				rows = conn.execute(
+					f"SELECT {_TASK_COLUMNS} FROM tasks WHERE id > ? AND resolved = 1 AND COALESCE(resolved_at, last_seen, first_seen, 0) < ? ORDER BY id LIMIT ?",
+					(after, resolved_before, batch),
+				).fetchall()
+				if not rows:
+					break
+				ids = [r[0] for r in rows]
+				placeholders = ",".join("?" * len(ids))
+				votes: Dict[int, Dict[str, bool]] = {}
+				for task_id, voter, support in conn.execute(f"SELECT task_id, voter, support FROM votes WHERE task_id IN ({placeholders})", ids):
+					votes.setdefault(task_id, {})[voter] = bool(support)
+				# Appended before the delete commits: a crash in between leaves duplicates, which compaction drops
+				self.archive.append({"task": _row_to_task(r), "votes": votes.get(r[0], {})} for r in rows)
+				conn.execute(f"DELETE FROM votes WHERE task_id IN ({placeholders})", ids)
+				conn.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", ids)
+				conn.execute(
+					"INSERT OR REPLACE INTO store_meta (key, value) VALUES ('archived_max_id', MAX(?, COALESCE((SELECT value FROM store_meta WHERE key = 'archived_max_id'), -1)))",
+					(ids[-1],),
+				)
+			moved += len(rows)
+			after = ids[-1]
+			if len(rows) < batch:
+				break
+		if moved:
+			self.archive.flush()
+		return moved
+
+	def reset(self) -> None:
+		with self._write() as conn:
+			conn.execute("DELETE FROM blacklist")
+			conn.execute("DELETE FROM tasks")
+			conn.execute("DELETE FROM votes")
+			# Keep the generation counting up so no cache mistakes the empty list for its old one
+			conn.execute("DELETE FROM store_meta WHERE key != 'blacklist_generation'")
+			_bump_blacklist_generation(conn)
+		self.archive.clear()
+
+	def import_json_db(self, db: Dict[str, Any]) -> Tuple[int, int]:
+		"""Bulk-load a mock_blacklist.json document, keeping task ids. Returns (hashes, tasks)."""
+		hashes = [(normalize_hash(h),) for h in db.get("blacklisted", [])]
+		tasks = [
+			(
+				int(t["id"]),
+				normalize_hash(t["hash"]),
+				t.get("action", ""),
+				json.dumps(t.get("params", {})),
+				int(t.get("votesFor", 0)),
+				int(t.get("votesAgainst", 0)),
+				1 if t.get("resolved") else 0,
+				None if t.get("ai") is None else json.dumps(t["ai"]),
+				t.get("txHash"),
+				int(t.get("flagCount", 1)),
+				t.get("firstSeen"),
+				t.get("lastSeen"),
+				t.get("resolvedAt"),
+			)
+			for t in db.get("tasks", []) or []
+		]
+		votes = [
+			(int(task_id), voter, int(bool(support)))
+			for task_id, voters in (db.get("votes") or {}).items()
+			for voter, support in voters.items()
+		]
+		with self._write() as conn:
+			conn.executemany("INSERT OR IGNORE INTO blacklist (hash) VALUES (?)", hashes)
+			_bump_blacklist_generation(conn)
+			conn.executemany(f"INSERT OR REPLACE INTO tasks ({_TASK_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tasks)
+			conn.executemany("INSERT OR IGNORE INTO votes (task_id, voter, support) VALUES (?, ?, ?)", votes)
+		return len(hashes), len(tasks)
+
+	def close(self) -> None:
+		conn = getattr(self._local, "conn", None)
+		if conn is not None:
+			conn.close()
+			self._local.conn = None
+
+
+def import_json(json_path: Path, store: SqliteStore) -> Tuple[int, int]:
+	"""One-shot import of an existing JSON mock DB into a SQLite store."""
+	return store.import_json_db(JsonStore(json_path).load())
+
+
+_store: Optional[BaseStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> BaseStore:
+	"""Process-wide store selected by AGENT_STORE. A fresh SQLite file is seeded
+	once from the JSON mock DB so existing demo data carries over."""
+	global _store
+	if _store is not None:
+		return _store
+	with _store_lock:
+		if _store is None:
+			json_path = Path(os.getenv("AGENT_JSON_DB_PATH", str(DEFAULT_JSON_PATH)))
+			if os.getenv("AGENT_STORE", "sqlite").lower() == "json":
+				_store = JsonStore(json_path)
+			else:
+				db_path = Path(os.getenv("AGENT_DB_PATH", str(DEFAULT_SQLITE_PATH)))
+				fresh = not db_path.exists()
+				sqlite_store = SqliteStore(db_path)
+				if fresh and json_path.exists():
+					import_json(json_path, sqlite_store)
+				_store = sqlite_store
+	return _store
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Naughty Agents store utilities")
+	sub = parser.add_subparsers(dest="command", required=True)
+	imp = sub.add_parser("import", help="Import a JSON mock DB into SQLite")
+	imp.add_argument("--json", default=str(DEFAULT_JSON_PATH), help="Source JSON file")
+	imp.add_argument("--db", default=os.getenv("AGENT_DB_PATH", str(DEFAULT_SQLITE_PATH)), help="Target SQLite file")
+	arc = sub.add_parser("archive", help="Move resolved tasks to the archive, then compact it")
+	arc.add_argument("--db", default=os.getenv("AGENT_DB_PATH", str(DEFAULT_SQLITE_PATH)), help="SQLite file")
+	arc.add_argument("--older-than", type=float, default=float(os.getenv("TASK_ARCHIVE_AFTER", "86400")), help="Seconds since resolution")
+	arc.add_argument("--retention", type=float, default=float(os.getenv("TASK_ARCHIVE_RETENTION", "0")), help="Drop archived tasks older than this many seconds (0 keeps all)")
+	args = parser.parse_args()
+
+	if args.command == "import":
+		store = SqliteStore(Path(args.db))
+		hashes, tasks = import_json(Path(args.json), store)
+		print(f"Imported {hashes} blacklisted hashes and {tasks} tasks into {args.db}")
+	elif args.command == "archive":
+		store = SqliteStore(Path(args.db))
+		moved = store.archive_resolved(time.time() - args.older_than)
+		compacted = store.archive.compact(args.retention)
+		print(f"Archived {moved} resolved tasks to {store.archive.directory}; {compacted}")
+
+
+if __name__ == "__main__":
+	main()
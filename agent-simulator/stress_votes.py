@@ -0,0 +1,131 @@
+"""Stress the vote ledger: many concurrent voters on one task, no lost updates.
+
+Each voter votes once and some voters retry (duplicates must be rejected
+with 409). At the end votesFor/votesAgainst must equal the number of
+distinct voters on each side. Exits non-zero on any mismatch.
+
+Run:
+  python stress_votes.py                      # 1000 voters, threads, temp SQLite store
+  python stress_votes.py --processes 4        # same store file shared by 4 processes
+  python stress_votes.py --url http://127.0.0.1:5055   # against a running server
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+def _voter_plan(voters: int, dup_every: int) -> List[Tuple[str, bool]]:
+	"""(voter, support) pairs; every dup_every-th voter appears twice."""
+	plan = []
+	for i in range(voters):
+		vote = (f"0x{i:040x}", i % 3 != 0)
+		plan.append(vote)
+		if dup_every and i % dup_every == 0:
+			plan.append(vote)
+	return plan
+
+
+def _make_caller(url: Optional[str]):
+	if url:
+		import requests
+
+		session = requests.Session()
+		adapter = requests.adapters.HTTPAdapter(pool_maxsize=64)
+		session.mount(url, adapter)
+
+		def call(method: str, path: str, body: Optional[dict] = None) -> Tuple[int, dict]:
+			resp = session.request(method, url + path, json=body, timeout=30)
+			return resp.status_code, resp.json()
+		return call
+
+	from server import app
+
+	client = app.test_client()
+
+	def call(method: str, path: str, body: Optional[dict] = None) -> Tuple[int, dict]:
+		resp = client.open(path, method=method, json=body)
+		return resp.status_code, resp.get_json()
+	return call
+
+
+def _cast(url: Optional[str], task_id: int, plan: List[Tuple[str, bool]], threads: int) -> Dict[int, int]:
+	call = _make_caller(url)
+
+	def vote(entry: Tuple[str, bool]) -> int:
+		voter, support = entry
+		return call("POST", "/vote", {"taskId": task_id, "support": support, "voter": voter})[0]
+
+	codes: Dict[int, int] = {}
+	with ThreadPoolExecutor(max_workers=threads) as pool:
+		for code in pool.map(vote, plan):
+			codes[code] = codes.get(code, 0) + 1
+	return codes
+
+
+def _cast_worker(args: Tuple[Optional[str], int, List[Tuple[str, bool]], int]) -> Dict[int, int]:
+	return _cast(*args)
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description="Concurrent vote stress test")
+	parser.add_argument("--voters", type=int, default=1000)
+	parser.add_argument("--threads", type=int, default=200, help="Concurrent requests per process")
+	parser.add_argument("--processes", type=int, default=1)
+	parser.add_argument("--dup-every", type=int, default=10, help="Every Nth voter retries its vote (0: never)")
+	parser.add_argument("--url", help="Run against a live server instead of an in-process temp store")
+	args = parser.parse_args()
+
+	if not args.url:
+		os.environ["AGENT_STORE"] = "sqlite"
+		os.environ["AGENT_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "stress.sqlite3")
+		os.environ["AGENT_JSON_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "empty.json")
+		# No task may reach quorum-driven side effects mid-run
+		os.environ.setdefault("REVIEW_QUORUM", str(args.voters + 1))
+
+	call = _make_caller(args.url)
+	status, flagged = call("POST", "/flag", {"action": "stress_vote", "params": {"nonce": time.time()}})
+	if status != 200:
+		print(f"flag failed: {status} {flagged}")
+		return 1
+	task_id = flagged["taskId"]
+
+	plan = _voter_plan(args.voters, args.dup_every)
+	start = time.perf_counter()
+	if args.processes > 1:
+		chunks = [plan[i::args.processes] for i in range(args.processes)]
+		# Duplicates of one voter may land in different processes; that is the point
+		with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+			results = pool.map(_cast_worker, [(args.url, task_id, c, args.threads) for c in chunks])
+	else:
+		results = [_cast(args.url, task_id, plan, args.threads)]
+	elapsed = time.perf_counter() - start
+
+	codes: Dict[int, int] = {}
+	for r in results:
+		for code, n in r.items():
+			codes[code] = codes.get(code, 0) + n
+
+	unique = dict(plan)
+	want_for = sum(1 for s in unique.values() if s)
+	want_against = len(unique) - want_for
+	_, page = call("GET", f"/tasks?cursor={task_id - 1}&limit=1")
+	task = page["tasks"][0]
+	ok = (
+		task["votesFor"] == want_for
+		and task["votesAgainst"] == want_against
+		and codes.get(200, 0) == len(unique)
+		and codes.get(409, 0) == len(plan) - len(unique)
+	)
+	print(f"{len(plan)} votes ({len(unique)} voters) in {elapsed:.2f}s = {len(plan) / elapsed:.0f} votes/s; responses {codes}")
+	print(f"votesFor {task['votesFor']} (want {want_for}), votesAgainst {task['votesAgainst']} (want {want_against})")
+	print("OK" if ok else "LOST OR DUPLICATED UPDATES")
+	return 0 if ok else 1
+
+
+if __name__ == "__main__":
+	sys.exit(main())
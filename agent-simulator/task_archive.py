@@ -0,0 +1,590 @@
+"""Append-only, compressed archive for resolved review tasks.
+
+Resolved tasks leave the hot store (the SQLite tasks table or the JSON
+file) once they have been resolved for TASK_ARCHIVE_AFTER seconds, so the
+working set behind /tasks, /vote and /resolve holds open and recently
+resolved tasks only. The store falls back to the archive for ids it no
+longer holds, so archived tasks still answer get_task and refuse votes.
+
+Layout: numbered segment files (000001.seg, ...) of zlib-compressed blocks
+of up to BLOCK_TASKS JSON records, each block framed by an 8-byte header
+(compressed length, record count). Records are {"task", "votes",
+"archivedAt"}; a later record for the same id supersedes earlier ones
+(e.g. a txHash set after archival). A segment is written only by appends
+until it holds TASK_ARCHIVE_SEGMENT_TASKS records; after that only
+compaction rewrites it.
+
+The in-memory index is four typed arrays per segment, sorted by id and by
+hash key (28 bytes per record), saved beside each segment as a .idx
+file so start-up does not inflate history. A lookup reads and inflates
+one block.
+
+Each segment counts its superseded records: append() bumps the count of
+the segment holding the record it shadows, and the count lives in the .idx
+header. Compaction rewrites only sealed segments whose count reaches
+TASK_ARCHIVE_COMPACT_RATIO of their records, so a run costs nothing when
+little was superseded. Retention is applied per segment: a sealed segment
+is deleted once its newest record has expired.
+
+Environment:
+- TASK_ARCHIVE_DIR: archive directory (default: <db name>_archive next to the store file)
+- TASK_ARCHIVE_AFTER: seconds a resolved task stays in the hot store (default 86400; negative disables archival)
+- TASK_ARCHIVE_RETENTION: seconds archived tasks are kept (default 0 = forever)
+- TASK_ARCHIVE_INTERVAL: seconds between background archive + compaction runs in the server (default 300; 0 disables)
+- TASK_ARCHIVE_SEGMENT_TASKS: records per segment (default 100000)
+- TASK_ARCHIVE_COMPACT_RATIO: share of superseded records that gets a sealed segment rewritten (default 0.2)
+"""
+import functools
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+	import fcntl
+except ImportError:  # Windows: appends are still serialized by the store's write lock
+	fcntl = None  # type: ignore
+
+
+BLOCK_TASKS = 64
+_FRAME = struct.Struct("<II")
+# magic, size indexed, records, superseded records, oldest archivedAt, newest archivedAt
+_IDX_HEADER = struct.Struct("<4sQQQdd")
+_IDX_MAGIC = b"TAX2"
+_SUPERSEDED = struct.Struct("<Q")
+_SUPERSEDED_OFFSET = struct.calcsize("<4sQQ")
+_NO_ID = 2 ** 63 - 1
+_SEGMENT_SUFFIX = ".seg"
+
+
+def _hash_key(action_hash: str) -> int:
+	"""64-bit index key for an action hash. Hashed rather than a raw prefix so
+	hashes sharing leading digits (test data, zero-padded ids) still spread out."""
+	h = (action_hash or "").strip().lower()
+	h = h[2:] if h.startswith("0x") else h
+	return int.from_bytes(hashlib.blake2b(h.encode(), digest_size=8).digest(), "big")
+
+
+def _loc(offset: int, line: int) -> int:
+	return (offset << 8) | line
+
+
+@functools.lru_cache(maxsize=64)
+def _read_block(path: str, inode: int, offset: int) -> Tuple[bytes, ...]:
+	# inode is part of the key so blocks cached before a compaction rewrite are not reused.
+	# Lines stay raw: a lookup parses only the record it asked for.
+	with open(path, "rb") as f:
+		f.seek(offset)
+		length, _ = _FRAME.unpack(f.read(_FRAME.size))
+		data = zlib.decompress(f.read(length))
+	return tuple(data.split(b"\n"))
+
+
+def _encode_block(records: List[Dict[str, Any]]) -> bytes:
+	data = zlib.compress(b"\n".join(json.dumps(r, separators=(",", ":")).encode() for r in records), 6)
+	return _FRAME.pack(len(data), len(records)) + data
+
+
+def _iter_blocks(path: Path, start: int = 0) -> Iterator[Tuple[int, int, List[Dict[str, Any]]]]:
+	"""(offset, end offset, records) for each complete block from start; a torn tail is skipped."""
+	with open(path, "rb") as f:
+		f.seek(start)
+		offset = start
+		while True:
+			header = f.read(_FRAME.size)
+			if len(header) < _FRAME.size:
+				return
+			length, _ = _FRAME.unpack(header)
+			payload = f.read(length)
+			if len(payload) < length:
+				return
+			end = offset + _FRAME.size + length
+			yield offset, end, [json.loads(line) for line in zlib.decompress(payload).split(b"\n")]
+			offset = end
+
+
+class _Segment:
+	"""Index of one segment file: ids/locs sorted by (id, loc), hash keys sorted with positions into ids."""
+
+	__slots__ = ("number", "path", "ids", "locs", "keys", "key_pos", "pending", "size", "inode", "oldest", "newest", "lo", "hi", "superseded")
+
+	def __init__(self, number: int, path: Path):
+		self.number = number
+		self.path = path
+		self.ids = array("q")
+		self.locs = array("Q")
+		self.keys = array("Q")
+		self.key_pos = array("I")
+		# (id, loc, hash key) appended since the arrays were last sorted
+		self.pending: List[Tuple[int, int, int]] = []
+		self.size = 0
+		self.inode = 0
+		self.oldest = 0.0
+		self.newest = 0.0
+		# id bounds, so lookups skip segments without sorting their pending entries
+		self.lo = _NO_ID
+		self.hi = -1
+		self.superseded = 0
+
+	@property
+	def idx_path(self) -> Path:
+		return self.path.with_suffix(".idx")
+
+	def __len__(self) -> int:
+		return len(self.ids) + len(self.pending)
+
+	def add(self, entries: List[Tuple[int, int, int, float]]) -> None:
+		"""Queue (id, loc, hash key, archivedAt) entries; they are sorted in on the next lookup."""
+		if not entries:
+			return
+		self.pending.extend((i, l, p) for i, l, p, _ in entries)
+		self.lo = min(self.lo, min(i for i, _, _, _ in entries))
+		self.hi = max(self.hi, max(i for i, _, _, _ in entries))
+		times = [t for _, _, _, t in entries]
+		self.oldest = min(times + ([self.oldest] if self.oldest else []))
+		self.newest = max(times + [self.newest])
+
+	def settle(self) -> None:
+		if not self.pending:
+			return
+		pairs = sorted(list(zip(self.ids, self.locs, self._keys_by_position())) + self.pending)
+		self.pending = []
+		self.ids = array("q", (p[0] for p in pairs))
+		self.locs = array("Q", (p[1] for p in pairs))
+		by_key = sorted(range(len(pairs)), key=lambda pos: pairs[pos][2])
+		self.keys = array("Q", (pairs[pos][2] for pos in by_key))
+		self.key_pos = array("I", by_key)
+
+	def _keys_by_position(self) -> List[int]:
+		out = [0] * len(self.ids)
+		for key, pos in zip(self.keys, self.key_pos):
+			out[pos] = key
+		return out
+
+	def find(self, task_id: int) -> Optional[int]:
+		"""Loc of the newest record for task_id in this segment."""
+		if not self.lo <= task_id <= self.hi:
+			return None
+		self.settle()
+		i = bisect_right(self.ids, task_id)
+		return self.locs[i - 1] if i and self.ids[i - 1] == task_id else None
+
+	def ids_for_key(self, key: int) -> List[int]:
+		self.settle()
+		lo, hi = bisect_left(self.keys, key), bisect_right(self.keys, key)
+		return [self.ids[self.key_pos[i]] for i in range(lo, hi)]
+
+	def ids_in_range(self, start: int, end: int) -> array:
+		self.settle()
+		return self.ids[bisect_left(self.ids, start):bisect_right(self.ids, end)]
+
+	def read(self, loc: int) -> Dict[str, Any]:
+		return json.loads(_read_block(str(self.path), self.inode, loc >> 8)[loc & 0xFF])
+
+	def save_index(self) -> None:
+		self.settle()
+		tmp = self.idx_path.with_suffix(".idx.tmp")
+		with open(tmp, "wb") as f:
+			f.write(_IDX_HEADER.pack(_IDX_MAGIC, self.size, len(self.ids), self.superseded, self.oldest, self.newest))
+			for arr in (self.ids, self.locs, self.keys, self.key_pos):
+				arr.tofile(f)
+		os.replace(tmp, self.idx_path)
+
+	def load_index(self) -> bool:
+		try:
+			with open(self.idx_path, "rb") as f:
+				magic, size, count, superseded, oldest, newest = _IDX_HEADER.unpack(f.read(_IDX_HEADER.size))
+				if magic != _IDX_MAGIC:
+					return False
+				arrays = [array("q"), array("Q"), array("Q"), array("I")]
+				for arr in arrays:
+					arr.fromfile(f, count)
+		except (OSError, EOFError, struct.error):
+			return False
+		self.ids, self.locs, self.keys, self.key_pos = arrays
+		self.size, self.superseded, self.oldest, self.newest = size, superseded, oldest, newest
+		if count:
+			self.lo, self.hi = self.ids[0], self.ids[-1]
+		return True
+
+	def _saved_superseded(self) -> Optional[int]:
+		try:
+			with open(self.idx_path, "rb") as f:
+				header = _IDX_HEADER.unpack(f.read(_IDX_HEADER.size))
+		except (OSError, struct.error):
+			return None
+		return header[3] if header[0] == _IDX_MAGIC else None
+
+	def refresh_superseded(self) -> int:
+		"""Superseded count, including bumps saved by other processes."""
+		self.superseded = max(self.superseded, self._saved_superseded() or 0)
+		return self.superseded
+
+	def note_superseded(self, count: int) -> None:
+		"""Count records in this segment shadowed by newer ones. A saved index has its
+		header patched in place; counts are advisory, so a lost bump only delays compaction."""
+		saved = self._saved_superseded()
+		self.superseded = max(self.superseded, saved or 0) + count
+		if saved is not None:
+			with open(self.idx_path, "r+b") as f:
+				f.seek(_SUPERSEDED_OFFSET)
+				f.write(_SUPERSEDED.pack(self.superseded))
+
+	def scan(self) -> None:
+		"""Index blocks appended after self.size (by this or another process)."""
+		entries = []
+		for offset, end, records in _iter_blocks(self.path, self.size):
+			for line, record in enumerate(records):
+				task = record["task"]
+				entries.append((int(task["id"]), _loc(offset, line), _hash_key(task.get("hash", "")), float(record.get("archivedAt", 0))))
+			self.size = end
+		self.add(entries)
+
+	def nbytes(self) -> int:
+		self.settle()
+		return sum(arr.itemsize * len(arr) for arr in (self.ids, self.locs, self.keys, self.key_pos))
+
+
+class TaskArchive:
+	def __init__(self, directory: Path, segment_tasks: int = 100_000, compact_ratio: float = 0.2):
+		self.directory = Path(directory)
+		self.segment_tasks = segment_tasks
+		self.compact_ratio = compact_ratio
+		self._segments: List[_Segment] = []
+		self._lock = threading.RLock()
+		self._depth = 0
+		self.appended = 0
+		self.compactions = 0
+
+	@contextmanager
+	def _exclusive(self) -> Iterator[None]:
+		"""In-process lock plus an advisory file lock, so processes sharing the directory take turns writing."""
+		with self._lock:
+			if self._depth or fcntl is None:
+				self.directory.mkdir(parents=True, exist_ok=True)
+				self._depth += 1
+				try:
+					self._sync()
+					yield
+				finally:
+					self._depth -= 1
+				return
+			self.directory.mkdir(parents=True, exist_ok=True)
+			# flock is per open file, so only the outermost call takes it
+			with open(self.directory / ".lock", "a") as lock_file:
+				fcntl.flock(lock_file, fcntl.LOCK_EX)
+				self._depth += 1
+				try:
+					self._sync()
+					yield
+				finally:
+					self._depth -= 1
+					fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+	def _sync(self) -> None:
+		"""Pick up segments created, extended or rewritten since the last look."""
+		if not self.directory.is_dir():
+			self._segments = []
+			return
+		known = {s.number: s for s in self._segments}
+		segments = []
+		for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+			if not entry.name.endswith(_SEGMENT_SUFFIX) or not entry.name[:-len(_SEGMENT_SUFFIX)].isdigit():
+				continue
+			st = entry.stat()
+			segment = known.get(int(entry.name[:-len(_SEGMENT_SUFFIX)]))
+			if segment is None or segment.inode != st.st_ino:
+				segment = _Segment(int(entry.name[:-len(_SEGMENT_SUFFIX)]), Path(entry.path))
+				segment.inode = st.st_ino
+				if not segment.load_index() or segment.size > st.st_size:
+					segment = _Segment(segment.number, segment.path)
+					segment.inode = st.st_ino
+			if segment.size < st.st_size:
+				segment.scan()
+			segments.append(segment)
+		self._segments = segments
+
+	def _active(self) -> _Segment:
+		if self._segments and len(self._segments[-1]) < self.segment_tasks:
+			return self._segments[-1]
+		number = self._segments[-1].number + 1 if self._segments else 1
+		path = self.directory / f"{number:06d}{_SEGMENT_SUFFIX}"
+		path.touch()
+		segment = _Segment(number, path)
+		segment.inode = path.stat().st_ino
+		self._segments.append(segment)
+		return segment
+
+	def append(self, records: Iterable[Dict[str, Any]]) -> int:
+		"""Append {"task", "votes"} records (archivedAt is stamped here). Returns the number written."""
+		pending = list(records)
+		count = len(pending)
+		if not count:
+			return 0
+		now = time.time()
+		with self._exclusive():
+			self._note_shadowed(int(r["task"]["id"]) for r in pending)
+			while pending:
+				segment = self._active()
+				room = self.segment_tasks - len(segment)
+				batch, pending = pending[:room], pending[room:]
+				entries = []
+				with open(segment.path, "r+b") as f:
+					# Drop a torn block left by a crashed writer
+					f.truncate(segment.size)
+					f.seek(segment.size)
+					for start in range(0, len(batch), BLOCK_TASKS):
+						block = [{**r, "archivedAt": now} for r in batch[start:start + BLOCK_TASKS]]
+						offset = f.tell()
+						f.write(_encode_block(block))
+						entries.extend(
+							(int(r["task"]["id"]), _loc(offset, line), _hash_key(r["task"].get("hash", "")), now)
+							for line, r in enumerate(block)
+						)
+					f.flush()
+					os.fsync(f.fileno())
+					segment.size = f.tell()
+				segment.add(entries)
+				if len(segment) >= self.segment_tasks:
+					segment.save_index()
+				self.appended += len(batch)
+		return count
+
+	def _note_shadowed(self, task_ids: Iterable[int]) -> None:
+		"""Bump the superseded count of segments holding the current record for these ids.
+		New archivals fall outside every segment's id range, so this is a bounds check each."""
+		counts: Dict[int, int] = {}
+		for task_id in task_ids:
+			found = self._locate(task_id)
+			if found is not None:
+				counts[found[0].number] = counts.get(found[0].number, 0) + 1
+		for segment in self._segments:
+			if segment.number in counts:
+				segment.note_superseded(counts[segment.number])
+
+	def flush(self) -> None:
+		"""Save the index of the segment being appended to. Blocks appended after the
+		last save are still found (by scanning them) when the index is reloaded."""
+		with self._lock:
+			if self._segments:
+				self._segments[-1].save_index()
+
+	def _locate(self, task_id: int) -> Optional[Tuple[_Segment, int]]:
+		for segment in reversed(self._segments):
+			loc = segment.find(task_id)
+			if loc is not None:
+				return segment, loc
+		return None
+
+	def get_record(self, task_id: int) -> Optional[Dict[str, Any]]:
+		"""Newest archived record for a task id: {"task", "votes", "archivedAt"}."""
+		with self._lock:
+			for attempt in range(2):
+				found = self._locate(task_id)
+				# A segment compacted by another process has a new inode; re-index before reading
+				if found is not None and _inode(found[0].path) == found[0].inode:
+					return found[0].read(found[1])
+				if attempt == 0:
+					self._sync()
+			return None
+
+	def get(self, task_id: int) -> Optional[Dict[str, Any]]:
+		"""Archived task in the API shape, marked archived."""
+		record = self.get_record(task_id)
+		return None if record is None else _as_task(record)
+
+	def find_by_hash(self, action_hash: str) -> List[Dict[str, Any]]:
+		"""Archived tasks for an action hash, in id order."""
+		key = action_hash.strip().lower()
+		key = key[2:] if key.startswith("0x") else key
+		hash_key = _hash_key(key)
+		with self._lock:
+			self._sync()
+			ids = sorted({i for segment in self._segments for i in segment.ids_for_key(hash_key)})
+			tasks = [self.get(i) for i in ids]
+		return [t for t in tasks if t is not None and t.get("hash") == key]
+
+	def range(self, start: int = 0, end: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+		"""Archived tasks with start <= id <= end, in id order, at most limit."""
+		last = end if end is not None else 2 ** 63 - 1
+		with self._lock:
+			self._sync()
+			ids = sorted({i for segment in self._segments for i in segment.ids_in_range(start, last)})[:limit]
+			return [t for t in (self.get(i) for i in ids) if t is not None]
+
+	def update(self, task_id: int, **fields: Any) -> Optional[Dict[str, Any]]:
+		"""Supersede an archived task with changed fields (appends a new record)."""
+		with self._exclusive():
+			found = self._locate(task_id)
+			if found is None:
+				return None
+			record = found[0].read(found[1])
+			record = {"task": {**record["task"], **fields}, "votes": record.get("votes", {})}
+			self.append([record])
+		return _as_task({**record, "archivedAt": time.time()})
+
+	def compact(self, retention: float = 0.0) -> Dict[str, int]:
+		"""Delete sealed segments whose newest record is older than retention seconds
+		(retention > 0), and rewrite sealed segments whose superseded count reached
+		compact_ratio of their records. Other segments are not read; the segment
+		being appended to is left alone."""
+		cutoff = time.time() - retention if retention > 0 else None
+		removed = rewritten = dropped = 0
+		with self._exclusive():
+			for segment in list(self._segments[:-1]):
+				if cutoff is not None and segment.newest < cutoff:
+					dropped += len(segment)
+					self._remove(segment)
+					removed += 1
+					continue
+				if segment.refresh_superseded() < max(1.0, len(segment) * self.compact_ratio):
+					continue
+				segment.settle()
+				newer = self._segments[self._segments.index(segment) + 1:]
+				live = []
+				for task_id in sorted(set(segment.ids)):
+					# find() gives the segment's newest record for the id; it is live unless a later segment has one too
+					if not any(s.find(task_id) is not None for s in newer):
+						live.append(segment.read(segment.find(task_id)))
+				dropped += len(segment) - len(live)
+				if not live:
+					self._remove(segment)
+					removed += 1
+				else:
+					self._rewrite(segment, live)
+					rewritten += 1
+			self.compactions += 1
+		return {"segmentsRemoved": removed, "segmentsRewritten": rewritten, "recordsDropped": dropped}
+
+	def _remove(self, segment: _Segment) -> None:
+		for path in (segment.path, segment.idx_path):
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+		self._segments.remove(segment)
+
+	def _rewrite(self, segment: _Segment, records: List[Dict[str, Any]]) -> None:
+		tmp = segment.path.with_suffix(".seg.tmp")
+		fresh = _Segment(segment.number, segment.path)
+		entries = []
+		with open(tmp, "wb") as f:
+			for start in range(0, len(records), BLOCK_TASKS):
+				block = records[start:start + BLOCK_TASKS]
+				offset = f.tell()
+				f.write(_encode_block(block))
+				entries.extend(
+					(int(r["task"]["id"]), _loc(offset, line), _hash_key(r["task"].get("hash", "")), float(r.get("archivedAt", 0)))
+					for line, r in enumerate(block)
+				)
+			f.flush()
+			os.fsync(f.fileno())
+			fresh.size = f.tell()
+		os.replace(tmp, segment.path)
+		fresh.inode = segment.path.stat().st_ino
+		fresh.add(entries)
+		fresh.save_index()
+		self._segments[self._segments.index(segment)] = fresh
+
+	def clear(self) -> None:
+		with self._exclusive():
+			for segment in list(self._segments):
+				self._remove(segment)
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			self._sync()
+			return {
+				"segments": len(self._segments),
+				"records": sum(len(s) for s in self._segments),
+				"bytes": sum(s.size for s in self._segments),
+				"indexBytes": sum(s.nbytes() for s in self._segments),
+				"appended": self.appended,
+				"compactions": self.compactions,
+			}
+
+
+def _inode(path: Path) -> int:
+	try:
+		return os.stat(path).st_ino
+	except FileNotFoundError:
+		return -1
+
+
+def _as_task(record: Dict[str, Any]) -> Dict[str, Any]:
+	return {**record["task"], "archived": True, "archivedAt": record.get("archivedAt")}
+
+
+class Archiver:
+	"""Background loop: move idle resolved tasks to the archive, then compact it."""
+
+	def __init__(self, store: Any, interval: float, after: float, retention: float):
+		self.store = store
+		self.interval = interval
+		self.after = after
+		self.retention = retention
+		self.runs = 0
+		self.archived = 0
+		self.last_run: Optional[float] = None
+		self.last_error: Optional[str] = None
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._loop, name="task-archiver", daemon=True)
+
+	def start(self) -> None:
+		self._thread.start()
+
+	def stop(self) -> None:
+		self._stop.set()
+
+	def run_once(self) -> Dict[str, Any]:
+		archived = self.store.archive_resolved(time.time() - self.after) if self.after >= 0 else 0
+		compacted = self.store.archive.compact(self.retention)
+		self.runs += 1
+		self.archived += archived
+		self.last_run = time.time()
+		return {"archived": archived, **compacted}
+
+	def _loop(self) -> None:
+		while not self._stop.wait(self.interval):
+			try:
+				self.run_once()
+				self.last_error = None
+			except Exception as exc:  # keep archiving on the next tick
+				self.last_error = str(exc)
+
+	def stats(self) -> Dict[str, Any]:
+		return {"runs": self.runs, "archived": self.archived, "lastRun": self.last_run, "lastError": self.last_error}
+
+
+_archiver: Optional[Archiver] = None
+_archiver_lock = threading.Lock()
+
+
+def start_archiver(store: Any) -> Optional[Archiver]:
+	"""Start the background archiver once per process unless TASK_ARCHIVE_INTERVAL=0."""
+	global _archiver
+	interval = float(os.getenv("TASK_ARCHIVE_INTERVAL", "300"))
+	if interval <= 0:
+		return None
+	with _archiver_lock:
+		if _archiver is None:
+			_archiver = Archiver(
+				store,
+				interval,
+				after=float(os.getenv("TASK_ARCHIVE_AFTER", "86400")),
+				retention=float(os.getenv("TASK_ARCHIVE_RETENTION", "0")),
+			)
+			_archiver.start()
+	return _archiver
+
+
+def get_archiver() -> Optional[Archiver]:
+	return _archiver
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The agent-simulator modules are flat top-level modules, imported by name
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+	"""A throwaway store of each backend, with its archive under tmp_path."""
+	from store import JsonStore, SqliteStore
+
+	if request.param == "json":
+		instance = JsonStore(tmp_path / "db.json", archive_dir=tmp_path / "archive")
+	else:
+		instance = SqliteStore(tmp_path / "db.sqlite3", archive_dir=tmp_path / "archive")
+	yield instance
+	instance.close()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+	"""Flask test client over a fresh SQLite store (no JSON seed, no background threads)."""
+	import membership
+	import store
+
+	monkeypatch.setenv("AGENT_STORE", "sqlite")
+	monkeypatch.setenv("AGENT_DB_PATH", str(tmp_path / "api.sqlite3"))
+	monkeypatch.setenv("AGENT_JSON_DB_PATH", str(tmp_path / "missing.json"))
+	monkeypatch.setenv("TASK_ARCHIVE_DIR", str(tmp_path / "archive"))
+	monkeypatch.setattr(store, "_store", None)
+	monkeypatch.setattr(membership, "_cache", None)
+	from server import app
+
+	yield app.test_client()
+	if membership._cache is not None:
+		membership._cache.stop()
+	if store._store is not None:
+		store._store.close()
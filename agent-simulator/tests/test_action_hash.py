@@ -0,0 +1,75 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+import action_hash
+from agent_utils import get_action_hash, get_action_hashes
+
+
+# (action, params, expected keccak hex) produced by the original web3-based implementation
+GOLDEN_VECTORS: List[Tuple[str, Dict[str, Any], str]] = [
+	("native_transfer", {"to": "0x0000000000000000000000000000000000000001", "amount": 100}, "806b7287a2da74039e73e3171087ca87ff859a08b743fc6e2a4ef168eefa0c52"),
+	("native_transfer", {"amount": 100, "to": "0x0000000000000000000000000000000000000001"}, "806b7287a2da74039e73e3171087ca87ff859a08b743fc6e2a4ef168eefa0c52"),
+	("approve", {"spender": "0xabc...", "tokenId": 123}, "d98d67b486d60d86f88974a3b4b10f953b774c6e90c68a100b8d3a6bbb7b3990"),
+	("noop", {}, "a48f864fb52130b4dc03f6259e343c475225f7d69750f6ebb0e57a260496fa06"),
+	# Nested objects keep their insertion order; only top-level params are sorted
+	(
+		"swap",
+		{"route": {"tokenOut": "0x02", "tokenIn": "0x01", "hops": [{"pool": "0xaa", "fee": 3000}, {"pool": "0xbb", "fee": 500}]}, "deadline": 1735689600},
+		"f817521187c778f337b9440576c424c8c89a9b859a452564db5d46c1d004f72a",
+	),
+	# Non-ASCII is \u-escaped by json.dumps before hashing
+	("memo", {"text": "héllo wörld ✓ 你好 \U0001f680"}, "1513890846b09af1781ce69466cc23e652d5e3d3941e3606968ec12a4cb7aedb"),
+	("érc20_transfer", {"to": "0x0000000000000000000000000000000000000002", "amount": 1}, "9a8604e8569071b2838268d8784af72557da32deab8dd1bf89b55721becd1983"),
+	("erc20_transfer", {"amount": 2**256 - 1, "to": "0x0000000000000000000000000000000000000002"}, "7d0c89e2692b29cf82b8e458034128a965c8246e45b855a7a9643ee5fc73f771"),
+	("mint", {"amount": -(2**255), "nonce": 2**64 + 1}, "7154d8fe2b7be892ac7b8ecb44d05f08aef93827bdf58256a3864d72356f8207"),
+	("flags", {"enabled": True, "memo": None, "ratio": 0.5, "tags": ["a", "b"]}, "6fa2348ca14d200f9fdb459ba789a3cff269291e5fbe28f3a0d5d05010db016c"),
+]
+
+
+def _web3_keccak(action_name: str, params: Dict[str, Any]) -> str:
+	"""The original agent_utils implementation."""
+	web3 = pytest.importorskip("web3")
+	payload = {"action": action_name, "params": dict(sorted(params.items()))}
+	return web3.Web3.keccak(text=json.dumps(payload, separators=(",", ":"))).hex().removeprefix("0x")
+
+
+@pytest.mark.parametrize("action_name, params, expected", GOLDEN_VECTORS)
+def test_golden_vectors(action_name, params, expected):
+	action_hash._keccak_payload.cache_clear()
+	assert action_hash.action_hash(action_name, params).hex() == expected
+	# The memoized digest is the same bytes
+	assert get_action_hash(action_name, params).hex() == expected
+
+
+@pytest.mark.parametrize("action_name, params, expected", GOLDEN_VECTORS)
+def test_matches_web3_keccak(action_name, params, expected):
+	assert _web3_keccak(action_name, params) == expected
+
+
+def test_batch_matches_single():
+	batch = get_action_hashes((a, p) for a, p, _ in GOLDEN_VECTORS)
+	assert [h.hex() for h in batch] == [e for _, _, e in GOLDEN_VECTORS]
+
+
+def test_param_order_does_not_matter():
+	assert get_action_hash("swap", {"a": 1, "b": 2}) == get_action_hash("swap", {"b": 2, "a": 1})
+	assert get_action_hash("swap", {"a": 1}) != get_action_hash("swap", {"a": 2})
+
+
+@pytest.mark.parametrize("constant, signature", [
+	("chain_reader.GET_ACTION_STATUS_SELECTOR", b"getActionStatus(bytes32)"),
+	("chain_reader.BLOCK_AND_AGGREGATE_SELECTOR", b"blockAndAggregate((address,bytes)[])"),
+	("blacklist_batcher.ADD_TO_BLACKLIST_BATCH_SELECTOR", b"addToBlacklist(bytes32[])"),
+])
+def test_precomputed_selectors(constant, signature):
+	module, name = constant.split(".")
+	assert getattr(__import__(module), name) == action_hash.keccak256(signature)[:4]
+
+
+def test_precomputed_event_topics():
+	import chain_indexer
+
+	assert chain_indexer.ACTION_FLAGGED_TOPIC == "0x" + action_hash.keccak256(b"ActionFlagged(uint256,bytes32)").hex()
+	assert chain_indexer.STATUS_CHANGED_TOPIC == "0x" + action_hash.keccak256(b"ActionStatusChanged(bytes32,uint8)").hex()
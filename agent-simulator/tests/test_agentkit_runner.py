@@ -0,0 +1,124 @@
+import sys
+import threading
+import types
+
+import pytest
+
+import agentkit_runner
+from agentkit_runner import AgentKitSession
+
+
+class _Wallet:
+	def __init__(self, gate: threading.Event):
+		self.gate = gate
+		self.transfers = []
+
+	def transfer_native(self, to_address, amount):
+		self.gate.wait(10)
+		self.transfers.append((to_address, amount))
+		return {"to": to_address, "amount": amount}
+
+
+@pytest.fixture
+def fake_agentkit(monkeypatch):
+	"""A stand-in coinbase_agentkit: transfers block until gate is set."""
+	module = types.ModuleType("coinbase_agentkit")
+	module.gate = threading.Event()
+	module.gate.set()
+	module.clients = []
+
+	class AgentKitOptions:
+		def __init__(self, **kwargs):
+			self.__dict__.update(kwargs)
+
+	class AgentKit:
+		def __init__(self, options):
+			self.options = options
+			self.wallet = _Wallet(module.gate)
+
+		@classmethod
+		def from_options(cls, options):
+			client = cls(options)
+			module.clients.append(client)
+			return client
+
+	module.AgentKitOptions = AgentKitOptions
+	module.AgentKit = AgentKit
+	module.Network = types.SimpleNamespace(BASE_SEPOLIA="base-sepolia", BASE_MAINNET="base-mainnet")
+	monkeypatch.setitem(sys.modules, "coinbase_agentkit", module)
+	for name in agentkit_runner.CREDENTIAL_ENV:
+		monkeypatch.setenv(name, f"test-{name.lower()}")
+	monkeypatch.delenv("AGENTKIT_NETWORK", raising=False)
+	yield module
+	module.gate.set()
+
+
+def test_client_is_built_once_and_rebuilt_on_env_change(fake_agentkit, monkeypatch):
+	session = AgentKitSession(timeout=5)
+	for amount in (1, 2):
+		result = session.run("native_transfer", {"to": "0xabc", "amount": amount})
+		assert result["ok"] is True and result["requestId"]
+	assert session.stats()["builds"] == 1 and len(fake_agentkit.clients) == 1
+	assert fake_agentkit.clients[0].wallet.transfers == [("0xabc", 1.0), ("0xabc", 2.0)]
+	assert fake_agentkit.clients[0].options.network == "base-sepolia"
+	monkeypatch.setenv("AGENTKIT_NETWORK", "base_mainnet")
+	session.run("native_transfer", {"to": "0xabc", "amount": 3})
+	assert session.stats()["builds"] == 2
+	assert fake_agentkit.clients[1].options.network == "base-mainnet"
+
+
+def test_missing_module_or_credentials_are_reported(fake_agentkit, monkeypatch):
+	missing = AgentKitSession(module_name="no_such_agentkit_module")
+	result = missing.run("native_transfer", {"to": "0x1", "amount": 1})
+	assert result["ok"] is False and "not installed" in result["error"]
+	monkeypatch.delenv("CDP_API_KEY_NAME")
+	session = AgentKitSession()
+	result = session.run("native_transfer", {"to": "0x1", "amount": 1})
+	assert result["error"] == "Missing CDP credentials in environment"
+	assert session.stats()["builds"] == 0
+	assert session.run("unknown_action", {})["error"] == "Unsupported action: unknown_action"
+
+
+def test_timeout_reports_pending_and_outcome_follows(fake_agentkit):
+	session = AgentKitSession(timeout=0.05)
+	fake_agentkit.gate.clear()
+	result = session.run("native_transfer", {"to": "0x1", "amount": 1})
+	assert result["ok"] is None and result["pending"] is True
+	request_id = result["requestId"]
+	assert session.outcome(request_id) == {"ok": None, "pending": True, "requestId": request_id}
+	assert session.stats()["unresolvedTimeouts"] == 1
+	fake_agentkit.gate.set()
+	session._executor.submit(lambda: None).result(5)  # single worker: the transfer finished first
+	outcome = session.outcome(request_id)
+	assert outcome["ok"] is True and outcome["result"] == {"to": "0x1", "amount": 1.0}
+	assert session.stats()["unresolvedTimeouts"] == 0
+	assert session.outcome("never-issued") is None
+
+
+def test_slot_limit_rejects_while_calls_are_stuck(fake_agentkit):
+	session = AgentKitSession(workers=1, max_pending=2, timeout=0.02)
+	fake_agentkit.gate.clear()
+	first = session.run("native_transfer", {"to": "0x1", "amount": 1})
+	second = session.run("native_transfer", {"to": "0x2", "amount": 2})
+	assert first["pending"] and second["pending"]
+	busy = session.run("native_transfer", {"to": "0x3", "amount": 3})
+	assert busy == {"ok": False, "error": "AgentKit busy", "maxPending": 2}
+	assert session.stats()["rejected"] == 1
+	fake_agentkit.gate.set()
+	session._executor.submit(lambda: None).result(5)
+	assert session.outcome(second["requestId"])["ok"] is True
+	# Both slots came back once the stuck calls returned
+	assert session.run("native_transfer", {"to": "0x4", "amount": 4}, timeout=5)["ok"] is True
+
+
+def test_agent_run_routes_report_pending_and_poll(fake_agentkit, client, monkeypatch):
+	monkeypatch.setattr(agentkit_runner, "_session", AgentKitSession(timeout=0.05))
+	fake_agentkit.gate.clear()
+	resp = client.post("/agent/run", json={"action": "native_transfer", "params": {"to": "0x1", "amount": 1}})
+	assert resp.status_code == 202
+	request_id = resp.get_json()["requestId"]
+	assert client.get(f"/agent/run/{request_id}").get_json()["pending"] is True
+	fake_agentkit.gate.set()
+	agentkit_runner._session._executor.submit(lambda: None).result(5)
+	assert client.get(f"/agent/run/{request_id}").get_json()["ok"] is True
+	assert client.get("/agent/run/unknown").status_code == 404
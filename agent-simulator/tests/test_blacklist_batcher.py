@@ -0,0 +1,216 @@
+import threading
+import time
+
+import pytest
+
+import blacklist_batcher
+import eth_rpc
+import store as store_module
+from action_hash import keccak256
+from blacklist_batcher import BlacklistBatcher, SubmitRejected, encode_add_to_blacklist
+from eth_rpc import RpcError
+from store import SqliteStore
+
+H1, H2, H3 = ("0x" + c * 64 for c in "123")
+
+
+@pytest.fixture(autouse=True)
+def _store(store, monkeypatch):
+	monkeypatch.setattr(store_module, "_store", store)
+	monkeypatch.setattr(blacklist_batcher, "get_store", lambda: store)
+	return store
+
+
+class FakeSubmitter:
+	"""Returns tx hashes, or raises the queued errors first."""
+
+	def __init__(self, *errors):
+		self.errors = list(errors)
+		self.sent = []
+
+	def __call__(self, calldata):
+		self.sent.append(calldata)
+		if self.errors:
+			raise self.errors.pop(0)
+		return f"0xtx{len(self.sent)}"
+
+
+class FakeChain:
+	def __init__(self):
+		self.listed = set()
+		self.receipts = {}
+
+	def statuses(self, hashes):
+		return [2 if h in self.listed else 0 for h in hashes]
+
+	def receipt(self, tx_hash):
+		return self.receipts.get(tx_hash)
+
+
+def _manual(batcher):
+	# Drive flushes and confirmations from the test instead of the background loop
+	batcher._thread = threading.current_thread()
+	return batcher
+
+
+def _due(batcher):
+	with batcher._cond:
+		for b in batcher._retries:
+			b.retry_at = time.monotonic()
+		return batcher._take_due_batch()
+
+
+def test_calldata_encoding():
+	assert blacklist_batcher.ADD_TO_BLACKLIST_BATCH_SELECTOR == keccak256(b"addToBlacklist(bytes32[])")[:4]
+	calldata = encode_add_to_blacklist([H1, H2])
+	body = bytes.fromhex(calldata[2:])
+	assert body[:4].hex() == "47376eb5"
+	words = [body[4 + 32 * i:36 + 32 * i] for i in range(4)]
+	assert int.from_bytes(words[0], "big") == 32
+	assert int.from_bytes(words[1], "big") == 2
+	assert words[2] == bytes.fromhex("1" * 64) and words[3] == bytes.fromhex("2" * 64)
+
+
+def test_coalesces_hashes_and_records_tx_hash(_store):
+	tasks = [_store.create_task(h, "swap", {}, None) for h in (H1, H2)]
+	submit = FakeSubmitter()
+	batcher = _manual(BlacklistBatcher(submit, max_batch=3, window=1000))
+	first = batcher.add(H1, tasks[0]["id"])
+	assert batcher.add(H1.upper().replace("0X", "0x"), tasks[0]["id"]) == first
+	assert batcher.add(H2, tasks[1]["id"]) == first
+	assert _due(batcher) is None  # neither full nor past the window
+	result = batcher.flush_now()
+	assert submit.sent == [encode_add_to_blacklist([H1, H2])]
+	assert result["status"] == "submitted" and result["txHash"] == "0xtx1"
+	assert _store.get_task(tasks[1]["id"])["txHash"] == "0xtx1"
+	assert batcher.task_submission(tasks[0]["id"])["batchId"] == first
+	assert batcher.add(H3, 99) != first
+
+
+def test_full_batch_is_due_at_once():
+	batcher = _manual(BlacklistBatcher(FakeSubmitter(), max_batch=2, window=1000))
+	batcher.add(H1, 1)
+	batcher.add(H2, 2)
+	assert _due(batcher).hashes == [H1[2:], H2[2:]]
+
+
+def test_rejected_sends_back_off_then_fail():
+	submit = FakeSubmitter(*(SubmitRejected("nonce too low") for _ in range(3)))
+	batcher = _manual(BlacklistBatcher(submit, window=1000, max_attempts=3, retry_backoff=10, retry_backoff_max=25))
+	batcher.add(H1, 1)
+	batcher.flush_now()
+	delays = []
+	for _ in range(2):
+		batch = batcher._retries[0]
+		assert batch.status == "retrying"
+		delays.append(batch.retry_at - time.monotonic())
+		batcher._flush(_due(batcher))
+	assert [round(d) for d in delays] == [10, 20]
+	assert batch.status == "failed" and batch.attempts == 3
+	assert batch.tx_hash is None
+	assert not batcher._retries
+
+
+def test_ambiguous_send_is_not_resent_until_checked():
+	chain = FakeChain()
+	submit = FakeSubmitter(TimeoutError("read timed out"))
+	batcher = _manual(BlacklistBatcher(submit, window=1000, chain_statuses=chain.statuses, unknown_timeout=1000))
+	batcher.add(H1, 1)
+	batcher.add(H2, 2)
+	batch = batcher._batches[batcher.flush_now()["batchId"]]
+	assert batch.status == "unknown" and not batcher._retries
+	batcher.confirm_pending()
+	assert batch.status == "unknown" and len(submit.sent) == 1
+	# The timed-out tx did land
+	chain.listed.update({H1[2:], H2[2:]})
+	batcher.confirm_pending()
+	assert batch.status == "confirmed" and len(submit.sent) == 1
+
+
+def test_unknown_send_is_resent_after_timeout_without_landed_hashes():
+	chain = FakeChain()
+	submit = FakeSubmitter(TimeoutError("read timed out"))
+	batcher = _manual(BlacklistBatcher(submit, window=1000, chain_statuses=chain.statuses, unknown_timeout=0))
+	batcher.add(H1, 1)
+	batcher.add(H2, 2)
+	batch = batcher._batches[batcher.flush_now()["batchId"]]
+	batcher.confirm_pending()
+	assert batch.status == "retrying"
+	chain.listed.add(H1[2:])  # landed meanwhile by some other tx
+	batcher._flush(_due(batcher))
+	assert submit.sent[-1] == encode_add_to_blacklist([H2])
+	assert batch.status == "submitted"
+
+
+def test_unknown_without_chain_reads_stays_unknown():
+	batcher = _manual(BlacklistBatcher(FakeSubmitter(ConnectionError("reset")), window=1000, unknown_timeout=0))
+	batcher.add(H1, 1)
+	batch = batcher._batches[batcher.flush_now()["batchId"]]
+	batcher.confirm_pending()
+	assert batch.status == "unknown"
+	assert batcher.stats()["batches"] == {"unknown": 1}
+
+
+def test_reverted_receipt_retries_and_success_confirms():
+	chain = FakeChain()
+	batcher = _manual(BlacklistBatcher(FakeSubmitter(), chain.receipt, window=1000))
+	batcher.add(H1, 1)
+	batch = batcher._batches[batcher.flush_now()["batchId"]]
+	batcher.confirm_pending()
+	assert batch.status == "submitted"
+	chain.receipts["0xtx1"] = {"status": "0x0", "blockNumber": "0x10"}
+	batcher.confirm_pending()
+	assert batch.status == "retrying" and batch.error == "transaction reverted"
+	batcher._flush(_due(batcher))
+	chain.receipts["0xtx2"] = {"status": "0x1", "blockNumber": "0x11"}
+	batcher.confirm_pending()
+	assert batch.status == "confirmed" and batch.confirmed_block == 17
+	assert batcher.get_batch(batch.id)["tasks"] == [{"taskId": 1, "confirmed": True}]
+
+
+def test_requeue_unsubmitted_skips_hashes_already_on_chain(_store):
+	chain = FakeChain()
+	for h in (H1, H2):
+		task = _store.create_task(h, "swap", {}, None)
+		for voter in ("a", "b", "c"):
+			_store.record_vote(task["id"], True, voter)
+		_store.resolve_task(task["id"], 3)
+	chain.listed.add(H1[2:])
+	submit = FakeSubmitter()
+	batcher = _manual(BlacklistBatcher(submit, window=1000, chain_statuses=chain.statuses))
+	assert batcher.requeue_unsubmitted(_store) == 2
+	if isinstance(_store, SqliteStore):
+		assert batcher.requeue_unsubmitted(_store) == 0  # another worker already claimed it
+	batcher.flush_now()
+	assert submit.sent == [encode_add_to_blacklist([H2])]
+	assert _store.unsubmitted_resolved() == []
+
+
+def test_rpc_submitter_reuses_the_nonce_after_an_ambiguous_send(monkeypatch):
+	calls = []
+	outcomes = [TimeoutError("read timed out"), RpcError("RPC eth_sendTransaction failed: 502", 502), "0xabc"]
+
+	def fake_rpc(url, method, params=(), idempotent=True):
+		calls.append((method, params))
+		if method == "eth_getTransactionCount":
+			return hex(len([c for c in calls if c[0] == method]) + 4)
+		result = outcomes.pop(0)
+		if isinstance(result, Exception):
+			raise result
+		return result
+
+	monkeypatch.setattr(eth_rpc, "rpc_call", fake_rpc)
+	monkeypatch.setenv("BLACKLIST_FROM", "0xsender")
+	submit = blacklist_batcher._rpc_submitter("0xregistry", "http://node")
+	calldata = encode_add_to_blacklist([H1])
+	for _ in range(2):
+		with pytest.raises(Exception) as exc:
+			submit(calldata)
+		assert not isinstance(exc.value, SubmitRejected)
+	assert submit(calldata) == "0xabc"
+	nonces = [p[0]["nonce"] for m, p in calls if m == "eth_sendTransaction"]
+	assert nonces == ["0x5", "0x5", "0x5"]
+	# A refusal from the node proves nothing was sent, and frees the pinned nonce
+	outcomes.append(RpcError("RPC eth_sendTransaction error: {'message': 'nonce too low'}"))
+	with pytest.raises(SubmitRejected):
+		submit(calldata)
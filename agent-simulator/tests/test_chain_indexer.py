@@ -0,0 +1,195 @@
+from types import SimpleNamespace
+
+import pytest
+
+import chain_indexer
+from chain_indexer import ACTION_FLAGGED_TOPIC, STATUS_CHANGED_TOPIC, ChainIndex, ChainIndexer
+from eth_rpc import RpcError
+
+REGISTRY = "0x" + "ab" * 20
+H1, H2 = ("0x" + c * 64 for c in "12")
+
+
+class FakeNode:
+	"""A chain of numbered blocks with logs, answering the indexer's JSON-RPC batches."""
+
+	def __init__(self, head: int):
+		self.fork = "a"
+		self.blocks = {n: self._hash(n) for n in range(head + 1)}
+		self.logs = []
+		self.max_range = None  # eth_getLogs fails for wider ranges, like a provider's limit
+
+	def _hash(self, n: int) -> str:
+		return "0x" + f"{self.fork}{n:063x}"
+
+	def mine(self, count: int = 1) -> None:
+		for _ in range(count):
+			self.blocks[len(self.blocks)] = self._hash(len(self.blocks))
+
+	def reorg(self, from_block: int) -> None:
+		"""Replace every block from from_block on, dropping their logs."""
+		self.fork = chr(ord(self.fork) + 1)
+		for n in range(from_block, len(self.blocks)):
+			self.blocks[n] = self._hash(n)
+		self.logs = [log for log in self.logs if int(log["blockNumber"], 16) < from_block]
+
+	def _log(self, block: int, topics, data: str):
+		self.logs.append({
+			"blockNumber": hex(block),
+			"blockHash": self.blocks[block],
+			"logIndex": hex(len(self.logs)),
+			"transactionHash": "0x" + "ee" * 32,
+			"topics": topics,
+			"data": data,
+		})
+
+	def flag(self, block: int, task_id: int, action_hash: str) -> None:
+		self._log(block, [ACTION_FLAGGED_TOPIC, hex(task_id)], action_hash)
+
+	def set_status(self, block: int, action_hash: str, status: int) -> None:
+		self._log(block, [STATUS_CHANGED_TOPIC, action_hash], "0x" + f"{status:064x}")
+
+	def __call__(self, url, calls):
+		out = []
+		for method, params in calls:
+			if method == "eth_blockNumber":
+				out.append(hex(len(self.blocks) - 1))
+			elif method == "eth_getBlockByNumber":
+				n = int(params[0], 16)
+				out.append({"number": params[0], "hash": self.blocks[n]} if n in self.blocks else None)
+			elif method == "eth_getLogs":
+				lo, hi = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+				if self.max_range is not None and hi - lo + 1 > self.max_range:
+					out.append(RpcError("query returned more than 10000 results"))
+				else:
+					out.append([log for log in self.logs if lo <= int(log["blockNumber"], 16) <= hi])
+		return out
+
+
+@pytest.fixture
+def node(monkeypatch):
+	fake = FakeNode(head=20)
+	monkeypatch.setattr(chain_indexer, "rpc_batch", fake)
+	return fake
+
+
+@pytest.fixture
+def indexer(tmp_path):
+	return ChainIndexer(ChainIndex(tmp_path / "index.sqlite3"), "http://node", [REGISTRY], batch_blocks=8, ranges_per_poll=2)
+
+
+def _sync(indexer):
+	for _ in range(20):
+		if not indexer.poll()["ranges"]:
+			return
+
+
+def test_indexes_flags_and_status_changes(node, indexer):
+	node.flag(3, 0, H1)
+	node.set_status(7, H1, 2)
+	node.flag(15, 1, H2)
+	_sync(indexer)
+	assert indexer.index.checkpoint() == 20
+	assert indexer.index.status(H1) == 2 and indexer.index.status(H2) == 0
+	assert [(t["taskId"], t["hash"], t["status"]) for t in indexer.index.tasks()] == [(0, H1[2:], 2), (1, H2[2:], 0)]
+	assert indexer.caught_up()
+
+
+def test_reorg_rewinds_to_the_last_matching_block(node, indexer):
+	node.set_status(17, H1, 2)
+	_sync(indexer)
+	assert indexer.index.status(H1) == 2
+	# Blocks 16.. are replaced; the status change is gone and lands later instead
+	node.reorg(16)
+	node.mine(2)
+	node.set_status(21, H2, 2)
+	indexer.poll()
+	assert indexer.reorgs == 1
+	assert indexer.index.block_hash(15) == node.blocks[15]
+	_sync(indexer)
+	assert indexer.index.checkpoint() == 22
+	# Hashes of the replaced blocks are gone; the new range end is recorded
+	assert indexer.index.block_hash(17) is None
+	assert indexer.index.block_hash(22) == node.blocks[22]
+	assert indexer.index.status(H1) == 0 and indexer.index.status(H2) == 2
+
+
+def test_rewind_drops_rows_after_the_block(tmp_path):
+	index = ChainIndex(tmp_path / "index.sqlite3")
+	logs = [
+		{"blockNumber": hex(4), "blockHash": "0x04", "logIndex": "0x0", "topics": [STATUS_CHANGED_TOPIC, H1], "data": "0x" + "0" * 63 + "2"},
+		{"blockNumber": hex(9), "blockHash": "0x09", "logIndex": "0x0", "topics": [ACTION_FLAGGED_TOPIC, "0x5"], "data": H2},
+	]
+	assert index.apply_range(10, "0x10", logs) == (1, 1)
+	index.rewind(5)
+	assert index.checkpoint() == 5
+	assert index.status(H1) == 2 and index.tasks() == []
+	assert [n for n, _ in index.recent_blocks()] == [4]
+
+
+def test_reorg_below_every_retained_hash_reindexes_everything(node, indexer):
+	node.flag(2, 0, H1)
+	_sync(indexer)
+	node.reorg(0)
+	indexer.poll()
+	assert indexer.reorgs == 1
+	_sync(indexer)
+	assert indexer.index.tasks() == [] and indexer.index.checkpoint() == 20
+
+
+def test_failed_range_halves_the_batch_and_blocks_caught_up(node, indexer):
+	node.max_range = 3
+	node.set_status(1, H1, 2)
+	indexer.poll()
+	assert indexer.batch_blocks == 4
+	assert indexer.last_error and not indexer.caught_up()
+	assert indexer.stats()["lastError"] == indexer.last_error
+	indexer.poll()
+	assert indexer.batch_blocks == 2 and indexer.last_error
+	_sync(indexer)
+	assert indexer.last_error is None and indexer.caught_up()
+	assert indexer.index.status(H1) == 2
+
+
+def test_poll_errors_survive_run_forever(node, indexer, monkeypatch):
+	_sync(indexer)
+
+	def down(url, calls):
+		raise RpcError("connection refused")
+
+	monkeypatch.setattr(chain_indexer, "rpc_batch", down)
+	def stop(seconds):
+		raise KeyboardInterrupt
+
+	monkeypatch.setattr(chain_indexer, "time", SimpleNamespace(sleep=stop))
+	with pytest.raises(KeyboardInterrupt):
+		indexer.run_forever(1)
+	assert indexer.last_error == "connection refused"
+	assert not indexer.caught_up()
+
+
+def test_lag_beyond_max_lag_is_not_caught_up(node, indexer):
+	_sync(indexer)
+	node.mine(indexer.max_lag + 1)
+	indexer.head = len(node.blocks) - 1
+	assert not indexer.caught_up()
+
+
+def test_status_route_serves_the_index_off_the_event_loop(node, indexer, client, monkeypatch):
+	import api
+
+	assert [r.mode for r in api.ROUTES if r.path == "/chain/status/{action_hash}"] == ["storage"]
+	resp = client.get(f"/status/{H1}?source=chain")
+	assert resp.status_code == 307 and resp.headers["Location"].endswith(f"/chain/status/{H1}")
+	assert client.get(f"/chain/status/{H1}").status_code == 503  # no indexer configured
+	monkeypatch.setattr(chain_indexer, "_indexer", indexer)
+	monkeypatch.setattr(chain_indexer, "_index", indexer.index)
+	node.max_range = 1
+	indexer.poll()
+	body = client.get(f"/chain/status/{H1}").get_json()
+	assert body["source"] == "chain" and body["lastError"]
+	node.max_range = None
+	node.set_status(4, H1, 2)
+	_sync(indexer)
+	resp = client.get(f"/status/{H1}?source=chain", follow_redirects=True)
+	assert resp.get_json() == {"status": 2, "source": "chain", "indexedBlock": 20}
@@ -0,0 +1,71 @@
+import pytest
+
+import api
+import membership
+from ttl_cache import TtlCache
+
+ACTION = {"action": "native_transfer", "params": {"to": "0x9", "amount": 7}}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_replays(monkeypatch):
+	monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+	monkeypatch.setattr(api, "_idempotent_responses", TtlCache(100, 60))
+
+
+def test_repeat_flag_joins_the_open_task(client):
+	first = client.post("/flag", json=ACTION).get_json()
+	assert first["duplicate"] is False and first["flagCount"] == 1
+	again = client.post("/flag", json=ACTION)
+	assert again.status_code == 200
+	body = again.get_json()
+	assert body["taskId"] == first["taskId"] and body["duplicate"] is True
+	assert body["flagCount"] == 2 and body["aiCached"] is True
+	assert body["ai"] == first["ai"]
+	assert [t["id"] for t in client.get("/tasks").get_json()["tasks"]] == [first["taskId"]]
+
+
+def test_flag_of_a_blacklisted_hash_is_refused(client):
+	action_hash = client.post("/flag", json=ACTION).get_json()["hash"]
+	api.get_store().add_blacklisted(action_hash)
+	membership.get_blacklist_cache().refresh()
+	resp = client.post("/flag", json=ACTION)
+	assert resp.status_code == 409
+	assert resp.get_json() == {"error": "Action already known", "hash": action_hash, "status": "blacklisted"}
+
+
+def test_idempotency_key_replays_the_first_response(client):
+	headers = {"Idempotency-Key": "flag-1"}
+	first = client.post("/flag", json=ACTION, headers=headers)
+	assert "Idempotent-Replayed" not in first.headers
+	replay = client.post("/flag", json=ACTION, headers=headers)
+	assert replay.status_code == 200 and replay.headers["Idempotent-Replayed"] == "true"
+	assert replay.get_json() == first.get_json()
+	# The replay did not flag again; a new key does
+	assert api.get_store().get_task(first.get_json()["taskId"])["flagCount"] == 1
+	other = client.post("/flag", json=ACTION, headers={"Idempotency-Key": "flag-2"}).get_json()
+	assert other["duplicate"] is True and other["flagCount"] == 2
+
+
+def test_idempotency_key_reused_for_another_body_is_rejected(client):
+	headers = {"Idempotency-Key": "flag-1"}
+	assert client.post("/flag", json=ACTION, headers=headers).status_code == 200
+	changed = {"action": "native_transfer", "params": {"to": "0x9", "amount": 8}}
+	resp = client.post("/flag", json=changed, headers=headers)
+	assert resp.status_code == 422
+	assert "different request" in resp.get_json()["error"]
+	assert len(client.get("/tasks").get_json()["tasks"]) == 1
+
+
+def test_server_errors_are_not_replayed():
+	calls = []
+
+	def failing():
+		calls.append(1)
+		return {"error": "store unavailable"}, 503
+
+	req = api.ApiRequest(json=ACTION, headers={"Idempotency-Key": "k"})
+	for _ in range(2):
+		_, status, _ = api._idempotent(req, "flag", failing)
+		assert status == 503
+	assert len(calls) == 2
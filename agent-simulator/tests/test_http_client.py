@@ -0,0 +1,107 @@
+import pytest
+import requests
+
+from http_client import CircuitBreaker, CircuitOpen, HttpClient
+
+URL = "https://api.example/v1/send"
+
+
+class FakeResponse:
+	def __init__(self, status_code: int, headers=None):
+		self.status_code = status_code
+		self.headers = headers or {}
+
+
+class FakeSession:
+	"""Plays back queued responses and exceptions, one per request."""
+
+	def __init__(self, *outcomes):
+		self.outcomes = list(outcomes)
+		self.calls = 0
+
+	def request(self, method, url, **kwargs):
+		self.calls += 1
+		outcome = self.outcomes.pop(0)
+		if isinstance(outcome, Exception):
+			raise outcome
+		return FakeResponse(outcome) if isinstance(outcome, int) else outcome
+
+
+def _client(*outcomes, **kwargs):
+	options = {"max_retries": 2, "backoff_base": 0, "breaker_threshold": 3, "breaker_reset": 60, **kwargs}
+	client = HttpClient(**options)
+	session = FakeSession(*outcomes)
+	client._sessions["https://api.example"] = session
+	client._breakers["https://api.example"] = CircuitBreaker(client.breaker_threshold, client.breaker_reset)
+	return client, session
+
+
+def test_retries_server_errors_then_returns_the_response():
+	client, session = _client(503, 502, 200)
+	assert client.request("GET", URL).status_code == 200
+	assert session.calls == 3
+	assert client.breaker_states()["https://api.example"] == {"state": "closed", "consecutiveFailures": 0}
+
+
+def test_gives_up_after_max_retries():
+	client, session = _client(503, 503, 503, 200, breaker_threshold=10)
+	assert client.request("GET", URL).status_code == 503
+	assert session.calls == 3
+
+
+def test_non_idempotent_calls_retry_only_when_unsent():
+	client, session = _client(requests.exceptions.ReadTimeout("slow"), 200)
+	with pytest.raises(requests.exceptions.ReadTimeout):
+		client.post(URL, idempotent=False)
+	assert session.calls == 1
+	client, session = _client(requests.exceptions.ConnectTimeout("no route"), 500, 429, 200)
+	# 500 may have been processed; 429 was refused
+	assert client.post(URL, idempotent=False).status_code == 500
+	assert session.calls == 2
+	client, session = _client(429, 200)
+	assert client.post(URL, idempotent=False).status_code == 200
+
+
+def test_backoff_honors_retry_after_and_caps_jitter():
+	client = HttpClient(backoff_base=1, backoff_max=5)
+	assert client._backoff(0, FakeResponse(429, {"Retry-After": "2"})) == 2
+	assert client._backoff(0, FakeResponse(429, {"Retry-After": "120"})) == 5
+	assert all(0 <= client._backoff(attempt, None) <= min(5, 2 ** attempt) for attempt in range(6) for _ in range(20))
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+	client, session = _client(500, 500, 500, 200, max_retries=5)
+	breaker = client._breakers["https://api.example"]
+	# The third failure opens the breaker before the fourth attempt
+	with pytest.raises(CircuitOpen):
+		client.request("GET", URL)
+	assert session.calls == 3 and breaker.state == "open"
+	breaker.reset_after = 0
+	assert client.request("GET", URL).status_code == 200
+	assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_half_open_trial_is_exclusive():
+	breaker = CircuitBreaker(threshold=1, reset_after=0)
+	breaker.record_failure()
+	assert breaker.allow() and breaker.state == "half_open"
+	assert not breaker.allow()
+	breaker.record_failure()
+	assert breaker.state == "open" and breaker.allow()
+
+
+@pytest.mark.parametrize("error", [
+	requests.exceptions.InvalidURL("bad url"),
+	requests.exceptions.TooManyRedirects("loop"),
+	requests.exceptions.ChunkedEncodingError("truncated"),
+])
+def test_unexpected_errors_end_the_half_open_trial(error):
+	client, session = _client(error, 200, breaker_threshold=1, breaker_reset=0)
+	breaker = client._breakers["https://api.example"]
+	breaker.record_failure()
+	with pytest.raises(type(error)):
+		client.request("GET", URL)
+	assert session.calls == 1 and breaker.state == "open"
+	# The failed trial did not wedge the breaker: the next call gets its own trial
+	assert client.request("GET", URL).status_code == 200
+	assert breaker.state == "closed"
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from membership import BlacklistCache
+from store import JsonStore, SqliteStore
+
+HASH = "0x" + "cd" * 32
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def two_stores(request, tmp_path):
+	"""Two stores over one file, standing in for two worker processes."""
+	if request.param == "json":
+		stores = [JsonStore(tmp_path / "db.json", archive_dir=tmp_path / "archive") for _ in range(2)]
+	else:
+		stores = [SqliteStore(tmp_path / "db.sqlite3", archive_dir=tmp_path / "archive") for _ in range(2)]
+	yield stores
+	for s in stores:
+		s.close()
+
+
+def test_other_writers_are_seen_after_refresh(two_stores):
+	mine, other = two_stores
+	cache = BlacklistCache(mine)
+	assert not cache.refresh()
+	time.sleep(0.01)  # JsonStore's generation is the file's mtime
+	other.add_blacklisted(HASH)
+	assert not cache.contains(HASH)
+	assert cache.refresh()
+	assert cache.contains(HASH)
+	assert cache.stats()["reloads"] == 1
+
+
+def test_resolve_and_reset_in_another_process_move_the_generation(two_stores):
+	mine, other = two_stores
+	cache = BlacklistCache(mine)
+	task = other.create_task(HASH, "swap", {}, None)
+	for voter in ("a", "b", "c"):
+		other.record_vote(task["id"], True, voter)
+	time.sleep(0.01)
+	other.resolve_task(task["id"], 3)
+	assert cache.refresh() and cache.contains(HASH)
+	time.sleep(0.01)
+	other.reset()
+	assert cache.refresh() and not cache.contains(HASH)
+
+
+def test_repeat_adds_do_not_force_reloads(tmp_path):
+	mine, other = (SqliteStore(tmp_path / "db.sqlite3", archive_dir=tmp_path / "archive") for _ in range(2))
+	try:
+		other.add_blacklisted(HASH)
+		cache = BlacklistCache(mine)
+		assert not other.add_blacklisted(HASH)
+		assert not cache.refresh()
+	finally:
+		mine.close()
+		other.close()
+
+
+def test_watcher_reloads_in_the_background(two_stores):
+	mine, other = two_stores
+	cache = BlacklistCache(mine)
+	cache.watch(0.01)
+	try:
+		time.sleep(0.01)
+		other.add_blacklisted(HASH)
+		deadline = time.monotonic() + 5
+		while not cache.contains(HASH) and time.monotonic() < deadline:
+			time.sleep(0.01)
+		assert cache.contains(HASH)
+	finally:
+		cache.stop()
@@ -0,0 +1,69 @@
+import api
+
+
+def _flag_with_votes(client, votes: int):
+	flagged = client.post("/flag", json={"action": "native_transfer", "params": {"to": "0x9", "amount": 7}}).get_json()
+	for i in range(votes):
+		client.post("/vote", json={"taskId": flagged["taskId"], "support": True, "voter": f"reviewer{i}"})
+	return flagged["taskId"], flagged["hash"]
+
+
+def test_resolve_below_quorum_does_not_blacklist(client):
+	task_id, action_hash = _flag_with_votes(client, api.REVIEW_QUORUM - 1)
+	resp = client.post("/resolve", json={"taskId": task_id})
+	assert resp.status_code == 200
+	assert resp.get_json()["resolved"] is False
+	assert client.get(f"/status/{action_hash}").get_json()["status"] == 0
+
+
+class _RecordingBatcher:
+	def __init__(self):
+		self.added = []
+
+	def add(self, action_hash, task_id):
+		self.added.append((action_hash, task_id))
+		return 7
+
+
+def test_resolve_blacklists_and_queues_the_hash(client, monkeypatch):
+	batcher = _RecordingBatcher()
+	monkeypatch.setattr(api, "get_blacklist_batcher", lambda: batcher)
+	task_id, action_hash = _flag_with_votes(client, api.REVIEW_QUORUM)
+	resp = client.post("/resolve", json={"taskId": task_id})
+	assert resp.status_code == 200
+	assert resp.get_json() == {"taskId": task_id, "resolved": True, "blacklisted": True, "batchId": 7}
+	assert batcher.added == [(action_hash, task_id)]
+	assert client.get(f"/status/{action_hash}").get_json()["status"] == 2
+	assert api.get_store().is_blacklisted(action_hash)
+
+
+def test_resolve_is_idempotent(client):
+	task_id, action_hash = _flag_with_votes(client, api.REVIEW_QUORUM)
+	assert client.post("/resolve", json={"taskId": task_id}).get_json()["resolved"] is True
+	again = client.post("/resolve", json={"taskId": task_id})
+	assert again.status_code == 200
+	assert again.get_json()["resolved"] is True
+	assert client.get(f"/status/{action_hash}").get_json()["status"] == 2
+
+
+def test_resolve_repairs_a_resolved_task_missing_from_the_blacklist(client):
+	task_id, action_hash = _flag_with_votes(client, api.REVIEW_QUORUM)
+	store = api.get_store()
+	# A task resolved by the old deferred path whose blacklist write never ran
+	with store._write() as conn:
+		conn.execute("UPDATE tasks SET resolved = 1 WHERE id = ?", (task_id,))
+	assert not store.is_blacklisted(action_hash)
+	resp = client.post("/resolve", json={"taskId": task_id})
+	assert resp.get_json()["resolved"] is True
+	assert store.is_blacklisted(action_hash)
+	assert client.get(f"/status/{action_hash}").get_json()["status"] == 2
+
+
+def test_store_resolve_blacklists_in_the_same_write(store):
+	task = store.create_task("ab" * 32, "swap", {}, None)
+	for voter in ("a", "b", "c"):
+		store.record_vote(task["id"], True, voter)
+	assert not store.is_blacklisted("ab" * 32)
+	_, resolved_now = store.resolve_task(task["id"], 3)
+	assert resolved_now
+	assert store.is_blacklisted("0x" + "ab" * 32)
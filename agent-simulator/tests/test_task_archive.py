@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+import store as store_module
+from store import TaskNotFound, TaskResolved
+from task_archive import TaskArchive
+
+
+def _record(task_id: int, **task):
+	return {"task": {"id": task_id, "hash": f"{task_id:064x}", "resolved": True, **task}, "votes": {"v": True}}
+
+
+def test_round_trip_survives_compaction_and_reopen(tmp_path):
+	archive = TaskArchive(tmp_path / "archive", segment_tasks=4, compact_ratio=0.5)
+	assert archive.append(_record(i, votesFor=i) for i in range(10)) == 10
+	# Two updates supersede records in the first (sealed) segment
+	assert archive.update(1, txHash="0xaa")["txHash"] == "0xaa"
+	archive.update(2, txHash="0xbb")
+	assert archive.update(99, txHash="0xcc") is None
+	archive.flush()
+	assert archive.stats()["records"] == 12
+	result = archive.compact()
+	assert result == {"segmentsRemoved": 0, "segmentsRewritten": 1, "recordsDropped": 2}
+	reopened = TaskArchive(tmp_path / "archive", segment_tasks=4)
+	assert reopened.stats()["records"] == 10
+	assert reopened.get(1)["txHash"] == "0xaa" and reopened.get(2)["txHash"] == "0xbb"
+	assert reopened.get(3) == {**_record(3, votesFor=3)["task"], "archived": True, "archivedAt": reopened.get(3)["archivedAt"]}
+	assert reopened.get_record(0)["votes"] == {"v": True}
+	assert [t["id"] for t in reopened.range(0, 9, limit=100)] == list(range(10))
+	assert [t["id"] for t in reopened.find_by_hash("0x" + f"{7:064x}")] == [7]
+	assert reopened.get(10) is None
+
+
+def test_compaction_skips_segments_below_the_ratio(tmp_path):
+	archive = TaskArchive(tmp_path / "archive", segment_tasks=4, compact_ratio=0.5)
+	archive.append(_record(i) for i in range(8))
+	archive.update(0, txHash="0x1")
+	assert archive.compact()["segmentsRewritten"] == 0
+	archive.update(1, txHash="0x2")
+	assert archive.compact()["segmentsRewritten"] == 1
+
+
+def test_superseded_counts_are_shared_between_processes(tmp_path):
+	first = TaskArchive(tmp_path / "archive", segment_tasks=4, compact_ratio=0.5)
+	second = TaskArchive(tmp_path / "archive", segment_tasks=4, compact_ratio=0.5)
+	first.append(_record(i) for i in range(8))
+	first.update(0, txHash="0x1")
+	second.update(1, txHash="0x2")
+	# Neither instance superseded half the segment alone; together they did
+	assert first.compact()["segmentsRewritten"] == 1
+	assert second.get(0)["txHash"] == "0x1" and second.get(1)["txHash"] == "0x2"
+
+
+def test_retention_drops_old_sealed_segments(tmp_path):
+	archive = TaskArchive(tmp_path / "archive", segment_tasks=4)
+	archive.append(_record(i) for i in range(6))
+	time.sleep(0.05)
+	assert archive.compact(retention=3600)["segmentsRemoved"] == 0
+	result = archive.compact(retention=0.01)
+	# The segment being appended to is kept however old it is
+	assert result == {"segmentsRemoved": 1, "segmentsRewritten": 0, "recordsDropped": 4}
+	assert archive.get(0) is None and archive.get(5)["id"] == 5
+
+
+def test_torn_tail_is_ignored_then_truncated(tmp_path):
+	archive = TaskArchive(tmp_path / "archive", segment_tasks=100)
+	archive.append(_record(i) for i in range(3))
+	segment = next((tmp_path / "archive").glob("*.seg"))
+	good = segment.stat().st_size
+	with open(segment, "ab") as f:
+		f.write(b"\x40\x00\x00\x00partial block from a crashed writer")
+	reopened = TaskArchive(tmp_path / "archive", segment_tasks=100)
+	assert reopened.stats()["records"] == 3 and reopened.get(2)["id"] == 2
+	reopened.append([_record(3)])
+	assert reopened.get(3)["id"] == 3
+	assert TaskArchive(tmp_path / "archive").stats()["records"] == 4
+	assert segment.stat().st_size > good
+
+
+def _resolved_task(store, action_hash: str):
+	task = store.create_task(action_hash, "swap", {}, None)
+	for voter in ("a", "b", "c"):
+		store.record_vote(task["id"], True, voter)
+	store.resolve_task(task["id"], 3)
+	return task
+
+
+def test_archived_tasks_are_served_from_the_archive(store):
+	task = _resolved_task(store, "0x" + "11" * 32)
+	open_task = store.create_task("0x" + "22" * 32, "swap", {}, None)
+	assert store.archive_resolved(time.time() + 1) == 1
+	assert [t["id"] for t in store.list_tasks()] == [open_task["id"]]
+	archived = store.get_task(task["id"])
+	assert archived["archived"] is True and archived["resolved"] is True
+	assert archived["votesFor"] == 3
+	# Archiving does not free the id for reuse
+	assert store.create_task("0x" + "33" * 32, "swap", {}, None)["id"] > open_task["id"]
+	assert store.archive_resolved(time.time() + 1) == 0
+
+
+def test_votes_on_archived_tasks_are_rejected(store):
+	task = _resolved_task(store, "0x" + "11" * 32)
+	store.archive_resolved(time.time() + 1)
+	with pytest.raises(TaskResolved):
+		store.record_vote(task["id"], True, "d")
+	# The archive still remembers who voted
+	assert store.has_voted(task["id"], "a") and not store.has_voted(task["id"], "d")
+	with pytest.raises(TaskNotFound):
+		store.record_vote(task["id"] + 100, True, "d")
+
+
+def test_vote_route_rejects_archived_tasks(client):
+	store = store_module.get_store()
+	task = _resolved_task(store, "0x" + "11" * 32)
+	store.archive_resolved(time.time() + 1)
+	resp = client.post("/vote", json={"taskId": task["id"], "support": True, "voter": "d"})
+	assert resp.status_code == 400 and resp.get_json()["error"] == "Task already resolved"
+	assert client.get(f"/tasks/archive?hash=0x{'11' * 32}").get_json()["tasks"][0]["id"] == task["id"]
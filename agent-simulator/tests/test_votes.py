@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+import stress_votes
+from store import DuplicateVote, SqliteStore, TaskNotFound, TaskResolved
+
+
+def _task(store, n: int = 1):
+	return store.create_task(f"{n:064x}", "native_transfer", {"to": "0x1", "amount": n}, None)
+
+
+def test_one_vote_per_voter(store):
+	task = _task(store)
+	store.record_vote(task["id"], True, "0xaaa")
+	with pytest.raises(DuplicateVote):
+		store.record_vote(task["id"], False, "0xaaa")
+	updated = store.record_vote(task["id"], False, "0xbbb")
+	assert (updated["votesFor"], updated["votesAgainst"]) == (1, 1)
+	assert store.has_voted(task["id"], "0xaaa")
+	assert not store.has_voted(task["id"], "0xccc")
+
+
+def test_votes_are_per_task(store):
+	first, second = _task(store, 1), _task(store, 2)
+	store.record_vote(first["id"], True, "0xaaa")
+	assert store.record_vote(second["id"], True, "0xaaa")["votesFor"] == 1
+
+
+def test_resolved_and_unknown_tasks_refuse_votes(store):
+	task = _task(store)
+	for voter in ("a", "b", "c"):
+		store.record_vote(task["id"], True, voter)
+	_, resolved_now = store.resolve_task(task["id"], 3)
+	assert resolved_now
+	with pytest.raises(TaskResolved):
+		store.record_vote(task["id"], True, "d")
+	with pytest.raises(TaskNotFound):
+		store.record_vote(task["id"] + 1000, True, "d")
+
+
+def test_concurrent_voters_lose_no_updates(store):
+	task = _task(store)
+	voters = [f"0x{i:04x}" for i in range(40)]
+	duplicates = []
+
+	def vote(voter: str) -> None:
+		for _ in range(2):
+			try:
+				store.record_vote(task["id"], int(voter, 16) % 2 == 0, voter)
+			except DuplicateVote:
+				duplicates.append(voter)
+
+	threads = [threading.Thread(target=vote, args=(v,)) for v in voters]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	final = store.get_task(task["id"])
+	assert (final["votesFor"], final["votesAgainst"]) == (20, 20)
+	assert sorted(duplicates) == voters
+
+
+def test_vote_endpoint_requires_a_voter(client):
+	task_id = client.post("/flag", json={"action": "swap", "params": {"x": 1}}).get_json()["taskId"]
+	assert client.post("/vote", json={"taskId": task_id, "support": True}).status_code == 400
+	assert client.post("/vote", json={"taskId": task_id, "support": True}, headers={"X-Voter": "0xA"}).status_code == 200
+	assert client.post("/vote", json={"taskId": task_id, "support": True, "voter": "0xb"}).status_code == 200
+	# Voter ids are case-insensitive, like addresses
+	assert client.post("/vote", json={"taskId": task_id, "support": True, "voter": "0xa"}).status_code == 409
+
+
+def test_stores_sharing_one_file_serialize_votes(tmp_path):
+	# Separate stores stand in for separate worker processes: only BEGIN IMMEDIATE orders them
+	stores = [SqliteStore(tmp_path / "shared.sqlite3", archive_dir=tmp_path / "archive") for _ in range(4)]
+	try:
+		task = _task(stores[0])
+		plan = stress_votes._voter_plan(200, dup_every=5)
+		codes = []
+
+		def cast(i: int) -> None:
+			for voter, support in plan[i::len(stores)]:
+				try:
+					stores[i].record_vote(task["id"], support, voter)
+					codes.append(200)
+				except DuplicateVote:
+					codes.append(409)
+
+		threads = [threading.Thread(target=cast, args=(i,)) for i in range(len(stores))]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		unique = dict(plan)
+		want_for = sum(1 for support in unique.values() if support)
+		final = stores[1].get_task(task["id"])
+		assert (final["votesFor"], final["votesAgainst"]) == (want_for, len(unique) - want_for)
+		assert codes.count(409) == len(plan) - len(unique)
+	finally:
+		for s in stores:
+			s.close()
+
+
+def test_stress_votes_over_http(client):
+	# The stress_votes.py run, scaled down: concurrent /vote requests with retries
+	task_id = client.post("/flag", json={"action": "stress_vote", "params": {"n": 1}}).get_json()["taskId"]
+	plan = stress_votes._voter_plan(300, dup_every=10)
+	codes = stress_votes._cast(None, task_id, plan, threads=32)
+	unique = dict(plan)
+	want_for = sum(1 for support in unique.values() if support)
+	task = client.get(f"/tasks?cursor={task_id - 1}&limit=1").get_json()["tasks"][0]
+	assert (task["votesFor"], task["votesAgainst"]) == (want_for, len(unique) - want_for)
+	assert codes == {200: len(unique), 409: len(plan) - len(unique)}
@@ -0,0 +1,151 @@
+"""In-process TTL + LRU cache with single-flight loading.
+
+get_or_load(key, loader) runs the loader once per key even when many
+threads ask concurrently; the others wait for the leader's result. Entries
+expire after `ttl` seconds (wall clock, so snapshots survive restarts) and
+the least recently used entry is evicted past `max_entries`.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+
+
+class TtlCache:
+	def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+		self._inflight: Dict[Hashable, Future] = {}
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self.evictions = 0
+		self.expirations = 0
+
+	def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+		# Caller holds the lock
+		entry = self._entries.get(key)
+		if entry is None:
+			return False, None
+		expires_at, value = entry
+		if expires_at <= time.time():
+			del self._entries[key]
+			self.expirations += 1
+			return False, None
+		self._entries.move_to_end(key)
+		return True, value
+
+	def _store(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+		# Caller holds the lock
+		self._entries[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+			self.evictions += 1
+
+	def get(self, key: Hashable) -> Tuple[bool, Any]:
+		with self._lock:
+			found, value = self._lookup(key)
+			if found:
+				self.hits += 1
+			return found, value
+
+	def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+		with self._lock:
+			self._store(key, value, ttl)
+
+	def get_or_load(
+		self,
+		key: Hashable,
+		loader: Callable[[], Any],
+		should_cache: Optional[Callable[[Any], bool]] = None,
+	) -> Tuple[Any, str]:
+		"""Return (value, HIT | MISS | COALESCED). Loader errors propagate to every waiter
+		and nothing is cached; should_cache(value) can veto caching a result."""
+		with self._lock:
+			found, value = self._lookup(key)
+			if found:
+				self.hits += 1
+				return value, HIT
+			future = self._inflight.get(key)
+			if future is not None:
+				self.coalesced += 1
+				leader = False
+			else:
+				self.misses += 1
+				future = self._inflight[key] = Future()
+				leader = True
+		if not leader:
+			return future.result(), COALESCED
+		try:
+			value = loader()
+		except BaseException as exc:
+			with self._lock:
+				self._inflight.pop(key, None)
+			future.set_exception(exc)
+			raise
+		with self._lock:
+			if should_cache is None or should_cache(value):
+				self._store(key, value)
+			self._inflight.pop(key, None)
+		future.set_result(value)
+		return value, MISS
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def stats(self) -> Dict[str, Any]:
+		with self._lock:
+			lookups = self.hits + self.misses + self.coalesced
+			return {
+				"entries": len(self._entries),
+				"maxEntries": self.max_entries,
+				"ttl": self.ttl,
+				"hits": self.hits,
+				"misses": self.misses,
+				"coalesced": self.coalesced,
+				"evictions": self.evictions,
+				"expirations": self.expirations,
+				"hitRatio": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+			}
+
+	def save(self, path: Path) -> None:
+		"""Atomically write unexpired entries (string keys only) to a JSON file."""
+		now = time.time()
+		with self._lock:
+			entries = [[k, exp, v] for k, (exp, v) in self._entries.items() if isinstance(k, str) and exp > now]
+		tmp = Path(f"{path}.tmp")
+		tmp.write_text(json.dumps(entries, separators=(",", ":")), encoding="utf-8")
+		os.replace(tmp, path)
+
+	def load(self, path: Path) -> int:
+		"""Load entries saved by save(); expired ones are skipped. Returns entries loaded."""
+		try:
+			entries = json.loads(Path(path).read_text(encoding="utf-8"))
+		except (OSError, ValueError):
+			return 0
+		now = time.time()
+		loaded = 0
+		with self._lock:
+			for key, expires_at, value in entries:
+				if expires_at > now:
+					self._entries[key] = (expires_at, value)
+					loaded += 1
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+		return loaded
@@ -5,6 +5,16 @@ contract ActionRegistry {
     // 0: Unknown, 2: Blacklisted
     mapping(bytes32 => uint8) public actionStatus;
     address public reviewOracleAddress;
+    address public owner;
+    // Off-chain batcher (e.g. the agent server wallet) allowed to land resolved reviews in bulk
+    address public blacklistSubmitter;
+
+    event ActionStatusChanged(bytes32 indexed actionHash, uint8 status);
+    event BlacklistSubmitterChanged(address indexed submitter);
+
+    constructor() {
+        owner = msg.sender;
+    }
 
     // Called during deployment/setup (e.g., by Ignition)
     function setReviewOracleAddress(address _oracleAddress) external {
@@ -17,11 +27,32 @@ contract ActionRegistry {
         _;
     }
 
+    modifier onlyBlacklistWriter() {
+        require(msg.sender == reviewOracleAddress || msg.sender == blacklistSubmitter, "Not authorized");
+        _;
+    }
+
+    // Pass address(0) to revoke
+    function setBlacklistSubmitter(address _submitter) external {
+        require(msg.sender == owner, "Not owner");
+        blacklistSubmitter = _submitter;
+        emit BlacklistSubmitterChanged(_submitter);
+    }
+
     function getActionStatus(bytes32 _actionHash) external view returns (uint8) {
         return actionStatus[_actionHash];
     }
 
     function addToBlacklist(bytes32 _actionHash) external onlyReviewOracle {
         actionStatus[_actionHash] = 2;
+        emit ActionStatusChanged(_actionHash, 2);
+    }
+
+    // Batch form so many resolved reviews can land in a single transaction
+    function addToBlacklist(bytes32[] calldata _actionHashes) external onlyBlacklistWriter {
+        for (uint256 i = 0; i < _actionHashes.length; i++) {
+            actionStatus[_actionHashes[i]] = 2;
+            emit ActionStatusChanged(_actionHashes[i], 2);
+        }
     }
 }
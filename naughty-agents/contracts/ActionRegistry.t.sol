@@ -0,0 +1,67 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.28;
+
+import {ActionRegistry} from "./ActionRegistry.sol";
+import {Test} from "forge-std/Test.sol";
+
+contract ActionRegistryTest is Test {
+  ActionRegistry registry;
+
+  function setUp() public {
+    registry = new ActionRegistry();
+    registry.setReviewOracleAddress(address(this));
+  }
+
+  function test_BatchBlacklist() public {
+    bytes32[] memory hashes = new bytes32[](3);
+    hashes[0] = keccak256("a");
+    hashes[1] = keccak256("b");
+    hashes[2] = keccak256("c");
+    registry.addToBlacklist(hashes);
+    for (uint256 i = 0; i < hashes.length; i++) {
+      require(registry.getActionStatus(hashes[i]) == 2, "Batched hash should be blacklisted");
+    }
+    require(registry.getActionStatus(keccak256("d")) == 0, "Other hashes stay unknown");
+  }
+
+  function test_BatchBlacklistOnlyOracle() public {
+    bytes32[] memory hashes = new bytes32[](1);
+    hashes[0] = keccak256("a");
+    vm.prank(address(0xBEEF));
+    vm.expectRevert("Not authorized");
+    registry.addToBlacklist(hashes);
+  }
+
+  function test_BatchBlacklistFromSubmitter() public {
+    address submitter = address(0xB0B);
+    registry.setBlacklistSubmitter(submitter);
+    bytes32[] memory hashes = new bytes32[](2);
+    hashes[0] = keccak256("a");
+    hashes[1] = keccak256("b");
+    vm.prank(submitter);
+    registry.addToBlacklist(hashes);
+    require(registry.getActionStatus(hashes[1]) == 2, "Submitter batch should blacklist");
+
+    // The submitter role covers batches only; single-hash resolution stays with the oracle
+    vm.prank(submitter);
+    vm.expectRevert("Not authorized");
+    registry.addToBlacklist(keccak256("c"));
+
+    registry.setBlacklistSubmitter(address(0));
+    vm.prank(submitter);
+    vm.expectRevert("Not authorized");
+    registry.addToBlacklist(hashes);
+  }
+
+  function test_SetBlacklistSubmitterOnlyOwner() public {
+    vm.prank(address(0xBEEF));
+    vm.expectRevert("Not owner");
+    registry.setBlacklistSubmitter(address(0xBEEF));
+  }
+
+  function test_BlacklistEmitsStatusChange() public {
+    vm.expectEmit(true, false, false, true, address(registry));
+    emit ActionRegistry.ActionStatusChanged(keccak256("a"), 2);
+    registry.addToBlacklist(keccak256("a"));
+  }
+}
@@ -2,6 +2,8 @@ import { buildModule } from "@nomicfoundation/hardhat-ignition/modules";
 
 const NaughtyAgentsModule = buildModule("NaughtyAgentsModule", (m) => {
   const requiredStake = m.getParameter("requiredStake", 10n ** 15n); // 0.001 ETH
+  // Account that sends batched addToBlacklist(bytes32[]) txs (agent-simulator/blacklist_batcher.py); defaults to the deployer
+  const blacklistSubmitter = m.getParameter("blacklistSubmitter", m.getAccount(0));
 
   const webOfTrust = m.contract("WebOfTrust", [requiredStake]);
   const actionRegistry = m.contract("ActionRegistry", []);
@@ -9,6 +11,7 @@ const NaughtyAgentsModule = buildModule("NaughtyAgentsModule", (m) => {
 
   // Set ReviewOracle on ActionRegistry (one-time)
   m.call(actionRegistry, "setReviewOracleAddress", [reviewOracle]);
+  m.call(actionRegistry, "setBlacklistSubmitter", [blacklistSubmitter]);
 
   const securityModule = m.contract("NaughtyAgentsSecurityModule", [actionRegistry, reviewOracle]);
 
@@ -21,6 +21,33 @@ export async function getActionStatus(hashHex: string): Promise<number> {
 	return data.status as number;
 }
 
+export type BatchHashResult = { hash: string; error?: undefined } | { hash?: undefined; error: string };
+export type BatchStatusResult = { hash: string; status: number; error?: undefined } | { hash?: undefined; status?: undefined; error: string };
+
+export async function hashActionsBatch(items: { action: string; params: Json }[]): Promise<BatchHashResult[]> {
+	const res = await fetch(`${AGENT_API_BASE}/hash/batch`, {
+		method: "POST",
+		headers: { "Content-Type": "application/json" },
+		body: JSON.stringify({ items }),
+	});
+	if (!res.ok) throw new Error(`hashActionsBatch failed: ${res.status}`);
+	const data = await res.json();
+	return (data?.results || []) as BatchHashResult[];
+}
+
+// Accepts either precomputed hashes or { action, params } items; results keep input order.
+export async function getActionStatusBatch(entries: string[] | { action: string; params: Json }[]): Promise<BatchStatusResult[]> {
+	const body = entries.length && typeof entries[0] !== "string" ? { items: entries } : { hashes: entries };
+	const res = await fetch(`${AGENT_API_BASE}/status/batch`, {
+		method: "POST",
+		headers: { "Content-Type": "application/json" },
+		body: JSON.stringify(body),
+	});
+	if (!res.ok) throw new Error(`getActionStatusBatch failed: ${res.status}`);
+	const data = await res.json();
+	return (data?.results || []) as BatchStatusResult[];
+}
+
 export async function blacklistAction(action: string, params: Json): Promise<{ hash: string; status: number }>{
 	const res = await fetch(`${AGENT_API_BASE}/blacklist`, {
 		method: "POST",
@@ -28,7 +55,36 @@ export async function blacklistAction(action: string, params: Json): Promise<{ h
 		body: JSON.stringify({ action, params }),
 	});
 	if (!res.ok) throw new Error(`blacklistAction failed: ${res.status}`);
-	return (await res.json()) as { hash: string; status: number };
+	const data = (await res.json()) as { hash: string; status: number; jobId?: string };
+	if (!data.jobId) return data;
+	const job = await waitForJob(data.jobId);
+	if (job.status === "failed") throw new Error(`blacklistAction failed: ${job.error}`);
+	return job.result as { hash: string; status: number };
+}
+
+export type AgentJob = {
+	id: string;
+	kind: string;
+	status: "queued" | "running" | "succeeded" | "failed";
+	result?: any;
+	error?: string | null;
+};
+
+export async function getJob(jobId: string): Promise<AgentJob> {
+	const res = await fetch(`${AGENT_API_BASE}/jobs/${jobId}`);
+	if (!res.ok) throw new Error(`getJob failed: ${res.status}`);
+	return (await res.json()) as AgentJob;
+}
+
+// Poll a background job (202 responses carry a jobId) until it finishes.
+export async function waitForJob(jobId: string, { intervalMs = 200, timeoutMs = 30000 } = {}): Promise<AgentJob> {
+	const deadline = Date.now() + timeoutMs;
+	for (;;) {
+		const job = await getJob(jobId);
+		if (job.status === "succeeded" || job.status === "failed") return job;
+		if (Date.now() > deadline) throw new Error(`job ${jobId} timed out`);
+		await new Promise((r) => setTimeout(r, intervalMs));
+	}
 }
 
 export function getAgentApiBase(): string {
@@ -68,43 +124,132 @@ export type ReviewTask = {
   resolved: boolean;
   ai?: { riskScore: number; label: string; reasons: string[] };
   txHash?: string;
+  // Repeat flags of the same hash join the open task
+  flagCount?: number;
+  firstSeen?: number;
+  lastSeen?: number;
 };
 
-export async function flagForReview(action: string, params: Json): Promise<{ taskId: number; hash: string; ai?: ReviewTask["ai"] }>{
+export type FlagResult = { taskId: number; hash: string; ai?: ReviewTask["ai"]; duplicate: boolean; flagCount: number };
+
+// Pass an idempotencyKey when retrying so a retried flag returns the original response
+export async function flagForReview(action: string, params: Json, idempotencyKey?: string): Promise<FlagResult>{
+  const headers: Record<string, string> = { "Content-Type": "application/json" };
+  if (idempotencyKey) headers["Idempotency-Key"] = idempotencyKey;
   const res = await fetch(`${AGENT_API_BASE}/flag`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers,
     body: JSON.stringify({ action, params }),
   });
+  if (res.status === 409) throw new Error("flagForReview failed: action is already blacklisted");
   if (!res.ok) throw new Error(`flagForReview failed: ${res.status}`);
-  return (await res.json()) as { taskId: number; hash: string; ai?: ReviewTask["ai"] };
+  return (await res.json()) as FlagResult;
 }
 
 export async function listReviewTasks(): Promise<ReviewTask[]>{
+  return (await listReviewTaskSnapshot()).tasks;
+}
+
+// All tasks plus a resume token for subscribeTaskEvents
+export async function listReviewTaskSnapshot(): Promise<{ tasks: ReviewTask[]; quorum: number; resumeToken?: string }>{
   const res = await fetch(`${AGENT_API_BASE}/tasks`);
   if (!res.ok) throw new Error(`listReviewTasks failed: ${res.status}`);
   const data = await res.json();
-  return (data?.tasks || []) as ReviewTask[];
+  return { tasks: (data?.tasks || []) as ReviewTask[], quorum: Number(data?.quorum ?? 3), resumeToken: data?.resumeToken };
+}
+
+export type TaskPage = { tasks: ReviewTask[]; nextCursor: string | null; quorum: number; resumeToken: string };
+
+export async function listReviewTasksPage(opts: { cursor?: string; limit?: number; unresolved?: boolean; label?: string; minRisk?: number } = {}): Promise<TaskPage>{
+  const q = new URLSearchParams({ limit: String(opts.limit ?? 100) });
+  if (opts.cursor) q.set("cursor", opts.cursor);
+  if (opts.unresolved) q.set("unresolved", "1");
+  if (opts.label) q.set("label", opts.label);
+  if (opts.minRisk !== undefined) q.set("minRisk", String(opts.minRisk));
+  const res = await fetch(`${AGENT_API_BASE}/tasks?${q}`);
+  if (!res.ok) throw new Error(`listReviewTasksPage failed: ${res.status}`);
+  return (await res.json()) as TaskPage;
+}
+
+// Resolved tasks moved out of the live store by the task archive
+export type ArchivedTask = ReviewTask & { archived: true; archivedAt: number; resolvedAt?: number };
+
+export async function listArchivedTasks(opts: { hash?: string; cursor?: string; to?: number; limit?: number } = {}): Promise<{ tasks: ArchivedTask[]; nextCursor?: string | null }>{
+  const q = new URLSearchParams();
+  if (opts.hash) q.set("hash", opts.hash);
+  if (opts.cursor) q.set("cursor", opts.cursor);
+  if (opts.to !== undefined) q.set("to", String(opts.to));
+  if (opts.limit !== undefined) q.set("limit", String(opts.limit));
+  const res = await fetch(`${AGENT_API_BASE}/tasks/archive?${q}`);
+  if (!res.ok) throw new Error(`listArchivedTasks failed: ${res.status}`);
+  return await res.json();
+}
+
+// Task change events from GET /tasks/stream. Patches carry the task id plus changed fields.
+export type TaskEvent =
+  | { type: "task.flagged"; task: ReviewTask }
+  | { type: "task.reflagged" | "task.voted" | "task.resolved" | "task.submitted"; task: Partial<ReviewTask> & { id: number } }
+  | { type: "reset" };
+
+export function subscribeTaskEvents(since: string | undefined, onEvent: (e: TaskEvent) => void): () => void {
+  const url = `${AGENT_API_BASE}/tasks/stream` + (since ? `?since=${encodeURIComponent(since)}` : "");
+  // EventSource resends the last event id on reconnect, so the server only replays the delta
+  const source = new EventSource(url);
+  for (const type of ["task.flagged", "task.reflagged", "task.voted", "task.resolved", "task.submitted"] as const) {
+    source.addEventListener(type, (ev) => onEvent({ type, task: JSON.parse((ev as MessageEvent).data) } as TaskEvent));
+  }
+  source.addEventListener("reset", () => onEvent({ type: "reset" }));
+  source.addEventListener("tasks.reset", () => onEvent({ type: "reset" }));
+  return () => source.close();
 }
 
-export async function voteOnTask(taskId: number, support: boolean): Promise<{ taskId: number; votesFor: number; votesAgainst: number }>{
+// The server counts one vote per (taskId, voter), like ReviewOracle.hasVoted
+export async function voteOnTask(taskId: number, support: boolean, voter: string): Promise<{ taskId: number; votesFor: number; votesAgainst: number }>{
   const res = await fetch(`${AGENT_API_BASE}/vote`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ taskId, support }),
+    body: JSON.stringify({ taskId, support, voter }),
   });
+  if (res.status === 409) throw new Error("voteOnTask failed: already voted on this task");
   if (!res.ok) throw new Error(`voteOnTask failed: ${res.status}`);
   return (await res.json()) as { taskId: number; votesFor: number; votesAgainst: number };
 }
 
-export async function resolveTask(taskId: number): Promise<{ taskId: number; resolved: boolean; blacklisted?: boolean; reason?: string }>{
+export async function resolveTask(taskId: number): Promise<{ taskId: number; resolved: boolean; blacklisted?: boolean; reason?: string; batchId?: number | null }>{
   const res = await fetch(`${AGENT_API_BASE}/resolve`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ taskId }),
   });
   if (!res.ok) throw new Error(`resolveTask failed: ${res.status}`);
-  return (await res.json()) as { taskId: number; resolved: boolean; blacklisted?: boolean; reason?: string };
+  return (await res.json()) as { taskId: number; resolved: boolean; blacklisted?: boolean; reason?: string; txHash?: string; batchId?: number | null };
 }
 
 
+
+// Guarded execution: blacklist, rule and LLM checks run concurrently server-side; only clean actions run
+export type GuardResult = {
+  ok: boolean;
+  decision: "allow" | "block" | "timeout";
+  hash: string;
+  statuses: { blacklist?: number; chain?: number };
+  assessments: { heuristic?: ReviewTask["ai"]; llm?: ReviewTask["ai"] };
+  executed: boolean;
+  // ok: null with pending: true when the action outlived AgentKit's timeout (outcome unknown; don't resend)
+  result?: { ok: boolean | null; pending?: boolean; requestId?: string; result?: unknown; error?: string };
+  blockedBy?: string;
+  reason?: string;
+  pending?: string[];
+  timings: Record<string, number | null>;
+};
+
+// 403 (blocked) and 504 (deadline) carry a GuardResult too, so they resolve instead of throwing
+export async function guardExecute(action: string, params: Json, opts: { deadlineMs?: number; llm?: boolean; dryRun?: boolean } = {}): Promise<GuardResult>{
+  const res = await fetch(`${AGENT_API_BASE}/guard/execute`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ action, params, ...opts }),
+  });
+  if (!res.ok && res.status !== 403 && res.status !== 504) throw new Error(`guardExecute failed: ${res.status}`);
+  return (await res.json()) as GuardResult;
+}
@@ -1,10 +1,12 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import {
   flagForReview,
-  listReviewTasks,
+  listReviewTaskSnapshot,
   resolveTask,
+  subscribeTaskEvents,
   voteOnTask,
   type ReviewTask,
+  type TaskEvent,
 } from "../agentApi";
 
 interface ReviewerDashboardProps {
@@ -17,13 +19,39 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string>("");
   const [message, setMessage] = useState<string>("");
+  const [quorum, setQuorum] = useState<number>(3);
+  // Mock reviewer identity; change it to vote as another reviewer
+  const [voter, setVoter] = useState<string>(() => localStorage.getItem("reviewerId") || `reviewer-${Math.random().toString(16).slice(2, 8)}`);
+  const unsubscribe = useRef<(() => void) | null>(null);
+
+  useEffect(() => {
+    localStorage.setItem("reviewerId", voter);
+  }, [voter]);
+
+  function applyEvent(e: TaskEvent) {
+    if (e.type === "reset") {
+      refresh();
+      return;
+    }
+    setTasks((prev) => {
+      const i = prev.findIndex((t) => t.id === e.task.id);
+      if (i === -1) return e.type === "task.flagged" ? [...prev, e.task] : prev;
+      const next = prev.slice();
+      next[i] = { ...next[i], ...e.task };
+      return next;
+    });
+  }
 
   async function refresh() {
     setLoading(true);
     setError("");
     try {
-      const t = await listReviewTasks();
-      setTasks(t);
+      const snapshot = await listReviewTaskSnapshot();
+      setTasks(snapshot.tasks);
+      setQuorum(snapshot.quorum);
+      // Follow changes from the snapshot onwards instead of re-polling
+      unsubscribe.current?.();
+      unsubscribe.current = subscribeTaskEvents(snapshot.resumeToken, applyEvent);
     } catch (e: any) {
       setError(e?.message || String(e));
     } finally {
@@ -33,6 +61,7 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
 
   useEffect(() => {
     refresh();
+    return () => unsubscribe.current?.();
   }, []);
 
   async function onFlag() {
@@ -45,8 +74,8 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
         try { params = JSON.parse(paramsJson); } catch {}
       }
       const res = await flagForReview(act, params);
-      setMessage("Flagged for review" + (res?.ai ? ` (AI: ${res.ai.label}, ${res.ai.riskScore})` : ""));
-      await refresh();
+      const flagged = res.duplicate ? `Joined open task #${res.taskId} (flagged ${res.flagCount}x)` : "Flagged for review";
+      setMessage(flagged + (res?.ai ? ` (AI: ${res.ai.label}, ${res.ai.riskScore})` : ""));
     } catch (e: any) {
       setError(e?.message || String(e));
     }
@@ -56,8 +85,7 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
     setMessage("");
     setError("");
     try {
-      await voteOnTask(taskId, support);
-      await refresh();
+      await voteOnTask(taskId, support, voter);
     } catch (e: any) {
       setError(e?.message || String(e));
     }
@@ -69,7 +97,6 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
     try {
       const res = await resolveTask(taskId);
       if (res.resolved) setMessage(res.blacklisted ? "Resolved: Blacklisted" : "Resolved");
-      await refresh();
     } catch (e: any) {
       setError(e?.message || String(e));
     }
@@ -80,6 +107,9 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
       <h3>Reviewer Dashboard (Mock)</h3>
       <button onClick={onFlag}>Flag Current Action For Review</button>
       <button onClick={refresh} style={{ marginLeft: 8 }}>Refresh</button>
+      <label style={{ marginLeft: 8 }}>
+        Voter <input value={voter} onChange={(e) => setVoter(e.target.value)} style={{ width: 140 }} />
+      </label>
       {message && <span style={{ marginLeft: 8 }}>{message}</span>}
       {loading && <p>Loading...</p>}
       {error && (
@@ -108,7 +138,7 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
                 <tr key={t.id}>
                   <td>{t.id}</td>
                   <td>{t.hash.slice(0, 12)}...</td>
-                  <td>{t.action}</td>
+                  <td>{t.action}{t.flagCount && t.flagCount > 1 ? ` (x${t.flagCount})` : ""}</td>
                   <td>
                     {t.ai ? (
                       <div>
@@ -136,8 +166,8 @@ export default function ReviewerDashboard({ actionName, paramsJson }: ReviewerDa
                     <button
                       onClick={() => onResolve(t.id)}
                       style={{ marginLeft: 6 }}
-                      disabled={!(t.votesFor >= 2 && (t.ai ? t.ai.riskScore >= 0.5 : true))}
-                      title={!(t.votesFor >= 2 && (t.ai ? t.ai.riskScore >= 0.5 : true)) ? "Need quorum and AI risk >= 0.5" : ""}
+                      disabled={!(t.votesFor >= quorum && (t.ai ? t.ai.riskScore >= 0.5 : true))}
+                      title={!(t.votesFor >= quorum && (t.ai ? t.ai.riskScore >= 0.5 : true)) ? `Need quorum (${quorum}) and AI risk >= 0.5` : ""}
                     >
                       Resolve
                     </button>